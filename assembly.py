@@ -0,0 +1,130 @@
+from lxml import etree
+from lxml import html as lxml_html
+
+PLACEHOLDER = "[IMAGE]"
+
+# Shared styling so every inserted image renders the same on Blogger
+IMG_STYLE = "width:100%; border-radius:10px; margin: 20px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.1);"
+
+def image(src, alt=None):
+    """Describes one image to insert. alt is optional (re-used images keep none)."""
+    return {'src': src, 'alt': alt}
+
+def _img_element(img):
+    el = etree.Element('img')
+    el.set('src', img['src'])
+    el.set('style', IMG_STYLE)
+    if img.get('alt'):
+        el.set('alt', img['alt'])
+    return el
+
+def _find_placeholders(root):
+    """Returns (element, 'text'|'tail') for every text node holding [IMAGE]."""
+    hits = []
+    # Document order: an element's text, then its children, then its tail
+    for event, el in etree.iterwalk(root, events=('start', 'end')):
+        if event == 'start':
+            # Skip comments / processing instructions (their .text is not markup)
+            if isinstance(el.tag, str) and el.text and PLACEHOLDER in el.text:
+                hits.append((el, 'text'))
+        elif el is not root and el.tail and PLACEHOLDER in el.tail:
+            hits.append((el, 'tail'))
+    return hits
+
+def _place_at(el, slot, img_el):
+    text = getattr(el, slot)
+    before, _, after = text.partition(PLACEHOLDER)
+    img_el.tail = after.replace(PLACEHOLDER, "")
+    if slot == 'text':
+        el.text = before
+        el.insert(0, img_el)
+    else:
+        el.tail = before
+        el.addnext(img_el)
+
+def _strip_placeholder(el, slot):
+    setattr(el, slot, getattr(el, slot).replace(PLACEHOLDER, ""))
+
+def insert_images(html, images):
+    """
+    Places images into generated article HTML in one parse / one serialize:
+    - Image 1 replaces the first [IMAGE] placeholder (or goes at the top)
+    - Images 2+ are spread evenly after paragraphs
+    - Any leftover [IMAGE] placeholders are removed
+    Returns the new HTML string.
+    """
+    images = list(images)
+    if not html or not html.strip():
+        html = ""
+        if not images:
+            return html
+
+    root = lxml_html.fragment_fromstring(html, create_parent='div')
+    placeholders = _find_placeholders(root)
+
+    # Insert Image 1
+    if images:
+        first = _img_element(images.pop(0))
+        if placeholders:
+            el, slot = placeholders.pop(0)
+            _place_at(el, slot, first)
+        else:
+            # Prepend if no placeholder
+            first.tail = root.text
+            root.text = None
+            root.insert(0, first)
+
+    for el, slot in placeholders:
+        _strip_placeholder(el, slot)
+
+    # Insert remaining images, distributed across paragraphs
+    if images:
+        paragraphs = list(root.iter('p'))
+        p_count = len(paragraphs)
+        for i, img in enumerate(images):
+            img_el = _img_element(img)
+            # e.g. 10 paragraphs, 2 images -> after paragraph 3 and 6
+            idx = int((i + 1) * (p_count / (len(images) + 1)))
+            if idx < p_count:
+                p = paragraphs[idx]
+                # Image goes directly after </p>, ahead of any trailing text
+                img_el.tail = p.tail
+                p.tail = None
+                p.addnext(img_el)
+            else:
+                root.append(img_el)
+
+    out = etree.tostring(root, encoding='unicode', method='html')
+    # Drop the wrapper <div> added for parsing
+    return out[len('<div>'):-len('</div>')]
+
+def splice_sections(html, sections):
+    """
+    Inserts newly written sections into an existing article, leaving the rest
+    (including its images) untouched. sections is [(name, html), ...]:
+    "Key Takeaways" goes to the top, everything else just before the
+    "Bottom Line" H2 if there is one, otherwise at the end.
+    """
+    root = lxml_html.fragment_fromstring(html or "", create_parent='div')
+    bottom = next((h for h in root.iter('h2') if 'bottom line' in h.text_content().lower()), None)
+
+    for name, section_html in sections:
+        new_root = lxml_html.fragment_fromstring(section_html, create_parent='div')
+        elements = list(new_root)
+        if not elements:
+            continue
+        if name == "Key Takeaways":
+            # Keep any leading text after the new block
+            elements[-1].tail = (elements[-1].tail or "") + (root.text or "")
+            root.text = None
+            for i, el in enumerate(elements):
+                root.insert(i, el)
+        elif bottom is not None and name != "Bottom Line":
+            for el in elements:
+                bottom.addprevious(el)
+        else:
+            for el in elements:
+                root.append(el)
+
+    out = etree.tostring(root, encoding='unicode', method='html')
+    return out[len('<div>'):-len('</div>')]
@@ -0,0 +1,112 @@
+import json
+import time
+import hashlib
+import threading
+import storage
+import validator
+
+# Verdicts recorded per post
+OK = 'ok'
+LOW_VALUE = 'low_value'   # flagged, not fixed yet (retried next run)
+FIXED = 'fixed'           # updated by the auditor; re-scored once Blogger reports the new version
+
+def content_hash(html):
+    return hashlib.sha1((html or "").encode('utf-8')).hexdigest()
+
+def rules_version():
+    """Changes whenever the validator thresholds do, so old verdicts get re-scored."""
+    rules = [validator.MIN_WORDS, validator.ANALYSIS_KEYWORDS, validator.STRUCTURE_KEYWORDS]
+    return hashlib.sha1(json.dumps(rules).encode('utf-8')).hexdigest()[:12]
+
+class AuditIndex:
+    """
+    SQLite index of what the auditor has already judged: post id, Blogger's
+    `updated` and etag, a hash of the body and the last verdict + metrics.
+    Unchanged OK posts are skipped outright; changed posts whose body hash
+    still matches (e.g. labels-only edits) reuse the stored metrics. The list
+    page token is persisted too, so a run resumes where the last one stopped.
+    """
+
+    def __init__(self, path=None, blog_id=""):
+        self.path = path or storage.db_path("AUDIT_INDEX_DB", "audit_index.db")
+        self.blog_id = blog_id or ""
+        self.rules = rules_version()
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS audited_posts (
+                    post_id TEXT PRIMARY KEY,
+                    updated TEXT,
+                    etag TEXT,
+                    content_hash TEXT,
+                    rules TEXT NOT NULL,
+                    verdict TEXT NOT NULL,
+                    reasons TEXT NOT NULL,
+                    metrics TEXT NOT NULL,
+                    audited_at REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS audit_cursor (
+                    blog_id TEXT PRIMARY KEY,
+                    page_token TEXT,
+                    scanned INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+
+    def get(self, post_id):
+        with storage.connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT updated, etag, content_hash, rules, verdict, reasons, metrics FROM audited_posts WHERE post_id = ?",
+                (post_id,)).fetchone()
+        if not row:
+            return None
+        updated, etag, chash, rules, verdict, reasons, metrics = row
+        return {'updated': updated, 'etag': etag, 'content_hash': chash, 'rules': rules,
+                'verdict': verdict, 'reasons': json.loads(reasons), 'metrics': json.loads(metrics)}
+
+    def unchanged(self, post, row=None):
+        """True if this exact version of the post was already judged OK under the current rules."""
+        row = row or self.get(post['id'])
+        if not row or row['verdict'] != OK or row['rules'] != self.rules:
+            return False
+        if post.get('etag') and row['etag']:
+            return post['etag'] == row['etag']
+        return bool(post.get('updated')) and post.get('updated') == row['updated']
+
+    def known_metrics(self, post, chash, row=None):
+        """Stored metrics if the body hasn't changed since it was scored (None = analyze again)."""
+        row = row or self.get(post['id'])
+        if row and row['content_hash'] == chash and row['rules'] == self.rules:
+            return row['metrics']
+        return None
+
+    def record(self, post, verdict, metrics, reasons=(), chash=None):
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO audited_posts "
+                "(post_id, updated, etag, content_hash, rules, verdict, reasons, metrics, audited_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (post['id'], post.get('updated'), post.get('etag'),
+                 chash or content_hash(post.get('content')), self.rules, verdict,
+                 json.dumps(list(reasons)), json.dumps(metrics), time.time()))
+
+    def load_cursor(self):
+        """(page_token, posts scanned so far in this pass); (None, 0) = start from the newest post."""
+        with storage.connect(self.path) as conn:
+            row = conn.execute("SELECT page_token, scanned FROM audit_cursor WHERE blog_id = ?",
+                               (self.blog_id,)).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def save_cursor(self, page_token, scanned):
+        with self._lock, storage.connect(self.path) as conn:
+            if page_token:
+                conn.execute(
+                    "INSERT OR REPLACE INTO audit_cursor (blog_id, page_token, scanned, updated_at) VALUES (?, ?, ?, ?)",
+                    (self.blog_id, page_token, scanned, time.time()))
+            else:
+                # Reached the oldest post: next pass starts from the top again
+                conn.execute("DELETE FROM audit_cursor WHERE blog_id = ?", (self.blog_id,))
+
+    def stats(self):
+        with storage.connect(self.path) as conn:
+            return dict(conn.execute("SELECT verdict, COUNT(*) FROM audited_posts GROUP BY verdict").fetchall())
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: assembly.insert_images vs. the old multi-parse BeautifulSoup
+path from bot.run_batch / content_auditor.rebuild_post.
+Run: python bench_assembly.py
+"""
+import random
+import timeit
+from bs4 import BeautifulSoup
+import assembly
+
+STYLE = assembly.IMG_STYLE
+WORDS = ("market policy analysts growth signal data rollout adoption regulators "
+         "investors supply demand chip model launch impact forecast").split()
+
+def make_article(word_count, seed=0):
+    rng = random.Random(seed)
+    parts = ["<h2>Key Takeaways</h2><ul>"]
+    parts += [f"<li>{' '.join(rng.choices(WORDS, k=12))}</li>" for _ in range(5)]
+    parts.append("</ul>\n[IMAGE]\n")
+    written = 60
+    section = 0
+    while written < word_count:
+        if written // 250 > section:
+            section += 1
+            parts.append(f"<h2>Section {section}</h2><h3>Detail {section}</h3>")
+        n = rng.randint(35, 70)
+        parts.append(f"<p>{' '.join(rng.choices(WORDS, k=n))} <strong>key</strong> point.</p>\n")
+        written += n
+    return "".join(parts)
+
+def legacy_insert(html, img_tags):
+    # Verbatim shape of the old code path (placeholder replace, re-parses, final cleanup parse)
+    img_tags = list(img_tags)
+    soup = BeautifulSoup(html, 'html.parser')
+    if img_tags:
+        first_img = img_tags.pop(0)
+        if '[IMAGE]' in html:
+            html = html.replace('[IMAGE]', first_img)
+        else:
+            html = first_img + html
+    if img_tags:
+        soup = BeautifulSoup(html, 'html.parser')
+        paragraphs = soup.find_all('p')
+        p_count = len(paragraphs)
+        imgs_remaining = len(img_tags)
+        if p_count > 0:
+            for i, img_code in enumerate(img_tags):
+                idx = int((i + 1) * (p_count / (imgs_remaining + 1)))
+                img_tag_to_insert = BeautifulSoup(img_code, 'html.parser').find('img')
+                if img_tag_to_insert:
+                    if idx < len(paragraphs):
+                        paragraphs[idx].insert_after(img_tag_to_insert)
+                    else:
+                        soup.append(img_tag_to_insert)
+        html = str(soup)
+    html = html.replace("[IMAGE]", "")
+    soup = BeautifulSoup(html, 'html.parser')
+    soup.get_text()
+    soup.find_all('p')
+    return str(soup)
+
+def main(repeat=20):
+    urls = [f"https://images.example.com/photo_{i}.jpg" for i in range(3)]
+    new_images = [assembly.image(u, alt=f"Topic image {i+1}") for i, u in enumerate(urls)]
+    old_tags = [f'<img src="{u}" style="{STYLE}" alt="Topic image {i+1}">' for i, u in enumerate(urls)]
+
+    print(f"{'words':>6} {'legacy ms':>10} {'assembly ms':>12} {'speedup':>8}")
+    for words in (1500, 3000, 5000):
+        html = make_article(words)
+        legacy = min(timeit.repeat(lambda: legacy_insert(html, old_tags), number=1, repeat=repeat)) * 1000
+        single = min(timeit.repeat(lambda: assembly.insert_images(html, new_images), number=1, repeat=repeat)) * 1000
+        print(f"{words:>6} {legacy:>10.2f} {single:>12.2f} {legacy / single:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Micro-benchmark: validator.analyze (streaming lxml parser target) vs. the
+lxml tree walk it replaced and the original auditor checks (BeautifulSoup
+word count + substring scans). Also checks the tree and streaming metrics
+agree on every post in the corpus (word counts can only go up: the stream
+splits words at block tags).
+Run: python bench_validator.py
+"""
+import random
+import timeit
+from bs4 import BeautifulSoup
+from lxml import html as lxml_html
+import validator
+from bench_assembly import WORDS, make_article
+
+def make_corpus(seed=0):
+    """(name, html) posts shaped like what the auditor sees on a real blog."""
+    rng = random.Random(seed)
+    images = "".join(f'<img src="https://images.example.com/{i}.jpg" alt="Expert photo {i}">' for i in range(3))
+    thin = "".join(f"<p>{' '.join(rng.choices(WORDS, k=40))}</p>" for _ in range(6))
+    wall = " ".join(rng.choices(WORDS, k=700))
+    tricky = ("<!-- <h2>FAQ</h2><img src=\"old.jpg\"> --><PICTURE><IMG SRC=\"https://x/y.jpg\"></PICTURE>"
+              "<pre>raw</pre><h2>Key <b>Takeaways</b></h2><p>[IMAGE]</p>" + thin)
+    # Embeds and theme CSS: keyword-looking code that must not count as text
+    scripted = ('<style>.faq, .key-takeaways { margin: 0 }</style>' + thin +
+                '<script type="application/ld+json">{"@type": "FAQPage", "name": "Expert Analysis [IMAGE]"}</script>'
+                '<script>var words = "' + " ".join(rng.choices(WORDS, k=300)) + '";</script>')
+    return [
+        ("full post", make_article(1500, seed) + images),
+        ("long post", make_article(5000, seed + 1) + images),
+        ("thin post", "<h2>Intro</h2>" + thin),
+        ("wall of text", wall + " [IMAGE]"),
+        ("tricky markup", tricky),
+        ("scripts/styles", scripted),
+    ]
+
+def legacy_checks(html):
+    # Shape of the original run_audit checks: full BS4 parse for words, then substring scans
+    words = len(BeautifulSoup(html, 'html.parser').get_text().split())
+    return {
+        'words': words,
+        'images': "<img" in html,
+        'has_analysis': any(k in html for k in validator.ANALYSIS_KEYWORDS),
+        'has_structure': any(k in html for k in validator.STRUCTURE_KEYWORDS),
+        'headings': "<h2" in html or "<h3" in html,
+        'paragraphs': "<p" in html,
+        'placeholders': "[IMAGE]" in html,
+    }
+
+def tree_analyze(html):
+    # The previous validator.analyze: build the whole tree, walk it, then text_content()
+    metrics = validator.new_metrics()
+    root = lxml_html.fragment_fromstring(html, create_parent='div')
+    for el in list(root.iter('script', 'style')):
+        el.drop_tree()
+    for el in root.iter():
+        tag = el.tag if isinstance(el.tag, str) else None
+        if tag == 'h2':
+            metrics['h2'] += 1
+            metrics['headings'].append(el.text_content().strip())
+        elif tag == 'h3':
+            metrics['h3'] += 1
+        elif tag == 'p':
+            metrics['paragraphs'] += 1
+        elif tag == 'img':
+            metrics['images'] += 1
+            if el.get('src'):
+                metrics['image_srcs'].append(el.get('src'))
+    text = root.text_content()
+    metrics['words'] = len(text.split())
+    metrics['has_analysis'] = any(k in text for k in validator.ANALYSIS_KEYWORDS)
+    metrics['has_structure'] = any(k in text for k in validator.STRUCTURE_KEYWORDS)
+    metrics['placeholders'] = text.count(validator.PLACEHOLDER)
+    return metrics
+
+def main(repeat=20):
+    print(f"{'post':>14} {'legacy ms':>10} {'tree ms':>8} {'stream ms':>10} {'vs legacy':>10}")
+    for name, html in make_corpus():
+        streamed = validator.analyze(html)
+        tree = tree_analyze(html)
+        # Same metrics, except the tree's text_content() glues words across block tags
+        assert streamed['words'] >= tree['words'], name
+        assert dict(streamed, words=0) == dict(tree, words=0), (name, streamed, tree)
+        legacy = min(timeit.repeat(lambda: legacy_checks(html), number=1, repeat=repeat)) * 1000
+        walked = min(timeit.repeat(lambda: tree_analyze(html), number=1, repeat=repeat)) * 1000
+        stream = min(timeit.repeat(lambda: validator.analyze(html), number=1, repeat=repeat)) * 1000
+        print(f"{name:>14} {legacy:>10.2f} {walked:>8.2f} {stream:>10.2f} {legacy / stream:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,131 +1,290 @@
-import time
 import os
+import sys
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from googleapiclient.discovery import build
 import auth
 import trends
 import content
 import images
 import email_poster
+import pipeline
+import assembly
+import scheduler
+import storage
+import ledger
+import http_client
+import rate_limiter
+from deadline import Deadline, DeadlineExceeded, BATCH_BUDGET, TOPIC_BUDGET
 
 # ... (Previous imports)
 
-def run_batch():
+def fetch_images(title, target_images=2, deadline=None):
+    """Fetches up to target_images distinct images (assembly.image dicts) for a topic."""
+    print(f"   [i] Fetching {target_images} images for new post...")
+    # One search call usually returns enough distinct candidates for the whole post
+    links = images.get_images(title, target_images, deadline=deadline)
+    new_images = []
+    for i, img_url in enumerate(links):
+        new_images.append(assembly.image(img_url, alt=f"{title} image {i+1}"))
+        print(f"   [+] Fetched image {i+1}: {img_url[:30]}...")
+    if len(links) < target_images:
+        print(f"   [!] Only found {len(links)}/{target_images} images")
+    return new_images
+
+def prefetch_images(topic, target_images=2, deadline=None):
+    """
+    Returns (on_title, result, cancel). Passed to content.generate_post,
+    on_title starts the image search in the background the first time a
+    title streams in, so it overlaps the rest of the body. result() waits
+    for that search, or runs it now if no title ever came (batched prompts).
+    cancel() is for topics that won't be published: the search stops before
+    its next Custom Search call instead of spending quota on them.
+    """
+    started = []
+    lock = threading.Lock()
+    # Own sub-budget so cancelling the search doesn't end the topic's
+    search_deadline = (deadline or Deadline()).child(None, label="image prefetch")
+
+    def on_title(title):
+        with lock:
+            if started or search_deadline.expired():
+                return
+            pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="images")
+            started.append(pool.submit(fetch_images, topic['title'], target_images, search_deadline))
+            # The worker exits once the search is done; nobody has to join it
+            pool.shutdown(wait=False)
+
+    def result():
+        with lock:
+            future = started[0] if started else None
+        if future:
+            return future.result()
+        return fetch_images(topic['title'], target_images=target_images, deadline=search_deadline)
+
+    def cancel():
+        with lock:
+            search_deadline.cancel()
+            if started:
+                started[0].cancel()
+
+    return on_title, result, cancel
+
+def publish_post(title, html, deadline=None):
+    # --- POST VIA EMAIL (Reliable Fallback) ---
+    success = email_poster.send_post_via_email(title, html, deadline=deadline)
+    
+    if success:
+        print(f"Posted: {title}")
+        # Indexing might fail if we don't have the URL immediately.
+        # Blogger Email posting is async, so we don't get the URL back instantly.
+        # We can skip instant indexing for now, or assume it will be indexed naturally.
+        print("Note: Indexing skipped because Email Posting doesn't return immediate URL.")
+    return success
+
+def generate_for_topic(topic, deadline=None, on_title=None):
+    """content.generate_post wrapped with ledger bookkeeping."""
+    topic_ledger = ledger.get_ledger()
+    topic_ledger.mark(topic['title'], ledger.GENERATING)
+    post_data = content.generate_post(topic['title'], on_title=on_title, deadline=deadline)
+    if post_data:
+        topic_ledger.mark(topic['title'], ledger.GENERATED, title=post_data['title'])
+    else:
+        topic_ledger.mark(topic['title'], ledger.FAILED)
+    return post_data
+
+def generate_for_topics(topics, deadline=None):
+    """Batched variant (GEMINI_BATCH_SIZE > 1): fewer, larger Gemini requests."""
+    topic_ledger = ledger.get_ledger()
+    for topic in topics:
+        topic_ledger.mark(topic['title'], ledger.GENERATING)
+    posts = content.generate_posts([t['title'] for t in topics], deadline=deadline)
+    for topic, post_data in zip(topics, posts):
+        if post_data:
+            topic_ledger.mark(topic['title'], ledger.GENERATED, title=post_data['title'])
+        else:
+            topic_ledger.mark(topic['title'], ledger.FAILED)
+    return posts
+
+def publish_for_topic(topic, title, html, deadline=None):
+    success = publish_post(title, html, deadline=deadline)
+    ledger.get_ledger().mark(topic['title'], ledger.PUBLISHED if success else ledger.FAILED)
+    return success
+
+def skip_topic(topic, error):
+    """A topic ran out of time: record it as failed so a later run retries it."""
+    print(f"   [!] {error}. Skipping: {topic['title']}")
+    ledger.get_ledger().mark(topic['title'], ledger.FAILED)
+
+def run_batch(use_pipeline=None, should_stop=None):
     # Authenticate mainly for Indexing API (optional)
     creds = auth.authenticate()
     
     # We don't strictly need blogger_service for posting anymore
     # but we might keep creds for Indexing if that works.
     
-    topics = trends.get_trends()
+    # Every network call below draws its timeout from this budget (BOT_BATCH_DEADLINE),
+    # and each topic gets its own slice of it (BOT_TOPIC_DEADLINE)
+    batch_deadline = Deadline(BATCH_BUDGET)
+
+    # Ledger remembers what we've already covered so hot trends aren't rewritten every run
+    topic_ledger = ledger.get_ledger()
+    topics = trends.get_trends(exclude=topic_ledger.covered_set, deadline=batch_deadline)
     if not topics: return
+    # This batch's share of today's Custom Search quota
+    images.start_batch()
 
-    for topic in topics:
+    if use_pipeline is None:
+        use_pipeline = os.getenv("BOT_PIPELINE", "0") == "1"
+    if use_pipeline:
+        return run_pipeline(topics, should_stop=should_stop, deadline=batch_deadline)
+
+    # Batched prompting packs several topics into one Gemini request up front
+    batched = content.BATCH_SIZE > 1 and len(topics) > 1
+    pregenerated = generate_for_topics(topics, deadline=batch_deadline) if batched else None
+
+    for i, topic in enumerate(topics):
+        if should_stop and should_stop():
+            print("   [i] Stop requested. Skipping remaining topics.")
+            break
+        if batch_deadline.expired():
+            print("   [!] Batch deadline reached. Skipping remaining topics.")
+            break
         print(f"Processing: {topic['title']}")
-        
-        # content
-        post_data = content.generate_post(topic['title'])
-        if not post_data: continue
-        
-        # image
-        img_url = images.get_image(topic['title'])
-        
-        # html assembly
-        html = post_data['content']
-        # html assembly
-        html = post_data['content']
-        
-        # --- ROBUST IMAGE LOGIC (Ported from content_auditor.py) ---
-        from bs4 import BeautifulSoup
-        
-        # We need at least 2 images
-        target_images = 2
-        new_img_tags = []
-        used_urls = set()
-        
-        # Query variations to ensure different images
-        variations = ["", " wallpaper", " visualization", " infographic", " background", " chart"]
-
-        print(f"   [i] Fetching {target_images} images for new post...")
-        for i in range(target_images):
-            # Create distinct query
-            variation = variations[i % len(variations)]
-            search_query = f"{topic['title']}{variation}"
-            
-            img_url = images.get_image(search_query)
-            
-            if img_url and img_url not in used_urls:
-                used_urls.add(img_url)
-                # Create styled image tag
-                new_tag = f'<img src="{img_url}" style="width:100%; border-radius:10px; margin: 20px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.1);" alt="{topic["title"]} image {i+1}">'
-                new_img_tags.append(new_tag)
-                print(f"   [+] Fetched image {i+1}: {img_url[:30]}...")
-            else:
-                 print(f"   [!] Failed/Duplicate image {i+1}")
-
-        # Insert images into HTML
-        # Image 1: Placeholder or Top
-        # Image 2+: Distributed
-        
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Insert Image 1
-        if new_img_tags:
-            first_img = new_img_tags.pop(0)
-            if "[IMAGE]" in html:
-                html = html.replace("[IMAGE]", first_img)
-            else:
-                # Prepend if no placeholder
-                html = first_img + html
-                
-        # Insert remaining images
-        if new_img_tags:
-            soup = BeautifulSoup(html, 'html.parser')
-            paragraphs = soup.find_all('p')
-            p_count = len(paragraphs)
-            imgs_remaining = len(new_img_tags)
-            
-            if p_count > 0:
-                for i, img_code in enumerate(new_img_tags):
-                    # Middle distribution
-                    idx = int((i + 1) * (p_count / (imgs_remaining + 1)))
-                    
-                    img_soup = BeautifulSoup(img_code, 'html.parser')
-                    img_tag_to_insert = img_soup.find('img')
-                    
-                    if img_tag_to_insert:
-                        if idx < len(paragraphs):
-                            paragraphs[idx].insert_after(img_tag_to_insert)
-                        else:
-                            soup.append(img_tag_to_insert)
-            html = str(soup)
-            
-        # Clean up any leftover [IMAGE]
-        html = html.replace("[IMAGE]", "")
-                
-        # --- POST VIA EMAIL (Reliable Fallback) ---
-        success = email_poster.send_post_via_email(post_data['title'], html)
-        
-        if success:
-            print(f"Posted: {post_data['title']}")
-            # Indexing might fail if we don't have the URL immediately.
-            # Blogger Email posting is async, so we don't get the URL back instantly.
-            # We can skip instant indexing for now, or assume it will be indexed naturally.
-            print("Note: Indexing skipped because Email Posting doesn't return immediate URL.")
+        topic_deadline = batch_deadline.child(TOPIC_BUDGET)
+        # --- ROBUST IMAGE LOGIC (shared with content_auditor.py) ---
+        # We need at least 2 images; the search starts as soon as the title streams in
+        on_title, images_ready, cancel_images = prefetch_images(topic, target_images=2, deadline=topic_deadline)
+
+        try:
+            # content
+            post_data = pregenerated[i] if batched else generate_for_topic(topic, deadline=topic_deadline,
+                                                                            on_title=on_title)
+            if not post_data:
+                cancel_images()
+                continue
+
+            # html assembly
+            html = assembly.insert_images(post_data['content'], images_ready())
+
+            publish_for_topic(topic, post_data['title'], html, deadline=topic_deadline)
+        except DeadlineExceeded as e:
+            cancel_images()
+            skip_topic(topic, e)
+    print(f"   [i] {http_client.get_client().summary()}")
+    print(f"   [i] {rate_limiter.get_limiter().summary()}")
+
+def run_pipeline(topics, should_stop=None, deadline=None):
+    """
+    Staged mode: generation, image fetch, assembly and publish run as separate
+    worker pools connected by queues, so topics overlap instead of queueing
+    behind each other's network waits. Worker counts come from
+    PIPELINE_<STAGE>_WORKERS. A topic whose deadline runs out is dropped
+    from whichever stage it's in.
+    """
+    deadline = deadline or Deadline()
+
+    def generate(job):
+        print(f"Processing: {job['topic']['title']}")
+        # The topic's clock starts when a generate worker picks it up
+        job['deadline'] = deadline.child(TOPIC_BUDGET)
+        # Image search starts when the title streams in; the images stage only collects it
+        on_title, job['images_ready'], cancel_images = prefetch_images(job['topic'], target_images=2,
+                                                                       deadline=job['deadline'])
+        try:
+            job['post'] = generate_for_topic(job['topic'], deadline=job['deadline'], on_title=on_title)
+        finally:
+            if not job.get('post'):
+                # Failed or out of time: don't keep searching for a post that won't exist
+                cancel_images()
+        return job if job['post'] else None
+
+    def fetch(job):
+        job['images'] = job['images_ready']()
+        return job
+
+    def assemble(job):
+        job['html'] = assembly.insert_images(job['post']['content'], job['images'])
+        return job
+
+    def publish(job):
+        job['posted'] = publish_for_topic(job['topic'], job['post']['title'], job['html'], deadline=job['deadline'])
+        return job
+
+    def bounded(func):
+        def run(job):
+            try:
+                return func(job)
+            except DeadlineExceeded as e:
+                skip_topic(job['topic'], e)
+                return None
+        return run
+
+    stages = [
+        ('generate', bounded(generate), pipeline.stage_limit('generate', 3)),
+        ('images', bounded(fetch), pipeline.stage_limit('images', 3)),
+        ('assemble', assemble, pipeline.stage_limit('assemble', 1)),
+        ('publish', bounded(publish), pipeline.stage_limit('publish', 1)),
+    ]
+    print(f"   [i] Pipeline mode: {', '.join(f'{n}={w}' for n, _, w in stages)}")
+    done = pipeline.Pipeline(stages).run(({'topic': t} for t in topics), should_stop=should_stop)
+    posted = sum(1 for job in done if job.get('posted'))
+    print(f"   [i] Pipeline finished: {posted}/{len(topics)} topics posted.")
+    print(f"   [i] {http_client.get_client().summary()}")
+    print(f"   [i] {rate_limiter.get_limiter().summary()}")
+    return done
             
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline", action="store_true", help="Run topics through the concurrent staged pipeline")
+    parser.add_argument("--once", action="store_true", help="Run a single batch and exit (cron / CI)")
+    parser.add_argument("--schedule", default=os.getenv("BOT_SCHEDULE", "0 */2 * * *"), help="Cron expression for daemon mode")
+    parser.add_argument("--jitter", type=int, default=int(os.getenv("BOT_JITTER", "0")), help="Random delay (seconds) added to each tick")
+    parser.add_argument("--catch-up", default=os.getenv("BOT_CATCH_UP", "once"), choices=scheduler.CATCH_UP_POLICIES,
+                        help="What to do with ticks missed while the bot was down or busy")
+    args = parser.parse_args()
+
     print("Bot v2 Started.")
-    while True:
-        run_batch()
-        print("Waiting 2 hours...")
-        time.sleep(7200)
+    # Lock so two runs (daemon + manual, or overlapping CI jobs) never post at once
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    lock = scheduler.PidLock(os.path.join(storage.DATA_DIR, "bot.lock"))
+    try:
+        lock.acquire()
+    except scheduler.LockHeld as e:
+        print(f"[!] {e}. Exiting.")
+        return
+
+    try:
+        if args.once:
+            with lock.keep_alive():
+                run_batch(use_pipeline=args.pipeline or None)
+            return
+
+        sched = scheduler.Scheduler(
+            lambda should_stop: run_batch(use_pipeline=args.pipeline or None, should_stop=should_stop),
+            args.schedule,
+            jitter=args.jitter,
+            catch_up=args.catch_up,
+            state_file=os.path.join(storage.DATA_DIR, "scheduler_state.json"),
+            lock=lock,
+        )
+        sched.install_signal_handlers()
+        sched.run_forever(run_on_start=True)
+    finally:
+        lock.release()
 
 if __name__ == "__main__":
+    exit_code = 0
     try:
         main()
     except Exception as e:
+        exit_code = 1
         print(f"\nCRITICAL ERROR: {e}")
         import traceback
         traceback.print_exc()
     finally:
-        input("\nPress Enter to close window...")
+        # Only hold the window open for interactive (double-click) runs
+        if sys.stdin and sys.stdin.isatty() and os.getenv("BOT_HEADLESS", "0") != "1":
+            input("\nPress Enter to close window...")
+    sys.exit(exit_code)
@@ -1,6 +1,6 @@
 import os
 import pickle
-import requests
+import http_client
 from google.auth.transport.requests import Request
 
 TOKEN_FILE = 'token.pickle'
@@ -21,7 +21,7 @@ def check_token_truth():
     print(f"Checking token: {access_token[:10]}...")
 
     # Query Google's tokeninfo endpoint
-    resp = requests.get(f"https://oauth2.googleapis.com/tokeninfo?access_token={access_token}")
+    resp = http_client.get(f"https://oauth2.googleapis.com/tokeninfo?access_token={access_token}")
     
     if resp.status_code != 200:
         print(f"Error checking token: {resp.text}")
@@ -1,13 +1,84 @@
 import os
 import time
-import warnings
-# Suppress warnings before importing the deprecated package
-warnings.simplefilter(action='ignore', category=FutureWarning)
-import google.generativeai as genai
+import re
 import json
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import router
+import gemini_clients
+import gen_cache
+import validator
+import rate_limiter
+from deadline import Deadline, DeadlineExceeded
 
-def generate_post(topic):
-    # Load all available keys
+# Models to try (Verified available via check_models.py)
+# Using 2.5 and 2.0 family as 1.5 appears deprecated/unavailable for this key
+MODELS = [
+    'gemini-2.0-flash',       # Fast, generally high limits
+    'gemini-2.0-flash-lite',  # Lite version, very efficient
+    'gemini-2.5-flash',       # Newest Flash model
+    'gemini-flash-latest',    # Alias for latest stable flash
+    'gemini-2.5-pro'          # High quality fallback
+]
+
+# Longest we'll block waiting for a cooled-down key/model to reopen
+MAX_COOLDOWN_WAIT = int(os.getenv("GEMINI_MAX_COOLDOWN_WAIT", 90))
+# Pause before another pass once every pair has failed without cooling down; doubles each pass
+PASS_BACKOFF = float(os.getenv("GEMINI_PASS_BACKOFF", 5))
+
+SEPARATOR = "|||SEPARATOR|||"
+
+# Bump whenever build_prompt changes so cached articles from the old template are ignored
+PROMPT_VERSION = "v2"
+
+# Batched prompting: per-article delimiters wrapped around the usual Title/SEPARATOR/HTML
+ARTICLE_START = "|||ARTICLE {n}|||"
+ARTICLE_END = "|||END ARTICLE {n}|||"
+BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", 1))
+# A batched article shorter than this is treated as failed and regenerated on its own
+BATCH_MIN_WORDS = int(os.getenv("GEMINI_BATCH_MIN_WORDS", 600))
+
+# Generation mode: 'single' (one long request) or 'sectional' (outline, then
+# the H2 sections written in parallel across the key pool)
+GENERATION_MODE = os.getenv("GEMINI_GENERATION_MODE", "single")
+OUTLINE_MARKER = "|||OUTLINE|||"
+# (H2 heading, target words, what the section must do) - mirrors ARTICLE_GUIDELINES items 5-9
+SECTIONS = [
+    ("The Deep Dive", 400, "Who/what/when/where/why breakdown. Use <h3> subsections for readability."),
+    ("Expert Analysis & Implications", 400, 'The MOST IMPORTANT section. Explain the "So What?". How does this affect the industry/world in 6-12 months?'),
+    ("Future Outlook", 250, "Prediction based on current data."),
+    ("FAQ", 300, "5-7 distinct questions that a user would actually ask (use <h3> for each question, <p> for each answer)."),
+    ("Bottom Line", 120, "Final summary verdict."),
+]
+SECTION_MIN_WORDS = int(os.getenv("GEMINI_SECTION_MIN_WORDS", 60))
+# Everything that can be written on its own (sectional mode and auditor repairs)
+SECTION_SPECS = {"Key Takeaways": (80, "4-5 bullet points summarizing main insights (use <ul>/<li>).")}
+SECTION_SPECS.update({name: (words, instructions) for name, words, instructions in SECTIONS})
+
+# Extra generations (on other models) when an article fails the validator
+QUALITY_RETRIES = int(os.getenv("GEMINI_QUALITY_RETRIES", 1))
+
+# Streaming: abort if the separator hasn't shown up within this many characters
+# (~150 tokens; the title is a single line)
+STREAM_SEPARATOR_CHARS = int(os.getenv("GEMINI_STREAM_SEPARATOR_CHARS", 600))
+# ...or if this much article body has streamed without a single HTML tag
+STREAM_HTML_CHARS = int(os.getenv("GEMINI_STREAM_HTML_CHARS", 400))
+
+# Per-call timeout in seconds (0 = none beyond the batch/topic Deadline); slow calls
+# fail and rotate like any other error
+CALL_TIMEOUT = float(os.getenv("GEMINI_CALL_TIMEOUT", 0))
+# Hedged requests: once the primary call runs past its model's p90 latency, send
+# the same prompt to the next-fastest pair and keep whichever answers first
+HEDGE = os.getenv("GEMINI_HEDGE", "0") == "1"
+# Hedge delay used until a model has enough latency samples for a p90
+HEDGE_AFTER = float(os.getenv("GEMINI_HEDGE_AFTER", 45))
+# Rank healthy pairs by observed latency instead of MODELS order
+PREFER_FAST = os.getenv("GEMINI_PREFER_FAST", "0") == "1"
+
+@functools.lru_cache(maxsize=1)
+def load_keys():
+    """Parses GEMINI_API_KEY / GEMINI_API_KEY_n once per process."""
     keys = []
     
     # 1. Check for comma-separated list
@@ -24,20 +95,11 @@ def generate_post(topic):
         if not k: break
         keys.append(k.strip())
         i += 1
-        
-    if not keys:
-        print("Missing Gemini API Key(s)")
-        return None
-        
-    print(f"   [i] Loaded {len(keys)} Gemini API Keys for rotation.")
+    return tuple(keys)
 
-    # Retry parameters
-    max_retries = 3
-    retry_delays = [5, 10, 20] # Shorter delays since we have rotation
-    
-    prompt = f"""
-    You are a senior investigative journalist with deep expertise in breaking news. Write a COMPREHENSIVE, ORIGINAL article about: "{topic}".
-    
+# Shared instruction block (E-E-A-T, structure, technical rules). Sent once per
+# request, whether the request covers one topic or a batch of them.
+ARTICLE_GUIDELINES = """
     **CRITICAL: Google AdSense 2026 Compliance (E-E-A-T Principles)**
     To bypass "Low Value Content" filters, this article MUST demonstrate:
     - **Experience**: Include specific examples, case studies, or historical parallels. Avoid generic statements.
@@ -63,100 +125,624 @@ def generate_post(topic):
     - **No placeholders**: Never write [Date], [Location], etc. - omit if unknown.
     - **HTML Only**: Use <h2>, <h3>, <p>, <ul>, <li>, <strong>, <em>. NO markdown, NO <html>/<body> tags.
     
+    Tone: Professional, authoritative, slightly provocative (financial/tech journalism style).
+"""
+
+def build_prompt(topic):
+    return f"""
+    You are a senior investigative journalist with deep expertise in breaking news. Write a COMPREHENSIVE, ORIGINAL article about: "{topic}".
+    {ARTICLE_GUIDELINES}
     **Output Format**: 
     - First line: The Title
-    - Second line: "|||SEPARATOR|||"
+    - Second line: "{SEPARATOR}"
     - Rest of text: The HTML Content
     
     **CRITICAL**: 
     - Do NOT output JSON. 
-    - Ensure the separator "|||SEPARATOR|||" is exact.
+    - Ensure the separator "{SEPARATOR}" is exact.
+    """
+
+def build_batch_prompt(topics):
+    topic_list = "\n".join(f'    {i}. "{t}"' for i, t in enumerate(topics, 1))
+    return f"""
+    You are a senior investigative journalist with deep expertise in breaking news. Write {len(topics)} SEPARATE, COMPREHENSIVE, ORIGINAL articles, one for each topic below:
+{topic_list}
     
-    Tone: Professional, authoritative, slightly provocative (financial/tech journalism style).
+    Apply ALL of the following rules to EACH article independently (every article must be full length):
+    {ARTICLE_GUIDELINES}
+    **Output Format** (repeat for every article, in the order listed):
+    {ARTICLE_START.format(n="N")}
+    The Title
+    {SEPARATOR}
+    The HTML Content
+    {ARTICLE_END.format(n="N")}
+    
+    **CRITICAL**: 
+    - Do NOT output JSON. 
+    - Replace N with the topic number. Ensure the markers and "{SEPARATOR}" are exact.
     """
 
-    # Models to try (Verified available via check_models.py)
-    # Using 2.5 and 2.0 family as 1.5 appears deprecated/unavailable for this key
-    models_to_try = [
-        'gemini-2.0-flash',       # Fast, generally high limits
-        'gemini-2.0-flash-lite',  # Lite version, very efficient
-        'gemini-2.5-flash',       # Newest Flash model
-        'gemini-flash-latest',    # Alias for latest stable flash
-        'gemini-2.5-pro'          # High quality fallback
-    ]
+class MalformedOutput(Exception):
+    """The model is answering in the wrong format (JSON, markdown, no separator)."""
+
+def clean_content(content):
+    # Cleanup markdown code blocks if model adds them
+    content = content.strip()
+    if content.startswith("```html"): content = content[7:]
+    if content.startswith("```"): content = content[3:]
+    if content.endswith("```"): content = content[:-3]
     
-    current_key_idx = 0
-    current_model_idx = 0
+    # CLEANUP: Apply regex to remove "An image depicting..." and fix [IMAGE}
+    content = re.sub(r'\((?:An|The|A) image depicting.*?\)', '', content, flags=re.IGNORECASE)
+    content = re.sub(r'\[IMAGE\}', '[IMAGE]', content, flags=re.IGNORECASE)
+    return content.strip()
+
+def parse_response(raw_text):
+    """Splits "Title |||SEPARATOR||| <html>" into {title, content}."""
+    raw_text = raw_text.strip()
+    
+    # Parse Delimiter Format
+    if SEPARATOR in raw_text:
+        parts = raw_text.split(SEPARATOR)
+        if len(parts) >= 2:
+            return {"title": parts[0].strip(), "content": clean_content(parts[1])}
+    
+    # Fallback if separator missing (rare)
+    print(f"[!] Warning: Separator missing. Trying heuristic parse.")
+    lines = raw_text.split('\n')
+    title = lines[0].strip()
+    content = '\n'.join(lines[1:]).strip()
+    return {"title": title, "content": clean_content(content)}
+
+def check_partial(text):
+    """
+    Validates a partially streamed response. Raises MalformedOutput as soon
+    as it's clear the output can't be used, so we stop paying for tokens.
+    Returns the title once the separator has arrived, else None.
+    """
+    head = text.lstrip()
+    if head.startswith("{") or head.startswith("```json"):
+        raise MalformedOutput("model answered with JSON")
+
+    if SEPARATOR not in text:
+        if len(text) > STREAM_SEPARATOR_CHARS:
+            raise MalformedOutput(f"no separator after {len(text)} chars")
+        return None
+
+    title, _, body = text.partition(SEPARATOR)
+    body = body.lstrip()
+    if body.startswith("```html"):
+        body = body[7:].lstrip()
+    # Markdown headings / bold-as-heading instead of HTML
+    if re.match(r'(#{1,6} |\*\*)', body):
+        raise MalformedOutput("article body is markdown, not HTML")
+    if len(body) > STREAM_HTML_CHARS and '<' not in body[:STREAM_HTML_CHARS]:
+        raise MalformedOutput("article body has no HTML tags")
+    return title.strip()
+
+class Cancelled(Exception):
+    """Raised inside a hedged call whose sibling already answered."""
+
+def _request_options(timeout):
+    return {'request_options': {'timeout': timeout}} if timeout else {}
+
+def _stream_text(model, prompt, on_title=None, cancel=None, timeout=None):
+    """
+    Consumes generate_content(stream=True), validating as chunks arrive.
+    Stops early when `cancel` (threading.Event) is set or after `timeout` seconds.
+    """
+    stop_at = time.time() + timeout if timeout else None
+    response = model.generate_content(prompt, stream=True, **_request_options(timeout))
+    text = ""
+    title = None
+    body_checked = False
+    try:
+        for chunk in response:
+            if cancel is not None and cancel.is_set():
+                raise Cancelled()
+            if stop_at is not None and time.time() > stop_at:
+                raise TimeoutError(f"no answer within {timeout:.0f}s")
+            try:
+                text += chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. safety metadata only)
+                continue
+            if body_checked:
+                continue
+            found = check_partial(text)
+            if found is not None and title is None:
+                title = found
+                if on_title:
+                    on_title(title)
+            # Once the start of the body looks like HTML, stop re-checking
+            if title is not None and len(text.partition(SEPARATOR)[2]) > STREAM_HTML_CHARS:
+                body_checked = True
+    except (MalformedOutput, Cancelled, TimeoutError):
+        # Stop the server-side generation instead of draining the stream
+        iterator = getattr(response, '_iterator', None)
+        if hasattr(iterator, 'cancel'):
+            iterator.cancel()
+        raise
+    return text
+
+def _attempt(pair_router, pair, prompt, parse, stream, on_title=None, cancel=None, timeout=None):
+    """One call on one (key, model) pair. Returns the parsed result or raises."""
+    key, model_name = pair
+    # Cached, key-scoped model handle (no global genai.configure per attempt)
+    model = gemini_clients.get_model(key, model_name)
+
+    # We remove response_mime_type="application/json" to get raw text
+    started = time.time()
+    if stream:
+        raw_text = _stream_text(model, prompt, on_title=on_title, cancel=cancel, timeout=timeout)
+    else:
+        raw_text = model.generate_content(prompt, **_request_options(timeout)).text
+    result = parse(raw_text)
+    pair_router.record_success(key, model_name, time.time() - started)
+    if cancel is not None and cancel.is_set():
+        raise Cancelled()
+    return result
+
+def _attempt_hedged(pair_router, primary, exclude, prompt, parse, stream, on_title=None, timeout=None):
+    """
+    Runs the primary pair and, if it's still going after its model's p90
+    latency (GEMINI_HEDGE_AFTER until there's data), a backup on the
+    next-fastest pair. The first valid answer wins and the other call is
+    cancelled. Returns (result, winning pair, [(pair, error), ...]).
+    """
+    delay = pair_router.latency_percentile(primary[1]) or HEDGE_AFTER
+    pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+    cancels = {primary: threading.Event()}
+    futures = {pool.submit(_attempt, pair_router, primary, prompt, parse, stream, on_title, cancels[primary], timeout): primary}
+    failures = []
+    try:
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            backup = pair_router.pick(exclude=set(exclude) | {primary}, prefer_fast=True)
+            # Hedging is optional: only if the backup's key has a request to spare right now
+            if backup and rate_limiter.get_limiter().try_acquire('gemini', backup[0]):
+                print(f"   [i] {primary[1]} past {delay:.0f}s. Hedging with {backup[1]} (Key: {backup[0][:5]}...)")
+                cancels[backup] = threading.Event()
+                futures[pool.submit(_attempt, pair_router, backup, prompt, parse, stream, on_title, cancels[backup], timeout)] = backup
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pair = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures.append((pair, e))
+                    continue
+                for other, event in cancels.items():
+                    if other != pair:
+                        event.set()
+                return result, pair, failures
+        return None, None, failures
+    finally:
+        # Don't wait for a cancelled stream to notice
+        pool.shutdown(wait=False)
+
+class InFlight:
+    """
+    (key, model) pairs that sibling workers are calling right now. The
+    router ranks by health and model order, so without this every parallel
+    section would pick the same top pair and queue on one key's quota.
+    """
+
+    def __init__(self):
+        self._pairs = {}
+        self._lock = threading.Lock()
+
+    def claim(self, pick):
+        """pick(exclude) -> pair or None. Prefers a pair no one else is using; shares one only if nothing else is free."""
+        with self._lock:
+            pair = pick(set(self._pairs)) or pick(set())
+            if pair:
+                self._pairs[pair] = self._pairs.get(pair, 0) + 1
+            return pair
+
+    def release(self, pair):
+        with self._lock:
+            if self._pairs.get(pair, 0) > 1:
+                self._pairs[pair] -= 1
+            else:
+                self._pairs.pop(pair, None)
+
+def generate_text(prompt, parse, stream=None, on_title=None, label="article", exclude_models=(), hedge=None,
+                  deadline=None, in_flight=None):
+    """
+    Sends `prompt` to the healthiest key/model pair (see router.py) until
+    `parse(raw_text)` accepts an answer. parse may raise MalformedOutput to
+    reject output and rotate to a different model. Returns (result, model)
+    or (None, None) when every key/model is exhausted. exclude_models skips
+    models already known to give bad results for this prompt.
+    hedge (default GEMINI_HEDGE) races a backup pair against slow calls.
+    Each call's timeout is GEMINI_CALL_TIMEOUT capped by what's left of
+    `deadline`; raises deadline.DeadlineExceeded once the budget is gone.
+    in_flight (an InFlight shared by parallel callers) steers this call away
+    from pairs its siblings are already using.
+    """
+    # Load all available keys
+    keys = list(load_keys())
+        
+    if not keys:
+        print("Missing Gemini API Key(s)")
+        return None, None
+
+    if stream is None:
+        stream = os.getenv("GEMINI_STREAM", "1") == "1"
+    if hedge is None:
+        hedge = HEDGE
+    deadline = deadline or Deadline()
+
+    if on_title and hedge:
+        # Both racing calls stream a title; only report the first
+        reported = threading.Event()
+        user_on_title = on_title
+
+        def on_title(title):
+            if not reported.is_set():
+                reported.set()
+                user_on_title(title)
+
+    # Retry parameters
+    max_retries = 3
+
+    # Router hands out the healthiest (key, model) pair based on shared, persisted state
+    pair_router = router.get_router(keys, MODELS)
+    tried = {(k, m) for k in keys for m in exclude_models}
+    if len(tried) >= len(keys) * len(MODELS):
+        tried = set()
     
     # Try all keys x all models
-    total_attempts = len(keys) * len(models_to_try) * max_retries
+    total_attempts = len(keys) * len(MODELS) * max_retries
     
+    def pick(busy):
+        return pair_router.pick(exclude=tried | busy, prefer_fast=PREFER_FAST)
+
+    failed_passes = 0
     for attempt in range(total_attempts):
+        pair = in_flight.claim(pick) if in_flight else pick(set())
+        if pair is None:
+            # Everything left is cooling down; wait for the earliest pair if it's soon
+            wait_for = pair_router.seconds_until_available()
+            if wait_for is None or wait_for > MAX_COOLDOWN_WAIT:
+                print("[!] All key/model pairs are cooling down.")
+                break
+            untried = pair_router.seconds_until_available(exclude=tried) if tried and not wait_for else None
+            if untried and untried <= MAX_COOLDOWN_WAIT:
+                # Pairs this prompt hasn't tried yet are cooling down or being probed by another
+                # caller: wait for them rather than count a failed pass (and keep skipping the failed ones)
+                print(f"   [i] Untried pairs reopen in {untried:.0f}s. Waiting...")
+                time.sleep(deadline.timeout(untried, what=label))
+                continue
+            if not wait_for:
+                # Nothing is cooling: every pair already failed this prompt. Retrying at once
+                # would just repeat the same failures, so back off and give up after a few passes.
+                failed_passes += 1
+                if failed_passes >= max_retries:
+                    print(f"[!] Every key/model pair failed {failed_passes} passes.")
+                    break
+                wait_for = min(PASS_BACKOFF * 2 ** (failed_passes - 1), MAX_COOLDOWN_WAIT)
+                print(f"   [i] Every pair failed this pass. Retrying in {wait_for:.0f}s...")
+            else:
+                print(f"   [i] All pairs cooling down. Waiting {wait_for:.0f}s for the next one...")
+            time.sleep(deadline.timeout(wait_for, what=label))
+            tried.clear()
+            continue
+
         try:
-            # Configure with current key
-            current_key = keys[current_key_idx]
-            current_model_name = models_to_try[current_model_idx]
-            
-            genai.configure(api_key=current_key)
-            model = genai.GenerativeModel(current_model_name)
-            
-            # We remove response_mime_type="application/json" to get raw text
-            response = model.generate_content(prompt)
-            
-            raw_text = response.text.strip()
-            
-            # Parse Delimiter Format
-            if "|||SEPARATOR|||" in raw_text:
-                parts = raw_text.split("|||SEPARATOR|||")
-                if len(parts) >= 2:
-                    title = parts[0].strip()
-                    content = parts[1].strip()
-                    # Cleanup markdown code blocks if model adds them
-                    if content.startswith("```html"): content = content[7:]
-                    if content.startswith("```"): content = content[3:]
-                    if content.endswith("```"): content = content[:-3]
-                    
-                    # CLEANUP: Apply regex to remove "An image depicting..." and fix [IMAGE}
-                    import re
-                    content = re.sub(r'\((?:An|The|A) image depicting.*?\)', '', content, flags=re.IGNORECASE)
-                    content = re.sub(r'\[IMAGE\}', '[IMAGE]', content, flags=re.IGNORECASE)
-
-                    return {"title": title, "content": content.strip()}
-            
-            # Fallback if separator missing (rare)
-            print(f"[!] Warning: Separator missing. Trying heuristic parse.")
-            lines = raw_text.split('\n')
-            title = lines[0].strip()
-            content = '\n'.join(lines[1:]).strip()
-            
-            # CLEANUP: Apply regex to remove "An image depicting..." and fix [IMAGE}
-            import re
-            content = re.sub(r'\((?:An|The|A) image depicting.*?\)', '', content, flags=re.IGNORECASE)
-            content = re.sub(r'\[IMAGE\}', '[IMAGE]', content, flags=re.IGNORECASE)
-            
-            return {"title": title, "content": content}
-            
-        except Exception as e:
+            # Per-key requests-per-minute bucket (see rate_limiter.py) instead of fixed pauses
+            rate_limiter.get_limiter().acquire('gemini', pair[0], deadline=deadline)
+            timeout = deadline.timeout(CALL_TIMEOUT or None, what=label)
+            if hedge:
+                result, winner, failures = _attempt_hedged(pair_router, pair, tried, prompt, parse, stream, on_title,
+                                                           timeout=timeout)
+            else:
+                try:
+                    result, winner, failures = _attempt(pair_router, pair, prompt, parse, stream, on_title,
+                                                        timeout=timeout), pair, []
+                except Exception as e:
+                    result, winner, failures = None, None, [(pair, e)]
+        finally:
+            if in_flight:
+                in_flight.release(pair)
+
+        for (current_key, current_model_name), e in failures:
+            if isinstance(e, MalformedOutput):
+                print(f"[⚠️] Bad {label} from {current_model_name}: {e}. Aborted early.")
+                pair_router.record_failure(current_key, current_model_name, f"malformed output: {e}")
+                # The format problem is the model's, not the key's: skip this model on every key
+                tried.update((k, current_model_name) for k in keys)
+                if len(tried) >= len(keys) * len(MODELS):
+                    tried.clear()
+                continue
+
             error_msg = str(e)
             print(f"[⚠️] Error with {current_model_name} (Key: {current_key[:5]}...): {error_msg[:100]}...")
-            
-            # For ANY error (429, 404, 500, etc), we should probably try the next model/key 
-            # instead of giving up immediately, especially for 404s.
-            
-            # logic: Rotate Model first, then Key
-            current_model_idx += 1
-            if current_model_idx >= len(models_to_try):
-                current_model_idx = 0
-                current_key_idx = (current_key_idx + 1) % len(keys)
-                print(f"   [↻] Switching to next KEY: {keys[current_key_idx][:5]}...")
-            
-            print(f"   [↻] Retrying with Model: {models_to_try[current_model_idx]}...")
-            
-            time.sleep(2) # Brief pause
-            continue
+
+            # For ANY error (429, 404, 500, timeout, etc) the router records it (cooldown / breaker)
+            # and we go straight to the next healthiest pair instead of walking the list.
+            kind = pair_router.record_failure(current_key, current_model_name, e)
+            if kind == 'rate_limited':
+                # Slow this key down for every model, not just this pair
+                rate_limiter.get_limiter().throttle('gemini', current_key,
+                                                    retry_after=router.parse_retry_after(error_msg))
+            tried.add((current_key, current_model_name))
+            print(f"   [↻] {kind}: rotating to next healthy key/model...")
+
+        if winner:
+            return result, winner[1]
     
     print("[!] All keys/models exhausted or max retries reached.")
-    return None
+    return None, None
+
+def quality_gate(post):
+    """
+    Runs the shared validator (one parse) on a fresh article. Formatting slips
+    are repaired in place; returns (post, remaining issues).
+    """
+    issues = validator.find_issues(post['content'], draft=True)
+    if issues:
+        repaired = validator.repair(post['content'])
+        if repaired != post['content']:
+            repaired_issues = validator.find_issues(repaired, draft=True)
+            if len(repaired_issues) < len(issues):
+                print(f"   [+] Repaired formatting in place ({len(issues) - len(repaired_issues)} issue(s) fixed).")
+                post = {**post, "content": repaired}
+                issues = repaired_issues
+    return post, issues
+
+def generate_post(topic, stream=None, on_title=None, use_cache=True, deadline=None):
+    """
+    Writes one article. Returns {"title", "content"} or None.
+    With streaming (GEMINI_STREAM=1, default) on_title(title) fires as soon
+    as the title line arrives, and malformed output is aborted mid-stream.
+    Articles are cached by (PROMPT_VERSION, topic, model); pass
+    use_cache=False or set GEN_CACHE_BYPASS=1 to force a fresh generation.
+    GEMINI_GENERATION_MODE=sectional writes the sections in parallel (see
+    generate_post_sectional), falling back to a single request on failure.
+    deadline bounds the whole thing (quality retries stop when it runs low).
+    """
+    cache = gen_cache.get_cache() if use_cache and os.getenv("GEN_CACHE_BYPASS", "0") != "1" else None
+    if cache:
+        post, model_name = cache.get(PROMPT_VERSION, topic, MODELS)
+        if post:
+            print(f"   [i] Using cached article for '{topic}' ({model_name}). No LLM call.")
+            if on_title:
+                on_title(post['title'])
+            return post
+
+    deadline = deadline or Deadline()
+    best = None
+    tried_models = set()
+    for attempt in range(1 + QUALITY_RETRIES):
+        if best and deadline.expired():
+            print("   [i] Out of time for another quality retry.")
+            break
+        post = None
+        if GENERATION_MODE == "sectional" and attempt == 0:
+            post, model_name = generate_post_sectional(topic, deadline=deadline)
+            if post and on_title:
+                on_title(post['title'])
+        if not post:
+            post, model_name = generate_text(build_prompt(topic), parse_response, stream=stream,
+                                             on_title=on_title if attempt == 0 else None,
+                                             exclude_models=tried_models, deadline=deadline)
+        if not post:
+            break
+        
+        # Inline quality gate: same checks the auditor runs, so bad articles aren't published then rebuilt
+        post, issues = quality_gate(post)
+        if best is None or len(issues) < len(best[2]):
+            best = (post, model_name, issues)
+        if not issues:
+            break
+        print(f"   [!] Quality gate failed ({model_name}): {', '.join(issues)}")
+        tried_models.add(model_name)
+        if attempt < QUALITY_RETRIES:
+            print("   [↻] Regenerating with a different model...")
+
+    if not best:
+        return None
+    post, model_name, issues = best
+    if issues:
+        # Not cached: the next attempt (or the auditor's rebuild) should regenerate, not reuse it
+        print(f"   [!] Using best available article despite: {', '.join(issues)}")
+    elif cache:
+        cache.put(PROMPT_VERSION, topic, model_name, post)
+    return post
+
+def forget_post(topic):
+    """Drops cached articles for a topic (e.g. once it's been published successfully)."""
+    gen_cache.get_cache().invalidate(PROMPT_VERSION, topic, MODELS)
+
+def parse_batch_response(raw_text, count):
+    """
+    Splits a batched answer into {index: post}. Each article is validated on
+    its own; missing or broken ones are simply absent from the result.
+    """
+    posts = {}
+    pattern = re.compile(r'\|\|\|ARTICLE (\d+)\|\|\|(.*?)(?=\|\|\|END ARTICLE \d+\|\|\||\|\|\|ARTICLE \d+\|\|\||\Z)', re.DOTALL)
+    for m in pattern.finditer(raw_text):
+        idx = int(m.group(1)) - 1
+        chunk = m.group(2)
+        if idx < 0 or idx >= count or idx in posts or SEPARATOR not in chunk:
+            continue
+        title, _, body = chunk.partition(SEPARATOR)
+        post = {"title": title.strip(), "content": clean_content(body)}
+        words = len(re.sub(r'<[^>]+>', ' ', post['content']).split())
+        if not post['title'] or '<' not in post['content'] or words < BATCH_MIN_WORDS:
+            print(f"   [!] Batched article {idx + 1} rejected ({words} words).")
+            continue
+        posts[idx] = post
+    if not posts:
+        raise MalformedOutput("no valid articles in batched response")
+    return posts
+
+def generate_posts(topics, batch_size=None, use_cache=True, deadline=None):
+    """
+    Writes articles for several topics with fewer, larger requests: topics are
+    packed batch_size at a time (GEMINI_BATCH_SIZE) into one prompt that
+    carries the guidelines once. Articles that fail to parse/validate fall back
+    to single-topic generate_post calls. Returns a list aligned with topics
+    (None where generation failed or the deadline ran out).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    results = [None] * len(topics)
+    cache = gen_cache.get_cache() if use_cache and os.getenv("GEN_CACHE_BYPASS", "0") != "1" else None
+
+    pending = []
+    for i, topic in enumerate(topics):
+        post = cache.get(PROMPT_VERSION, topic, MODELS)[0] if cache else None
+        if post:
+            print(f"   [i] Using cached article for '{topic}'. No LLM call.")
+            results[i] = post
+        else:
+            pending.append(i)
+
+    if batch_size > 1:
+        for start in range(0, len(pending), batch_size):
+            group = pending[start:start + batch_size]
+            if len(group) < 2:
+                break
+            group_topics = [topics[i] for i in group]
+            print(f"   [i] Generating {len(group)} articles in one request...")
+            try:
+                posts, model_name = generate_text(
+                    build_batch_prompt(group_topics),
+                    lambda raw, n=len(group): parse_batch_response(raw, n),
+                    stream=False, label="batch", deadline=deadline)
+            except DeadlineExceeded as e:
+                print(f"   [!] {e}. Leaving the remaining topics for the next run.")
+                return results
+            for local_idx, post in (posts or {}).items():
+                i = group[local_idx]
+                post, issues = quality_gate(post)
+                if issues:
+                    print(f"   [!] Batched article {local_idx + 1} failed quality gate: {', '.join(issues)}")
+                    continue
+                results[i] = post
+                if cache:
+                    cache.put(PROMPT_VERSION, topics[i], model_name, post)
+
+    # Single-topic fallback only for what the batch didn't deliver
+    for i in pending:
+        if results[i] is None:
+            try:
+                results[i] = generate_post(topics[i], use_cache=use_cache, deadline=deadline)
+            except DeadlineExceeded as e:
+                print(f"   [!] {e}. Leaving the remaining topics for the next run.")
+                break
+    return results
+
+def build_outline_prompt(topic):
+    section_lines = "\n".join(f"    {name}: <3-5 short bullet notes separated by ';'>" for name, _, _ in SECTIONS)
+    return f"""
+    You are a senior investigative journalist with deep expertise in breaking news. Plan an article about: "{topic}".
+    The full article will follow these rules:
+    {ARTICLE_GUIDELINES}
+    Right now write ONLY the opening and the plan for the remaining sections.
+    
+    **Output Format**: 
+    - First line: The Title
+    - Second line: "{SEPARATOR}"
+    - Then the HTML opening: <h2>Key Takeaways</h2> with 4-5 <li> bullets, then the line [IMAGE], then a 2-3 paragraph introduction (<p>).
+    - Then the line "{OUTLINE_MARKER}"
+    - Then exactly one line per section, in this form:
+{section_lines}
+    
+    **CRITICAL**: Do NOT output JSON or markdown. Ensure "{SEPARATOR}" and "{OUTLINE_MARKER}" are exact.
+    """
+
+def build_section_prompt(topic, title, takeaways, name, words, instructions, notes):
+    return f"""
+    You are a senior investigative journalist writing one section of an article titled "{title}" (topic: "{topic}").
+    What the article covers so far:
+    {takeaways}
+    
+    Write ONLY the section "<h2>{name}</h2>": {instructions}
+    Planned coverage: {notes}
     
-    print("[!] All keys exhausted or max retries reached.")
-    return None
+    **Rules**: about {words} words; demonstrate experience and expertise (specific examples, mechanisms,
+    confident expert opinion); short paragraphs (2-4 sentences). HTML only (<h2>, <h3>, <p>, <ul>, <li>,
+    <strong>, <em>), starting with <h2>{name}</h2>. No markdown, no JSON, no title, no other sections.
+    """
+
+def parse_outline(raw_text):
+    """Returns {title, head, notes: {section: notes}} or raises MalformedOutput."""
+    if SEPARATOR not in raw_text or OUTLINE_MARKER not in raw_text:
+        raise MalformedOutput("outline missing separator/outline marker")
+    title, _, rest = raw_text.strip().partition(SEPARATOR)
+    head, _, plan = rest.partition(OUTLINE_MARKER)
+    head = clean_content(head)
+    if not title.strip() or '<' not in head:
+        raise MalformedOutput("outline has no title or HTML opening")
+    notes = {}
+    for line in plan.strip().splitlines():
+        name, sep, text = line.partition(":")
+        if sep:
+            notes[name.strip().strip("*- ").lower()] = text.strip()
+    return {"title": title.strip(), "head": head, "notes": notes}
+
+def parse_section(raw_text, name, min_words=None):
+    html = clean_content(raw_text)
+    if '<' not in html:
+        raise MalformedOutput(f"section '{name}' is not HTML")
+    if len(re.sub(r'<[^>]+>', ' ', html).split()) < (min_words or SECTION_MIN_WORDS):
+        raise MalformedOutput(f"section '{name}' too short")
+    if not re.match(r'\s*<h2', html, flags=re.IGNORECASE):
+        html = f"<h2>{name}</h2>\n{html}"
+    return html
+
+def generate_sections(topic, title, names, context, notes=None, deadline=None):
+    """
+    Writes the named sections (from SECTION_SPECS) in parallel, each on its own
+    key/model pair. context is a short summary of the article so far.
+    Returns {name: html} for the sections that succeeded.
+    """
+    notes = notes or {}
+    in_flight = InFlight()
+
+    def write(name):
+        words, instructions = SECTION_SPECS[name]
+        prompt = build_section_prompt(topic, title, context, name, words, instructions,
+                                      notes.get(name.lower(), "Use your judgment."))
+        # Short sections (e.g. bullet-only Key Takeaways) get a proportionally lower floor
+        min_words = min(SECTION_MIN_WORDS, words // 2)
+        html, _ = generate_text(prompt, lambda raw: parse_section(raw, name, min_words),
+                                stream=False, label=f"section '{name}'", deadline=deadline,
+                                in_flight=in_flight)
+        return name, html
+
+    workers = int(os.getenv("GEMINI_SECTION_WORKERS", len(SECTION_SPECS)))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(names) or 1))) as pool:
+        return {name: html for name, html in pool.map(write, names) if html}
+
+def generate_post_sectional(topic, deadline=None):
+    """
+    Outline first (title, Key Takeaways, intro, section plan), then the H2
+    sections in parallel on different key/model pairs, stitched back into
+    the usual {title, content}. Wall-clock time is roughly outline + slowest
+    section instead of one long serial generation. Returns (post, model)
+    or (None, None); any failed section means falling back to single mode.
+    """
+    outline, model_name = generate_text(build_outline_prompt(topic), parse_outline, stream=False, label="outline",
+                                        deadline=deadline)
+    if not outline:
+        return None, None
+    print(f"   [i] Outline ready: '{outline['title']}'. Writing {len(SECTIONS)} sections in parallel...")
+    takeaways = re.sub(r'<[^>]+>', ' ', outline['head'].split('[IMAGE]')[0])
+    takeaways = " ".join(takeaways.split())
+
+    names = [name for name, _, _ in SECTIONS]
+    written = generate_sections(topic, outline['title'], names, takeaways, notes=outline['notes'], deadline=deadline)
+    sections = [written.get(name) for name in names]
+
+    if not all(sections):
+        failed = [name for name, html in zip(names, sections) if not html]
+        print(f"   [!] Sections failed ({', '.join(failed)}). Falling back to single-request generation.")
+        return None, None
+    return {"title": outline['title'], "content": "\n".join([outline['head']] + sections)}, model_name
@@ -3,12 +3,21 @@
 import os
 import time
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 import re
+from concurrent.futures import ProcessPoolExecutor
 import auth
 import content # Use existing Gemini logic, might need tweak
 import images
+import assembly
+import validator
+import http_client
+import url_check
+import audit_index
+import rate_limiter
+from deadline import Deadline, DeadlineExceeded, AUDIT_BUDGET, AUDIT_POST_BUDGET
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,14 +28,6 @@ if sys.platform.startswith('win'):
 
 BLOG_ID = os.getenv("BLOG_ID") # Logic to fetch if missing
 
-def count_words(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    text = soup.get_text()
-    return len(text.split())
-
-def has_images(html):
-    return "<img" in html
-
 def clean_html_from_text(text):
     if not text: return ""
     # Remove "An image depicting..." descriptions
@@ -36,10 +37,14 @@ def clean_html_from_text(text):
     return BeautifulSoup(text, 'html.parser').get_text().strip()
 
 def clean_labels(labels):
-    if not labels: return []
+    if not labels: return [], False
     cleaned = []
     changed = False
     for label in labels:
+        # Plain labels (the vast majority) have nothing to strip: skip the parse
+        if label and not any(c in label for c in "<>&[(") and label == label.strip():
+            cleaned.append(label)
+            continue
         new_label = clean_html_from_text(label)
         # Remove any stray tags or weird chars if BS4 missed them
         new_label = new_label.replace("<p>", "").replace("</p>", "").strip()
@@ -49,8 +54,46 @@ def clean_labels(labels):
             cleaned.append(new_label)
     return cleaned, changed
 
-def rebuild_post(service, blog_id, post):
+def fetch_new_images(title, needed_new_images, used_urls, deadline=None):
+    """Fetches up to needed_new_images images not already in used_urls (assembly.image dicts)."""
+    new_img_tags = []
+    if needed_new_images > 0:
+        print(f"   [i] Fetching {needed_new_images} new images to meet minimum requirement...")
+
+        # Distinct candidates from one search, skipping images the post already has
+        links = images.get_images(title, needed_new_images, exclude=used_urls, deadline=deadline)
+        for i, img_url in enumerate(links):
+            used_urls.add(img_url)
+            new_img_tags.append(assembly.image(img_url, alt=f"{title} image {i+1}"))
+            print(f"   [+] Fetched new image: {img_url[:30]}...")
+        if len(links) < needed_new_images:
+            print(f"   [!] Only found {len(links)}/{needed_new_images} new images")
+
+    return new_img_tags
+
+def is_dead_unsplash(src):
+    """source.unsplash.com links were shut down; images.unsplash.com hotlinks break too."""
+    return "source.unsplash.com" in src or "images.unsplash.com" in src
+
+def update_post(service, blog_id, post, html, deadline=None):
     title = post['title']
+    try:
+        post['content'] = html
+        post['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S.000-07:00') # Update timestamp?
+        # Actually Blogger handles timestamp updates usually.
+        
+        rate_limiter.execute(service.posts().update(blogId=blog_id, postId=post['id'], body=post), deadline=deadline)
+        print(f"   [+] Successfully updated: {title}")
+        # The cached article only exists to make failed updates cheap to retry
+        content.forget_post(title)
+        return True
+    except Exception as e:
+        print(f"   [!] Update failed: {e}")
+        return False
+
+def rebuild_post(service, blog_id, post, deadline=None):
+    title = post['title']
+    deadline = deadline or Deadline()
     print(f"   [Fix] Rebuilding: {title}...")
     
     # 1. Generate New Content (High Value)
@@ -58,18 +101,11 @@ def rebuild_post(service, blog_id, post):
     # Using content.generate_post might be enough if we tweak the prompt there?
     # Better to ask Gemini explicitly for "Long Form AdSense Safe" here.
     
-    new_data = content.generate_post(title) # Reuse for now, maybe custom prompt later
+    new_data = content.generate_post(title, deadline=deadline) # Reuse for now, maybe custom prompt later
     if not new_data:
         print("   [!] Generation failed.")
         return False
     
-    # CRITICAL: Add delay after API call to avoid rate limit bursts
-    print("   [i] Waiting 2s after content generation...")
-    time.sleep(2)
-        
-    print("   [i] Waiting 2s after content generation...")
-    time.sleep(2)
-        
     html = new_data['content']
     
     # CLEANUP: Remove AI artifacts before inserting images
@@ -81,35 +117,19 @@ def rebuild_post(service, blog_id, post):
     # 2. Handle Images Intelligently
     # PRESERVE ALL existing images from the old post
     old_html = post.get('content', '')
-    from bs4 import BeautifulSoup
-    old_soup = BeautifulSoup(old_html, 'html.parser')
-    existing_imgs = old_soup.find_all('img')
-    
-    # FILTER: Remove known broken images (Unsplash source deprecated)
-    import requests
+    existing_srcs = [img.get('src', '') for img in BeautifulSoup(old_html, 'html.parser').find_all('img')]
 
-    def validate_image_url(url):
-        try:
-            # Fake headers to avoid 403 Forbidden from some CDNs
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, right) Gecko/20100101 Firefox/89.0'}
-            r = requests.head(url, headers=headers, timeout=3)
-            # Some servers block HEAD, so try GET with stream if 405/403
-            if r.status_code in [405, 403]:
-                 r = requests.get(url, headers=headers, stream=True, timeout=3)
-                 r.close() # Close connection immediately
-            
-            return r.status_code == 200
-        except:
-            return False
+    # PING TEST: all of the post's images at once (cached across audit runs, see url_check.py)
+    reachable = url_check.get_checker().validate(
+        [src for src in existing_srcs if src.startswith('http') and not is_dead_unsplash(src)], deadline=deadline)
 
     # FILTER: Remove known broken images (Unsplash source deprecated) AND validate accessibility
     valid_existing_imgs = []
     has_broken_images = False
     
-    for img in existing_imgs:
-        src = img.get('src', '')
+    for src in existing_srcs:
         # Check for Unsplash broken links or very small generic icons (sometimes happen)
-        if "source.unsplash.com" in src or "images.unsplash.com" in src:
+        if is_dead_unsplash(src):
             print(f"   [-] Removing broken Unsplash image: {src[:30]}...")
             has_broken_images = True
             continue 
@@ -118,16 +138,14 @@ def rebuild_post(service, blog_id, post):
             print(f"   [-] Removing invalid image source: {src[:30]}...")
             continue
             
-        # PING TEST: Check if image is actually accessible
-        if not validate_image_url(src):
+        if not reachable.get(src):
             print(f"   [-] Removing inaccessible image (403/404): {src[:30]}...")
             has_broken_images = True
             continue
             
-        # Re-create tag with guaranteed styling to fix "not visible/bad format" issues
+        # Re-insert with guaranteed styling to fix "not visible/bad format" issues
         # We assume if it passed validation, the URL is good.
-        styled_tag = f'<img src="{src}" style="width:100%; border-radius:10px; margin: 20px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">'
-        valid_existing_imgs.append(styled_tag)
+        valid_existing_imgs.append(assembly.image(src))
 
     print(f"   [i] Found {len(valid_existing_imgs)} valid & accessible existing images.")
     if has_broken_images:
@@ -142,243 +160,307 @@ def rebuild_post(service, blog_id, post):
     # If we have 0, 2 - 0 = 2 needed.
     needed_new_images = max(0, target_images - len(existing_img_tags))
     
-    new_img_tags = []
     used_urls = set()
     
     # Add existing images to used set to avoid re-fetching them
-    for tag in existing_img_tags:
-        soup_temp = BeautifulSoup(tag, 'html.parser')
-        img_temp = soup_temp.find('img')
-        if img_temp and img_temp.get('src'):
-            used_urls.add(img_temp.get('src'))
+    for img in existing_img_tags:
+        used_urls.add(img['src'])
 
-    if needed_new_images > 0:
-        print(f"   [i] Fetching {needed_new_images} new images to meet minimum requirement...")
-        
-        # Query variations to ensure different images
-        variations = ["", " wallpaper", " visualization", " infographic", " background", " chart"]
-        
-        for i in range(needed_new_images):
-            # Create distinct query
-            variation = variations[i % len(variations)]
-            search_query = f"{title}{variation}"
-            
-            img_url = images.get_image(search_query)
-            
-            # Check for duplicates or invalid
-            if img_url and img_url not in used_urls:
-                used_urls.add(img_url)
-                
-                # Create styled image tag
-                new_tag = f'<img src="{img_url}" style="width:100%; border-radius:10px; margin: 20px 0; box-shadow: 0 4px 6px rgba(0,0,0,0.1);" alt="{title} image {i+1}">'
-                new_img_tags.append(new_tag)
-                print(f"   [+] Fetched new image: {img_url[:30]}...")
-            elif img_url:
-                 print(f"   [!] Skipped duplicate image: {img_url[:30]}...")
-            else:
-                print(f"   [!] Failed to fetch image {i+1}")
+    new_img_tags = fetch_new_images(title, needed_new_images, used_urls, deadline=deadline)
 
     # Combine all images available
     all_images_to_insert = existing_img_tags + new_img_tags
     
-    # Logic to insert them into the new HTML
+    # Insert them into the new HTML in a single parse (see assembly.py)
     # Position 1: Replace [IMAGE] placeholder or Top
-    # Position 2: Middle of content
-    # Position 3+: Evenly distributed
-    
-    soup = BeautifulSoup(html, 'html.parser')
+    # Position 2+: Evenly distributed after paragraphs
+    html = assembly.insert_images(html, all_images_to_insert)
+    print(f"   [+] Placed {len(all_images_to_insert)} images")
     
-    # Helper to insert image after a paragraph
-    def insert_after_paragraph(img_html, paragraph_index, soup_obj):
-        paragraphs = soup_obj.find_all('p')
-        if paragraphs and len(paragraphs) > paragraph_index:
-            p = paragraphs[paragraph_index]
-            new_tag = BeautifulSoup(img_html, 'html.parser')
-            p.insert_after(new_tag)
-            return True
+    if "<p" not in html:
+        print("   [!] Warning: Generated content missing paragraphs.")
+        # This is a fallback; content.py should handle this.
+             
+    # 3. Update Blogger
+    return update_post(service, blog_id, post, html, deadline=deadline)
+
+# Reasons that can be fixed without throwing the post away
+REPAIRABLE_REASONS = ("Too Short", "No Images", "Missing Expert Analysis", "Missing Structured Sections", "Noise:")
+# Below this there isn't enough good content worth keeping; rebuild instead
+REPAIR_MIN_WORDS = int(os.getenv("AUDIT_REPAIR_MIN_WORDS", 400))
+MAX_FIXES = int(os.getenv("AUDIT_MAX_FIXES", 30))
+# Scan phase lists metadata only (partial response); bodies are fetched for candidates
+SCAN_FIELDS = "nextPageToken,items(id,title,updated,labels,etag)"
+# posts.get calls per batch HTTP request
+BODY_BATCH = int(os.getenv("AUDIT_BODY_BATCH", 50))
+# Scoring processes (0 = score inline). With workers, the next page is listed and
+# fetched while the current one is scored.
+AUDIT_WORKERS = int(os.getenv("AUDIT_WORKERS", 0))
+
+def plan_repair(metrics, reasons):
+    """
+    Decides whether a low-value post can be fixed in place. Returns the
+    sections to write (may be empty, e.g. images only), or None when only a
+    full rebuild will do (broken structure, too thin, AUDIT_REPAIR=0).
+    """
+    if os.getenv("AUDIT_REPAIR", "1") != "1":
+        return None
+    if not all(r.startswith(REPAIRABLE_REASONS) for r in reasons):
+        return None
+    if metrics['words'] < REPAIR_MIN_WORDS:
+        return None
+
+    missing = validator.missing_sections(metrics)
+    plan = []
+    # The reasons come from find_issues' keyword test, which is stricter than the H2
+    # markers behind missing_sections (e.g. "Market Implications", "takeaways"). A
+    # reason always gets a section whose H2 passes that test, even if a marker matched.
+    if any(r.startswith("Missing Structured Sections") for r in reasons):
+        plan += [name for name in ("Key Takeaways", "FAQ") if name in missing] or ["FAQ"]
+    if any(r.startswith("Missing Expert Analysis") for r in reasons):
+        plan.append("Expert Analysis & Implications")
+
+    if any(r.startswith("Too Short") for r in reasons):
+        # Add missing sections until the expected length clears the minimum
+        words = metrics['words'] + sum(content.SECTION_SPECS[name][0] for name in plan)
+        for name in missing:
+            if words >= validator.MIN_WORDS:
+                break
+            if name not in plan:
+                plan.append(name)
+                words += content.SECTION_SPECS[name][0]
+        if words < validator.MIN_WORDS:
+            return None
+
+    order = [name for name, _ in validator.SECTION_MARKERS]
+    return sorted(plan, key=order.index)
+
+def repair_post(service, blog_id, post, metrics, plan, deadline=None):
+    """
+    Section-level fix: writes only the missing sections and splices them into
+    the existing HTML. Existing text and images are left as they are.
+    """
+    title = post['title']
+    html = post.get('content', '')
+    print(f"   [Fix] Repairing: {title} (+ {', '.join(plan) or 'images only'})...")
+
+    if plan:
+        # A short plain-text summary of what's already there keeps new sections consistent
+        context = " ".join(re.sub(r'<[^>]+>', ' ', html[:6000]).split()[:150])
+        written = content.generate_sections(title, title, plan, context, deadline=deadline)
+        if len(written) < len(plan):
+            failed = [name for name in plan if name not in written]
+            print(f"   [!] Section generation failed: {', '.join(failed)}")
+            return False
+        html = assembly.splice_sections(html, [(name, written[name]) for name in plan])
+        print(f"   [+] Spliced {len(plan)} new section(s) into the existing post")
+
+    needed_new_images = max(0, 2 - metrics['images'])
+    if needed_new_images or metrics['placeholders']:
+        new_imgs = fetch_new_images(title, needed_new_images, set(metrics['image_srcs']), deadline=deadline)
+        # Also strips any leftover [IMAGE] placeholders
+        html = assembly.insert_images(html, new_imgs)
+
+    if html == post.get('content', ''):
+        print("   [!] Repair changed nothing. Not updating.")
         return False
+    remaining = validator.find_issues(html)
+    # Missing images depend on search quota; anything else left means the plan fell short
+    unresolved = [r for r in remaining if r.startswith(REPAIRABLE_REASONS) and not r.startswith("No Images")]
+    if unresolved:
+        print(f"   [!] Still flagged after repair: {', '.join(unresolved)}. Falling back to a full rebuild.")
+        return rebuild_post(service, blog_id, post, deadline=deadline)
+    if remaining:
+        print(f"   [i] Still flagged after repair: {', '.join(remaining)}")
+    return update_post(service, blog_id, post, html, deadline=deadline)
 
-    # Insert Image 1 (First existing or First new)
-    if all_images_to_insert:
-        first_img = all_images_to_insert.pop(0)
-        if '[IMAGE]' in html:
-            html = html.replace('[IMAGE]', first_img)
-            print("   [+] Placed Image 1 at placeholder position")
-        else:
-            # If no placeholder, insert at top (after H1 if exists, else prepend)
-            # Actually prepend to body is easiest for "start"
-            html = first_img + html
-            print("   [+] Placed Image 1 at start")
-            
-    # Insert remaining images
-    if all_images_to_insert:
-        # Re-parse because we modified html string above (text replace)
-        # But wait, if we use soup for everything it's cleaner.
-        # Let's stick to simple text replace for the first one for speed/reliability with the placeholder
-        # Now use soup for the rest
-        soup = BeautifulSoup(html, 'html.parser')
-        paragraphs = soup.find_all('p')
-        p_count = len(paragraphs)
-        
-        imgs_remaining = len(all_images_to_insert)
-        
-        if p_count > 0:
-            # Calculate intervals
-            # If 1 image remaining: put in middle (index p_count // 2)
-            # If multiple: distribute
-            
-            for i, img_code in enumerate(all_images_to_insert):
-                # Distribute evenly. 
-                # Example: 10 headings. 2 images. 
-                # pos = (i + 1) * (count / (imgs + 1))
-                # i=0: 1 * (10/3) = 3.3 -> 3
-                # i=1: 2 * (10/3) = 6.6 -> 7
-                idx = int((i + 1) * (p_count / (imgs_remaining + 1)))
-                
-                # Create tag object
-                # Note: BeautifulSoup parsing of the img_code might add <html><body>
-                # So we extract the tag direct
-                img_soup = BeautifulSoup(img_code, 'html.parser')
-                img_tag_to_insert = img_soup.find('img')
-                
-                if img_tag_to_insert:
-                    if idx < len(paragraphs):
-                        paragraphs[idx].insert_after(img_tag_to_insert)
-                        print(f"   [+] Placed Image {i+2} after paragraph {idx}")
-                    else:
-                        # Append to end if calculation off
-                        soup.append(img_tag_to_insert)
-        
-        # Get final HTML
-        html = str(soup)
+def fetch_bodies(service, blog_id, post_ids):
+    """
+    Full posts for post_ids ({id: post}), BODY_BATCH posts.get calls per
+    batch HTTP request. Anything the batch didn't return is fetched one by
+    one; posts that still fail are left out (audited next run).
+    """
+    bodies = {}
+    def on_post(request_id, response, exception):
+        if exception is None:
+            bodies[request_id] = response
 
-    # Clean up any leftover [IMAGE] if we didn't have any images (rare)
-    # Also clean up potential "Image Credit:" lines that have no image
-    html = html.replace("[IMAGE]", "")
-    
-    # Final cleanup of noise
-    soup = BeautifulSoup(html, 'html.parser')
-    text = soup.get_text()
-    if "Image Credit:" in text and "<img" not in html:
-        # crude check, but okay for now
-        pass
+    post_ids = list(post_ids)
+    for start in range(0, len(post_ids), BODY_BATCH):
+        chunk = post_ids[start:start + BODY_BATCH]
+        try:
+            batch = service.new_batch_http_request(callback=on_post)
+            for post_id in chunk:
+                batch.add(service.posts().get(blogId=blog_id, postId=post_id), request_id=post_id)
+            # A batch counts as one request per post against the Blogger quota
+            rate_limiter.execute(batch, cost=len(chunk))
+        except Exception as e:
+            print(f"[!] Batch body fetch failed ({e}). Fetching one by one.")
+        for post_id in chunk:
+            if post_id not in bodies:
+                try:
+                    bodies[post_id] = rate_limiter.execute(service.posts().get(blogId=blog_id, postId=post_id))
+                except Exception as e:
+                    print(f"   [!] Could not fetch post {post_id}: {e}")
+    return bodies
+
+def load_page(service, blog_id, index, page_token, pool=None):
+    """
+    Lists one page of posts (metadata only), fetches the bodies of the ones
+    the index can't skip and starts scoring them: in `pool` when given
+    (returns at once, the page is scored in the background), inline otherwise.
+    Posts whose body hash is unchanged reuse their stored metrics.
+    """
+    # Metadata only: no bodies, and only the fields the index needs
+    posts = rate_limiter.execute(service.posts().list(
+        blogId=blog_id, 
+        maxResults=50, 
+        status=["LIVE"],
+        pageToken=page_token,
+        fetchBodies=False,
+        fields=SCAN_FIELDS
+    ))
+    items = posts.get('items', [])
     
-    # Ensure paragraphs
-    if not soup.find_all('p'):
-        print("   [!] Warning: Generated content missing paragraphs. Wrapping text.")
-        # This is a fallback; content.py should handle this.
-        # But if we really need to, we can wrap lines.
+    # Only posts that changed since they were last judged OK need their bodies
+    rows = {}
+    for stub in items:
+        row = index.get(stub['id'])
+        if not index.unchanged(stub, row):
+            rows[stub['id']] = row
+    bodies = fetch_bodies(service, blog_id, rows) if rows else {}
     
-    html = str(soup)
-             
-    # 3. Update Blogger
-    try:
-        post['content'] = html
-        post['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S.000-07:00') # Update timestamp?
-        # Actually Blogger handles timestamp updates usually.
-        
-        service.posts().update(blogId=blog_id, postId=post['id'], body=post).execute()
-        print(f"   [+] Successfully updated: {title}")
-        return True
-    except Exception as e:
-        print(f"   [!] Update failed: {e}")
-        return False
+    candidates = []
+    for stub in items:
+        post = bodies.get(stub['id'])
+        if post is None:
+            continue
+        html = post.get('content', '')
+        chash = audit_index.content_hash(html)
+        metrics = index.known_metrics(stub, chash, rows[stub['id']])
+        if metrics is None:
+            # Only the compact metrics record comes back from the worker
+            metrics = pool.submit(validator.analyze, html) if pool else validator.analyze(html)
+        candidates.append((stub, post, chash, metrics))
+    return {'items': items, 'next': posts.get('nextPageToken'), 'skipped': len(items) - len(rows),
+            'candidates': candidates}
+
+def cursor_rejected(error):
+    """True if Blogger refused the page token itself (400/404), as opposed to a transient failure."""
+    return isinstance(error, HttpError) and error.resp.status in (400, 404)
+
+def score_page(page):
+    """[(stub, post, metrics, reasons, plan, chash)] for a loaded page (waits for pool workers)."""
+    scored = []
+    for stub, post, chash, metrics in page['candidates']:
+        if not isinstance(metrics, dict):
+            try:
+                metrics = metrics.result()
+            except Exception as e:
+                # A crashed worker (BrokenProcessPool) shouldn't lose the page
+                print(f"   [!] Scoring worker failed ({e}). Scoring {post['title']} inline.")
+                metrics = validator.analyze(post.get('content', ''))
+        # Google AdSense 2026 Compliance Checks (shared with content.py, see validator.py)
+        reasons = validator.find_issues(metrics=metrics)
+        plan = plan_repair(metrics, reasons) if reasons else None
+        scored.append((stub, post, metrics, reasons, plan, chash))
+    return scored
 
 def run_audit():
     print("--- Starting Content Quality Audit (AdSense Fixer) ---")
-    
-    # CRITICAL: Wait 60s on startup to ensure rate limit window has reset
-    print("[...] Waiting 60 seconds to ensure rate limit window is clear...")
-    print("     (If you just ran this script, the API needs time to reset)")
-    time.sleep(60)
-    print("[+] Ready to begin!\n")
+    # No startup pause: the Blogger bucket (rate_limiter.py) is persisted, so a run
+    # started right after another one still waits for the quota it left behind
     
     creds = auth.authenticate()
     service = build('blogger', 'v3', credentials=creds)
     
     # Initialize counter
     fixed_count = 0
+    # Whole run (AUDIT_DEADLINE, 0 = unlimited) and per-post (AUDIT_POST_DEADLINE) time budgets
+    audit_deadline = Deadline(AUDIT_BUDGET, label="audit")
+    # The audit counts as one batch against today's image search quota
+    images.start_batch()
     
     # Get Blog ID
     if not BLOG_ID:
         # Fetch first blog
-        blogs = service.blogs().listByUser(userId='self').execute()
+        blogs = rate_limiter.execute(service.blogs().listByUser(userId='self'))
         my_blog_id = blogs['items'][0]['id']
         print(f"[i] Using Blog ID: {my_blog_id} ({blogs['items'][0]['name']})")
     else:
         my_blog_id = BLOG_ID
         
-    # List Posts
-    # List Posts with Pagination
+    # Index of already-judged posts + where the last run stopped (see audit_index.py)
+    index = audit_index.AuditIndex(blog_id=my_blog_id)
+    
+    # Parallel scoring mode for large blogs (AUDIT_WORKERS processes)
+    pool = ProcessPoolExecutor(max_workers=AUDIT_WORKERS) if AUDIT_WORKERS > 0 else None
+    if pool:
+        print(f"[i] Scoring posts in {AUDIT_WORKERS} worker processes.")
+    
+    # List Posts with Pagination, resuming from the persisted cursor
     try:
-        page_token = None
-        total_scanned = 0
-        total_limit = 200 # Safety limit to avoid infinite loops, scan last 200 posts
+        page_token, total_scanned = index.load_cursor()
+        if page_token:
+            print(f"[i] Resuming audit after {total_scanned} posts scanned last time.")
+        skipped_unchanged = 0
+        page = None
+        resuming = bool(page_token)
         
-        while fixed_count < 30:
-            posts = service.posts().list(
-                blogId=my_blog_id, 
-                maxResults=50, 
-                status=["LIVE"],
-                pageToken=page_token
-            ).execute()
+        while fixed_count < MAX_FIXES:
+            if audit_deadline.expired():
+                print("[!] Audit deadline reached. Stopping here.")
+                break
+            if page is None:
+                try:
+                    page = load_page(service, my_blog_id, index, page_token, pool)
+                    resuming = False
+                except Exception as e:
+                    # 5xx / network errors keep the cursor (rate limits are retried in rate_limiter.execute):
+                    # the next run resumes from the same page
+                    if not resuming or not cursor_rejected(e):
+                        raise
+                    # Saved page tokens can go stale; start a fresh pass from the newest post
+                    print(f"[i] Saved cursor rejected ({e}). Starting from the newest post.")
+                    page_token, total_scanned, resuming = None, 0, False
+                    index.save_cursor(None, 0)
+                    continue
             
-            items = posts.get('items', [])
+            items = page['items']
             if not items:
                 print("[i] No more posts found.")
+                index.save_cursor(None, 0)
                 break
                 
             print(f"[i] Scanning batch... (Posts {total_scanned+1} to {total_scanned+len(items)})")
+            if page['skipped']:
+                skipped_unchanged += page['skipped']
+                print(f"[i] {page['skipped']} unchanged post(s) skipped.")
             
-            for post in items:
+            # Workers are scoring this page: list and fetch the next one meanwhile
+            upcoming = None
+            if pool and page['next']:
+                try:
+                    upcoming = load_page(service, my_blog_id, index, page['next'], pool)
+                except Exception as e:
+                    print(f"[!] Prefetching the next page failed ({e}). Will retry after this one.")
+            scored = score_page(page)
+
+            # Posts headed for a full rebuild keep their reachable images: check the
+            # whole page's worth concurrently now so each rebuild hits the cache
+            srcs = [src for _, _, metrics, reasons, plan, _ in scored if reasons and plan is None
+                    for src in metrics['image_srcs'] if src.startswith('http') and not is_dead_unsplash(src)]
+            if srcs:
+                try:
+                    url_check.get_checker().validate(srcs, deadline=audit_deadline)
+                except DeadlineExceeded:
+                    pass  # each rebuild re-checks under its own budget
+
+            # The index is keyed on what the listing reports (stub), so the next scan can compare
+            for stub, post, metrics, reasons, plan, chash in scored:
                 title = post['title']
-                content_html = post.get('content', '')
-                
-                w_count = count_words(content_html)
-                has_img = has_images(content_html)
-                
-                is_low_value = False
-                reasons = []
-                
-                # Google AdSense 2026 Compliance Checks
-                # Minimum word count (800-1500 recommended)
-                if w_count < 1000:
-                    is_low_value = True
-                    reasons.append(f"Too Short ({w_count} words, need 1000+)")
-                
-                # Must have images for engagement
-                if not has_img:
-                    is_low_value = True
-                    reasons.append("No Images")
-                    
-                # E-E-A-T: Check for Expert Analysis/Unique Perspective
-                has_analysis = any(keyword in content_html for keyword in ["Analysis", "Why This Matters", "Our Perspective", "Expert"])
-                if not has_analysis:
-                    is_low_value = True
-                    reasons.append("Missing Expert Analysis (E-E-A-T)")
-                
-                # Check for structured content (FAQ, Key Takeaways)
-                has_structure = any(keyword in content_html for keyword in ["FAQ", "Key Takeaways", "What's Next"])
-                if not has_structure:
-                    is_low_value = True
-                    reasons.append("Missing Structured Sections (FAQ/Takeaways)")
-                
-                # Check for proper HTML headings (H2, H3)
-                has_headings = "<h2" in content_html or "<h3" in content_html
-                if not has_headings:
-                    is_low_value = True
-                    reasons.append("Poor Formatting (No H2/H3 headings)")
-
-                # Check for Paragraphs (Structure)
-                has_paragraphs = "<p" in content_html
-                if not has_paragraphs:
-                    is_low_value = True
-                    reasons.append("Structure: No Paragraphs (<p>) found")
-
-                # Check for 'Noise' ([IMAGE] placeholder)
-                if "[IMAGE]" in content_html:
-                    is_low_value = True
-                    reasons.append("Noise: Found '[IMAGE]' placeholder")
+                w_count = metrics['words']
+                is_low_value = bool(reasons)
                 
                 # Check Labels
                 current_labels = post.get('labels', [])
@@ -391,43 +473,70 @@ def run_audit():
                     # If not low value, we should update just the labels
                     if not is_low_value:
                         try:
-                            service.posts().update(blogId=my_blog_id, postId=post['id'], body=post).execute()
+                            rate_limiter.execute(service.posts().update(blogId=my_blog_id, postId=post['id'], body=post),
+                                                 deadline=audit_deadline)
                             print(f"   [+] Labels updated.")
                             fixed_count += 1
                         except Exception as e:
                             print(f"   [!] Label update failed: {e}")
+                            # Not OK yet: look at it again next run
+                            index.record(stub, audit_index.LOW_VALUE, metrics, ["Labels"], chash=chash)
+                            continue
 
                 if is_low_value:
                     print(f"[Low Value] {title} -> {', '.join(reasons)}")
-                    success = rebuild_post(service, my_blog_id, post)
+                    # Fix only what's missing when possible; full regeneration otherwise
+                    post_deadline = audit_deadline.child(AUDIT_POST_BUDGET, label="post")
+                    try:
+                        if plan is not None:
+                            success = repair_post(service, my_blog_id, post, metrics, plan, deadline=post_deadline)
+                        else:
+                            success = rebuild_post(service, my_blog_id, post, deadline=post_deadline)
+                    except DeadlineExceeded as e:
+                        print(f"   [!] {e}. Skipping: {title}")
+                        index.record(stub, audit_index.LOW_VALUE, metrics, reasons, chash=chash)
+                        if audit_deadline.expired():
+                            print(f"\n[!] Audit deadline reached. Total fixed this run: {fixed_count}")
+                            return
+                        success = False
+                    index.record(stub, audit_index.FIXED if success else audit_index.LOW_VALUE, metrics, reasons,
+                                 chash=chash)
                     if success:
                         fixed_count += 1
                         print(f"[+] Fixed {fixed_count} posts so far")
-                        print("[i] Sleeping 5s between posts for safe rate limiting...")
-                        time.sleep(5)  # Conservative: ~10/min accounting for internal delays
                     else:
-                        print("[!] Fix failed. Sleeping 15s before retry...")
-                        time.sleep(15)
+                        # Pacing comes from the Gemini/Blogger/Search buckets, not a fixed pause
+                        print("[!] Fix failed. Moving on to the next post.")
                     
-                    # Batch limit: 30 posts per run (safe daily quota management)
-                    if fixed_count >= 30:
-                        print(f"\n[!] Reached target (30 posts improved). Job's done for now.")
+                    # Batch limit: AUDIT_MAX_FIXES posts per run (safe daily quota management)
+                    if fixed_count >= MAX_FIXES:
+                        print(f"\n[!] Reached target ({MAX_FIXES} posts improved). Job's done for now.")
                         print(f"    Total fixed this run: {fixed_count}")
                         return
                 else:
                     print(f"[OK] {title} ({w_count} words)")
+                    index.record(stub, audit_index.OK, metrics, chash=chash)
             
             total_scanned += len(items)
-            page_token = posts.get('nextPageToken')
+            page_token = page['next']
+            page = upcoming
+            # Persist progress page by page; a run that stops mid-page redoes only that page
+            index.save_cursor(page_token, total_scanned)
             if not page_token:
-                # If we finished scanning all blocks but haven't reached 30, we stop naturally.
-                print(f"[i] Scanned all {total_scanned} posts available.")
+                # If we finished scanning all blocks but haven't reached MAX_FIXES, we stop naturally.
+                print(f"[i] Scanned all {total_scanned} posts available. Next run starts from the newest post.")
                 break
                 
-        print(f"\nAudit Complete. Scanned {total_scanned} posts. Fixed {fixed_count} posts.")
+        print(f"\nAudit Complete. Scanned {total_scanned} posts ({skipped_unchanged} unchanged, skipped). "
+              f"Fixed {fixed_count} posts.")
+        print(f"[i] {http_client.get_client().summary()}")
+        print(f"[i] {rate_limiter.get_limiter().summary()}")
         
     except Exception as e:
         print(f"[!] Listing failed: {e}")
+    finally:
+        if pool:
+            pool.shutdown()
 
 if __name__ == "__main__":
     run_audit()
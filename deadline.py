@@ -0,0 +1,60 @@
+import os
+import time
+
+# Wall-clock budgets in seconds (0 = unlimited)
+BATCH_BUDGET = float(os.getenv("BOT_BATCH_DEADLINE", 100 * 60))   # leaves slack before the next 2-hourly tick
+TOPIC_BUDGET = float(os.getenv("BOT_TOPIC_DEADLINE", 15 * 60))
+AUDIT_BUDGET = float(os.getenv("AUDIT_DEADLINE", 0))
+AUDIT_POST_BUDGET = float(os.getenv("AUDIT_POST_DEADLINE", 10 * 60))
+
+# Below this, a call isn't worth starting (it would only time out)
+MIN_CALL_TIMEOUT = 1.0
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    """
+    A time budget passed down through every network call of a batch/topic.
+    Each call asks for timeout(cap): its usual timeout, shrunk to whatever is
+    left of the budget. Deadline() (no seconds) never expires, so callers can
+    always pass one around.
+    """
+
+    def __init__(self, seconds=None, parent=None, label="batch"):
+        self.label = label
+        self.parent = parent
+        self.expires_at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self):
+        """Seconds left (None = unlimited), taking enclosing budgets into account."""
+        own = None if self.expires_at is None else max(0.0, self.expires_at - time.monotonic())
+        inherited = self.parent.remaining() if self.parent else None
+        if own is None:
+            return inherited
+        return own if inherited is None else min(own, inherited)
+
+    def expired(self):
+        left = self.remaining()
+        return left is not None and left < MIN_CALL_TIMEOUT
+
+    def check(self, what=""):
+        """Raises DeadlineExceeded when there's no useful time left."""
+        if self.expired():
+            raise DeadlineExceeded(f"{self.label} budget exhausted{' before ' + what if what else ''}")
+
+    def timeout(self, cap=None, what=""):
+        """Timeout for the next call: cap limited by the remaining budget (None = no limit)."""
+        self.check(what)
+        left = self.remaining()
+        if left is None:
+            return cap
+        return left if cap is None else min(cap, left)
+
+    def cancel(self):
+        """Ends the budget now (and every child's): the next timeout()/check() raises DeadlineExceeded."""
+        self.expires_at = time.monotonic()
+
+    def child(self, seconds, label="topic"):
+        """Sub-budget (e.g. one topic) that also ends when this one does."""
+        return Deadline(seconds, parent=self, label=label)
@@ -2,8 +2,12 @@ import smtplib
 import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import rate_limiter
+from deadline import Deadline
 
-def send_post_via_email(title, html_content):
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 30))
+
+def send_post_via_email(title, html_content, deadline=None):
     sender_email = os.getenv("EMAIL_USER")
     sender_password = os.getenv("EMAIL_PASS")
     receiver_email = os.getenv("BLOGGER_EMAIL")
@@ -24,8 +28,11 @@ def send_post_via_email(title, html_content):
     msg.attach(part)
 
     try:
+        rate_limiter.get_limiter().acquire('smtp', deadline=deadline)
         print(f"   Connecting to SMTP (sending to {receiver_email})...")
-        with smtplib.SMTP("smtp.gmail.com", 587) as server:
+        # Socket timeout applies to every SMTP command, so a hung server can't stall the batch
+        timeout = (deadline or Deadline()).timeout(SMTP_TIMEOUT, what="email")
+        with smtplib.SMTP("smtp.gmail.com", 587, timeout=timeout) as server:
             server.starttls()
             server.login(sender_email, sender_password)
             server.sendmail(sender_email, receiver_email, msg.as_string())
@@ -33,4 +40,7 @@ def send_post_via_email(title, html_content):
         return True
     except Exception as e:
         print(f"[X] Email Posting Failed: {e}")
+        # 421 / 4.7.x = Gmail asking us to slow down
+        if getattr(e, 'smtp_code', None) == 421:
+            rate_limiter.get_limiter().throttle('smtp')
         return False
@@ -0,0 +1,48 @@
+import os
+import threading
+import warnings
+# Suppress warnings before importing the deprecated package
+warnings.simplefilter(action='ignore', category=FutureWarning)
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+# One transport per key, one model handle per (key, model). Built once, shared by all threads.
+_lock = threading.Lock()
+_clients = {}
+_models = {}
+
+def _new_client(key):
+    # Same as what genai.configure() would build, but scoped to this key
+    # instead of mutating the SDK's global default client.
+    transport = os.getenv("GEMINI_TRANSPORT") or None  # 'grpc' (default) or 'rest'
+    kwargs = {'client_options': {'api_key': key}}
+    if transport:
+        kwargs['transport'] = transport
+    return glm.GenerativeServiceClient(**kwargs)
+
+def get_client(key):
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _new_client(key)
+            _clients[key] = client
+        return client
+
+def get_model(key, model_name):
+    """
+    Returns a cached GenerativeModel bound to `key`. Safe to use from several
+    threads at once: no genai.configure(), so concurrent calls on different
+    keys can't clobber each other.
+    """
+    client = get_client(key)
+    with _lock:
+        model = _models.get((key, model_name))
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            model._client = client
+            _models[(key, model_name)] = model
+        return model
+
+def pool_size():
+    with _lock:
+        return len(_clients), len(_models)
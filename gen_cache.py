@@ -0,0 +1,90 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import storage
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+def cache_key(prompt_version, topic, model):
+    """Content address of one generation: same template + topic + model -> same article."""
+    normalized = " ".join(topic.lower().split())
+    return hashlib.sha256(f"{prompt_version}\x00{normalized}\x00{model}".encode('utf-8')).hexdigest()
+
+class GenerationCache:
+    """
+    Disk cache of parsed Gemini articles ({title, content}), so a failed
+    SMTP send / Blogger update or an auditor re-run costs zero LLM calls.
+    Entries expire after `ttl`; past `max_bytes` the least recently used go first.
+    """
+
+    def __init__(self, path=None, ttl=None, max_bytes=None):
+        self.path = path or storage.db_path("GEN_CACHE_DB", "generation_cache.db")
+        self.ttl = ttl if ttl is not None else int(os.getenv("GEN_CACHE_TTL", DEFAULT_TTL))
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("GEN_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generations (
+                    key TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_accessed ON generations(accessed_at)")
+
+    def get(self, prompt_version, topic, models):
+        """Returns (post, model) for the first model (in preference order) with a fresh entry."""
+        keys = {cache_key(prompt_version, topic, m): m for m in models}
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT key, payload, created_at FROM generations WHERE key IN ({','.join('?' * len(keys))})",
+                list(keys)).fetchall()
+            fresh = {}
+            for key, payload, created_at in rows:
+                if now - created_at <= self.ttl:
+                    fresh[key] = payload
+                else:
+                    conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+            for key, model in keys.items():
+                if key in fresh:
+                    conn.execute("UPDATE generations SET accessed_at = ? WHERE key = ?", (now, key))
+                    return json.loads(fresh[key]), model
+        return None, None
+
+    def put(self, prompt_version, topic, model, post):
+        payload = json.dumps(post)
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO generations (key, topic, model, payload, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cache_key(prompt_version, topic, model), topic, model, payload, len(payload), now, now))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM generations").fetchone()[0]
+            if total > self.max_bytes:
+                # Size-capped LRU eviction
+                for key, size in conn.execute("SELECT key, size FROM generations ORDER BY accessed_at ASC").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                    total -= size
+
+    def invalidate(self, prompt_version, topic, models):
+        with self._lock, storage.connect(self.path) as conn:
+            conn.executemany("DELETE FROM generations WHERE key = ?",
+                             [(cache_key(prompt_version, topic, m),) for m in models])
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = GenerationCache()
+        return _cache
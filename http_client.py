@@ -0,0 +1,140 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx  # optional, only for HTTP_HTTP2=1 (pip install "httpx[http2]")
+except ImportError:
+    httpx = None
+
+# Connection pools: one pool per host, up to POOL_SIZE keep-alive connections each
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 20))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+# Per-host overrides, e.g. "www.googleapis.com=16,newsapi.org=2"
+HOST_POOLS = os.getenv("HTTP_HOST_POOLS", "www.googleapis.com=16")
+# Transient failures (connection resets, 5xx) are retried with exponential backoff.
+# 429 is deliberately not retried here: quota errors are handled by the callers.
+RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", 0.5))
+RETRY_STATUSES = (500, 502, 503, 504)
+# Used when a caller passes no timeout, so nothing can hang forever
+DEFAULT_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 20))
+HTTP2 = os.getenv("HTTP_HTTP2", "0") == "1"
+
+def parse_host_pools(spec):
+    """'host=size,host=size' -> {host: size} (bad entries are ignored)."""
+    pools = {}
+    for part in (spec or "").split(','):
+        host, sep, size = part.strip().partition('=')
+        if sep and host and size.strip().isdigit():
+            pools[host.strip()] = max(1, int(size))
+    return pools
+
+def _retry():
+    return Retry(
+        total=RETRIES, backoff_factor=BACKOFF, status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({'GET', 'HEAD'}), raise_on_status=False,
+        respect_retry_after_header=True)
+
+class HttpClient:
+    """
+    Shared keep-alive HTTP client for every outbound REST call (image search,
+    NewsAPI, image URL checks). A requests.Session with pooled adapters by
+    default; with HTTP_HTTP2=1 and httpx installed, an HTTP/2 httpx.Client.
+    Responses look the same to callers either way (.status_code, .json(), .close()).
+    """
+
+    def __init__(self, pool_size=None, host_pools=None, http2=None):
+        self.pool_size = pool_size or POOL_SIZE
+        self.host_pools = parse_host_pools(HOST_POOLS) if host_pools is None else dict(host_pools)
+        self.http2 = HTTP2 if http2 is None else http2
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        if self.http2 and httpx is None:
+            print("   [!] HTTP_HTTP2=1 but httpx is not installed. Using HTTP/1.1 pools.")
+            self.http2 = False
+
+        if self.http2:
+            self.session = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_connections=POOL_HOSTS * self.pool_size,
+                                    max_keepalive_connections=POOL_HOSTS * self.pool_size),
+                transport=httpx.HTTPTransport(http2=True, retries=RETRIES))
+        else:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=self.pool_size, max_retries=_retry())
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+            for host, size in self.host_pools.items():
+                # Longest prefix wins, so these take precedence for their host
+                host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=_retry())
+                self.session.mount(f"https://{host}/", host_adapter)
+                self.session.mount(f"http://{host}/", host_adapter)
+
+    def request(self, method, url, params=None, headers=None, timeout=None, stream=False, follow_redirects=True):
+        """
+        follow_redirects applies to both backends (requests follows by
+        default, httpx doesn't), so a 3xx gets the same answer either way.
+        """
+        with self._lock:
+            self.requests += 1
+        timeout = timeout if timeout is not None else DEFAULT_TIMEOUT
+        if self.http2:
+            req = self.session.build_request(method, url, params=params, headers=headers, timeout=timeout)
+            return self.session.send(req, stream=stream, follow_redirects=follow_redirects)
+        return self.session.request(method, url, params=params, headers=headers, timeout=timeout, stream=stream,
+                                    allow_redirects=follow_redirects)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def stats(self):
+        """
+        {'requests', 'connections', 'reused'}: connections is how many TCP/TLS
+        connections were opened (None under httpx, which doesn't expose it).
+        """
+        with self._lock:
+            made = self.requests
+        if self.http2:
+            return {'requests': made, 'connections': None, 'reused': None}
+        opened = 0
+        adapters = {id(a): a for a in self.session.adapters.values()}.values()
+        for adapter in adapters:
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+        return {'requests': made, 'connections': opened, 'reused': max(0, made - opened)}
+
+    def summary(self):
+        s = self.stats()
+        if s['connections'] is None:
+            return f"{s['requests']} HTTP requests (HTTP/2)"
+        return f"{s['requests']} HTTP requests over {s['connections']} connections ({s['reused']} reused)"
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide client, so every module shares the same warm connections."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+def head(url, **kwargs):
+    return get_client().head(url, **kwargs)
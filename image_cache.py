@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import time
+import threading
+import storage
+
+# Positive hits stay valid for a week, misses for a day (new images get indexed)
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_NEGATIVE_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+# Marker for "we cached a lookup that found nothing"
+MISS = "[]"
+
+def normalize_query(query):
+    """Collapses near-repeat titles ("Lea Michele's NEW Show!" vs "lea michele new show") onto one key."""
+    q = query.lower().replace("’", "'")
+    q = re.sub(r"'s\b", "", q)
+    q = re.sub(r"[^\w\s]", " ", q)
+    return " ".join(q.split())
+
+class ImageCache:
+    """
+    SQLite-backed cache of Custom Search lookups keyed by normalized query + imgSize.
+    Each entry is the full candidate list from one call (up to 10 results), so
+    candidates a post didn't use are still there for the next one. Links that
+    were actually published are remembered separately (see mark_used).
+    Entries expire by TTL; the least recently used rows are evicted past max_entries.
+    """
+
+    def __init__(self, path=None, ttl=None, negative_ttl=None, max_entries=None):
+        self.path = path or storage.db_path("IMAGE_CACHE_DB", "image_cache.db")
+        self.ttl = ttl if ttl is not None else int(os.getenv("IMAGE_CACHE_TTL", DEFAULT_TTL))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else int(os.getenv("IMAGE_CACHE_NEGATIVE_TTL", DEFAULT_NEGATIVE_TTL))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            # Single-link rows from before candidate lists; nothing worth migrating in a cache
+            conn.execute("DROP TABLE IF EXISTS image_search")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_candidates (
+                    key TEXT PRIMARY KEY,
+                    candidates TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_image_candidates_accessed ON image_candidates(accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS image_used (
+                    link TEXT PRIMARY KEY,
+                    used_at REAL NOT NULL
+                )""")
+
+    @staticmethod
+    def make_key(query, size=None):
+        return f"{normalize_query(query)}|{size or 'any'}"
+
+    def get(self, query, size=None):
+        """
+        Returns the cached candidate list ([] for a cached negative result),
+        or None when the lookup has to go to the API.
+        """
+        key = self.make_key(query, size)
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            row = conn.execute("SELECT candidates, created_at FROM image_candidates WHERE key = ?", (key,)).fetchone()
+            if row:
+                raw, created_at = row
+                ttl = self.ttl if raw != MISS else self.negative_ttl
+                if now - created_at <= ttl:
+                    conn.execute("UPDATE image_candidates SET accessed_at = ? WHERE key = ?", (now, key))
+                    self.hits += 1
+                    return json.loads(raw)
+                conn.execute("DELETE FROM image_candidates WHERE key = ?", (key,))
+        self.misses += 1
+        return None
+
+    def put(self, query, size, candidates):
+        """Stores a lookup result (list of candidate dicts). Empty/None caches 'no image found'."""
+        key = self.make_key(query, size)
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO image_candidates (key, candidates, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(candidates or []), now, now))
+            count = conn.execute("SELECT COUNT(*) FROM image_candidates").fetchone()[0]
+            if count > self.max_entries:
+                # LRU eviction: drop the least recently read rows
+                conn.execute(
+                    "DELETE FROM image_candidates WHERE key IN (SELECT key FROM image_candidates ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def mark_used(self, links):
+        """Remembers links handed out for a post so later posts prefer fresh ones."""
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            conn.executemany("INSERT OR REPLACE INTO image_used (link, used_at) VALUES (?, ?)",
+                             [(link, now) for link in links])
+
+    def used(self, links):
+        """Subset of links already used in a post (within the TTL)."""
+        links = list(links)
+        if not links:
+            return set()
+        cutoff = time.time() - self.ttl
+        with self._lock, storage.connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT link FROM image_used WHERE used_at >= ? AND link IN ({','.join('?' * len(links))})",
+                [cutoff] + links).fetchall()
+        return {row[0] for row in rows}
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute(
+                "DELETE FROM image_candidates WHERE (candidates != ? AND created_at < ?) OR (candidates = ? AND created_at < ?)",
+                (MISS, now - self.ttl, MISS, now - self.negative_ttl))
+            conn.execute("DELETE FROM image_used WHERE used_at < ?", (now - self.ttl,))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache shared by bot.py and content_auditor.py (via images.get_images)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
@@ -1,56 +1,145 @@
 import os
-import requests
+import functools
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import http_client
 from dotenv import load_dotenv
+import image_cache
+import quota
+import rate_limiter
+from deadline import Deadline
 
 # Load environment variables
 load_dotenv()
 
-def get_image(query):
-    key = os.getenv("GOOGLE_SEARCH_API_KEY", "").strip()
-    cx = os.getenv("GOOGLE_SEARCH_CX", "").strip()
-    
-    if not key or not cx:
-        print("   [!] Missing Image Search Keys in environment")
-        return None
-        
-    base_params = {
-        'cx': cx, 'key': key,
-        'searchType': 'image', 'num': 1, 'safe': 'active'
-    }
-    
-    # Helper to execute search
-    def search(q, size_param=None):
-        p = base_params.copy()
-        p['q'] = q
-        if size_param:
-            p['imgSize'] = size_param
-            
-        try:
-            res = requests.get("https://www.googleapis.com/customsearch/v1", params=p).json()
-            if 'error' in res:
-                # Quota or permission error, don't spam retries
-                print(f"   [!] Search API Error: {res['error']['message']}")
-                return None
-            
-            items = res.get('items', [])
-            if items:
-                link = items[0]['link']
-                if link.startswith('http'):
-                    return link
-        except Exception as e:
-            print(f"   [!] Search Exception: {e}")
-        return None
-
-    # Strategy 1: Exact query, Large images (High Quality)
-    # print(f"   [>] Searching (Large): {query[:40]}...")
-    link = search(query, 'large')
-    if link: return link
-    
-    # Strategy 2: Exact query, Any size
-    print(f"   [i] No large images. Retrying with any size...")
-    link = search(query, None)
-    if link: return link
-    
+# Per-request timeout for Custom Search calls (further capped by the caller's Deadline)
+SEARCH_TIMEOUT = float(os.getenv("IMAGE_SEARCH_TIMEOUT", 10))
+# Results per Custom Search call (API maximum is 10; same quota cost as 1)
+RESULTS_PER_CALL = int(os.getenv("IMAGE_RESULTS_PER_CALL", 10))
+# Speculative cascade: how many fallback tiers to have in flight at once. 1 = strictly
+# sequential (cheapest); higher values spend extra quota on tiers that may not be
+# needed in exchange for not paying one round trip per failed tier.
+SPECULATIVE_TIERS = max(1, int(os.getenv("IMAGE_SPECULATIVE_TIERS", 1)))
+# Per-minute rate-limit errors retried per tier (after the bucket's pause) before giving up
+RATE_LIMIT_RETRIES = int(os.getenv("IMAGE_SEARCH_RATE_RETRIES", 2))
+# Free-licence image hosts we'd rather use (the same list the search engine is set up with)
+DOMAINS_FILE = os.getenv("IMAGE_PREFERRED_DOMAINS_FILE",
+                         os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_domains_to_add.txt"))
+
+@functools.lru_cache(maxsize=1)
+def load_search_credentials():
+    """
+    (key, cx) pairs from GOOGLE_SEARCH_API_KEY (comma-separated) / GOOGLE_SEARCH_API_KEY_n.
+    GOOGLE_SEARCH_CX may list one CX per key; otherwise the first CX is used for all.
+    """
+    keys = [k.strip() for k in os.getenv("GOOGLE_SEARCH_API_KEY", "").split(",") if k.strip()]
+    i = 1
+    while os.getenv(f"GOOGLE_SEARCH_API_KEY_{i}"):
+        keys.append(os.getenv(f"GOOGLE_SEARCH_API_KEY_{i}").strip())
+        i += 1
+    cxs = [c.strip() for c in os.getenv("GOOGLE_SEARCH_CX", "").split(",") if c.strip()]
+    if not keys or not cxs:
+        return ()
+    if len(cxs) != len(keys):
+        cxs = [cxs[0]] * len(keys)
+    return tuple(zip(keys, cxs))
+
+# This batch's share of today's search quota (see quota.BatchBudget)
+_budget = None
+_budget_lock = threading.Lock()
+
+def start_batch(allowance=None):
+    """Starts a new batch allocation; call once per bot batch / auditor run."""
+    global _budget
+    credentials = load_search_credentials()
+    budget = quota.BatchBudget(quota.get_ledger(), credentials, allowance=allowance)
+    with _budget_lock:
+        _budget = budget
+    print(f"[i] Image search budget: {budget.allowance} calls this batch "
+          f"({quota.get_ledger().total_remaining(credentials)} left today across {len(credentials)} key(s)).")
+    return budget
+
+def current_budget():
+    with _budget_lock:
+        budget = _budget
+    return budget or start_batch()
+
+@functools.lru_cache(maxsize=1)
+def preferred_domains():
+    try:
+        with open(DOMAINS_FILE, encoding='utf-8') as f:
+            return tuple(line.strip().lower() for line in f if line.strip() and not line.startswith('#'))
+    except OSError:
+        return ()
+
+def _host(link):
+    return (urlparse(link).hostname or "").lower()
+
+def is_preferred(link, domains=None):
+    host = _host(link)
+    return any(host == d or host.endswith("." + d) for d in (preferred_domains() if domains is None else domains))
+
+def to_candidates(items):
+    """Custom Search 'items' -> [{'link', 'width', 'height'}] (non-http links dropped)."""
+    candidates = []
+    for item in items or []:
+        link = item.get('link', '')
+        if not link.startswith('http'):
+            continue
+        meta = item.get('image') or {}
+        candidates.append({'link': link, 'width': int(meta.get('width') or 0), 'height': int(meta.get('height') or 0)})
+    return candidates
+
+def rank_candidates(candidates, exclude=(), used=(), domains=None):
+    """
+    Orders candidates best-first and drops duplicates / excluded links:
+    never-used before used, allow-listed domains first, then bigger images.
+    Search order breaks ties.
+    """
+    seen = set(exclude)
+    unique = []
+    for c in candidates:
+        if c['link'] not in seen:
+            seen.add(c['link'])
+            unique.append(c)
+    order = {id(c): i for i, c in enumerate(unique)}
+    return sorted(unique, key=lambda c: (
+        c['link'] in used,
+        not is_preferred(c['link'], domains),
+        -(c['width'] * c['height']),
+        order[id(c)]))
+
+def per_minute_limit(error):
+    """
+    Custom Search error meaning "queries per minute" (retry later) rather than
+    the daily quota. Both come back as 429 rateLimitExceeded; only the message
+    ("limit 'Queries per day'") tells the daily one apart.
+    """
+    message = (error.get('message') or '').lower()
+    if 'per day' in message:
+        return False
+    reasons = {e.get('reason') for e in error.get('errors', []) if isinstance(e, dict)}
+    if 'dailyLimitExceeded' in reasons:
+        return False
+    return 'per minute' in message or 'rateLimitExceeded' in reasons
+
+def quota_error(error):
+    """Custom Search error caused by quota (retire the key for today), not by a bad key/CX or permissions."""
+    reasons = {e.get('reason') for e in error.get('errors', []) if isinstance(e, dict)}
+    if reasons & {'dailyLimitExceeded', 'quotaExceeded', 'rateLimitExceeded', 'userRateLimitExceeded'}:
+        return True
+    return error.get('code') == 429 or 'quota' in (error.get('message') or '').lower()
+
+def search_tiers(query):
+    """The (query, imgSize) lookups to try, in order, from most to least specific."""
+    tiers = [
+        # Strategy 1: Exact query, Large images (High Quality)
+        (query, 'large'),
+        # Strategy 2: Exact query, Any size
+        (query, None),
+    ]
+
     # Strategy 3: Simplify Query (Remove after ':', '-', or truncating)
     # Common separators in titles: ":", " - ", "|"
     simplified_query = None
@@ -58,48 +147,169 @@ def get_image(query):
         if sep in query:
             simplified_query = query.split(sep)[0].strip()
             break
-            
     if not simplified_query and len(query.split()) > 6:
         # Fallback: First 6 words
         simplified_query = " ".join(query.split()[:6])
-        
     if simplified_query and simplified_query != query:
-        print(f"   [i] Retrying with simplified query: '{simplified_query}'")
-        link = search(simplified_query, 'large') # Try large first for simplified
-        if link: return link
-        
-        link = search(simplified_query, None) # Then any size
-        if link: return link
-       
-    # Strategy 4: Aggressive Simplification (First 3 words)
+        tiers += [(simplified_query, 'large'), (simplified_query, None)]
+
+    # Strategy 4: Aggressive Simplification
     # If we still haven't found anything, try very broad.
-    msg_query = simplified_query if simplified_query else query
-    words = msg_query.split()
+    words = (simplified_query or query).split()
     if len(words) > 3:
-        aggressive_query = " ".join(words[:2]) # Just 2 words (e.g. "Lea Micheles")
-        print(f"   [i] Retrying with aggressive query: '{aggressive_query}'")
-        link = search(aggressive_query, 'large')
-        if link: return link
-        link = search(aggressive_query, None)
-        if link: return link
+        aggressive_query = " ".join(words[:2])  # Just 2 words (e.g. "Lea Micheles")
+        tiers += [(aggressive_query, 'large'), (aggressive_query, None)]
 
     # Strategy 5: Nuclear Option (First Word Only)
     # If "Lea Micheles" fails, "Lea" usually works.
-    if len(words) >= 1 and len(words[0]) > 2:
+    if words and len(words[0]) > 2:
         nuclear_query = words[0]
         # remove possessive 's or similar if present (simple heuristic)
-        if nuclear_query.lower().endswith("'s"): nuclear_query = nuclear_query[:-2]
-        
-        print(f"   [i] Retrying with nuclear query: '{nuclear_query}'")
-        link = search(nuclear_query, 'large')
-        if link: return link
-        link = search(nuclear_query, None)
-        if link: return link
-
-    print(f"   [!] Failed to find image for: {query}")
-    print("   [?] HINT: If you recently created this Search Engine, 'Search the entire web' is DISABLED.")
-    print("   [?] ACTION: Go to Programmable Search Engine > Overview > 'Sites to search' and add domains like 'unsplash.com', 'pexels.com', etc.")
-    return None
+        if nuclear_query.lower().endswith("'s"):
+            nuclear_query = nuclear_query[:-2]
+        tiers += [(nuclear_query, 'large'), (nuclear_query, None)]
+
+    # Drop repeats (e.g. a one-word title)
+    return list(dict.fromkeys(tiers))
+
+def get_images(query, n=2, exclude=(), use_cache=True, deadline=None, speculative=None, budget=None):
+    """
+    Up to n distinct image links for query, best first. Each Custom Search call
+    returns up to 10 candidates, so one call usually covers a whole post; the
+    simpler-query / any-size tiers are only walked while there aren't enough.
+    exclude: links the caller already has (e.g. images kept in a post).
+    speculative (default IMAGE_SPECULATIVE_TIERS): keep this many tiers in
+    flight ahead of the one being consumed. Results are still used strictly
+    in tier order; tiers not needed are cancelled (or just cached if already sent).
+    budget (default: the current batch's quota.BatchBudget) rotates keys by
+    remaining quota and limits how many uncached tiers this lookup may call.
+    Raises deadline.DeadlineExceeded if `deadline` runs out mid-search.
+    """
+    if not load_search_credentials():
+        print("   [!] Missing Image Search Keys in environment")
+        return []
+
+    base_params = {
+        'searchType': 'image', 'num': RESULTS_PER_CALL, 'safe': 'active'
+    }
+
+    cache = image_cache.get_cache() if use_cache and os.getenv("IMAGE_CACHE", "1") != "0" else None
+    deadline = deadline or Deadline()
+    budget = budget or current_budget()
+    tiers = search_tiers(query)
+    # Fewer fallback tiers as the batch's quota share runs down (cache hits are free)
+    left = budget.max_calls(len(tiers))
+    calls = {'left': left, 'out_of_quota': left == 0}
+    calls_lock = threading.Lock()
+    if left < len(tiers):
+        print(f"   [i] Image search quota low: up to {left} API call(s) for this lookup.")
+
+    # Helper to execute search. Returns a candidate list, or None on an API error.
+    # rate_retries counts per-minute retries of this tier; key rotation is bounded by the credentials.
+    def search(q, size_param=None, rate_retries=0):
+        if cache:
+            cached = cache.get(q, size_param)
+            if cached is not None:
+                # Empty list is a cached "nothing found" for this query/size
+                return cached
+
+        with calls_lock:
+            if calls['left'] <= 0:
+                calls['out_of_quota'] = True
+                return []  # not worth the quota; later tiers may still be cached
+            calls['left'] -= 1
+        # Outside the try below: running out of time must stop the whole cascade.
+        # Queries-per-minute bucket first (the daily quota is the ledger's job), so its
+        # wait comes out of the deadline before the request timeout is worked out.
+        rate_limiter.get_limiter().acquire('search', deadline=deadline)
+        timeout = deadline.timeout(SEARCH_TIMEOUT, what="image search")
+        credential = budget.acquire()
+        if credential is None:
+            calls['out_of_quota'] = True
+            return None
+        key, cx = credential
+        p = base_params.copy()
+        p.update({'key': key, 'cx': cx, 'q': q})
+        if size_param:
+            p['imgSize'] = size_param
+
+        try:
+            response = http_client.get("https://www.googleapis.com/customsearch/v1", params=p, timeout=timeout)
+            res = response.json()
+            if 'error' in res:
+                # Quota or permission error, don't spam retries
+                print(f"   [!] Search API Error (Key: {key[:5]}...): {res['error'].get('message')}")
+                if per_minute_limit(res['error']):
+                    # Too fast, not out of quota: slow the bucket down and retry the tier (a few times)
+                    rate_limiter.get_limiter().throttle('search', retry_after=rate_limiter.retry_after(response))
+                    if rate_retries >= RATE_LIMIT_RETRIES:
+                        return None
+                    with calls_lock:
+                        calls['left'] += 1
+                    return search(q, size_param, rate_retries + 1)
+                if quota_error(res['error']):
+                    # Retire this key for today and retry the tier on the next one
+                    budget.exhaust(key, cx)
+                    with calls_lock:
+                        calls['left'] += 1
+                    return search(q, size_param, rate_retries)
+                return None
+
+            candidates = to_candidates(res.get('items', []))
+            # Cache hits and misses alike; API errors above are never cached
+            if cache:
+                cache.put(q, size_param, candidates)
+            return candidates
+        except Exception as e:
+            print(f"   [!] Search Exception: {e}")
+        return []
+
+    window = min(speculative or SPECULATIVE_TIERS, len(tiers), max(1, calls['left']))
+    pool = ThreadPoolExecutor(max_workers=window, thread_name_prefix="image-tier") if window > 1 else None
+    futures = {}
+    candidates = []
+    try:
+        for i, (q, size) in enumerate(tiers):
+            if i:
+                print(f"   [i] Only {len(candidates)}/{n} image candidates. Retrying with '{q}' ({size or 'any size'})...")
+            if pool:
+                # Keep the next `window` tiers in flight so a miss doesn't cost another round trip
+                for j in range(i, min(i + window, len(tiers))):
+                    if j not in futures:
+                        futures[j] = pool.submit(search, *tiers[j])
+                found = futures[i].result()
+            else:
+                found = search(q, size)
+            if found is None:
+                # The error applies to every tier (quota, bad key), so stop here
+                break
+            candidates += found
+            if len(rank_candidates(candidates, exclude)) >= n:
+                break
+    finally:
+        if pool:
+            for future in futures.values():
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    used = cache.used(c['link'] for c in candidates) if cache else set()
+    links = [c['link'] for c in rank_candidates(candidates, exclude, used)[:n]]
+    if links and cache:
+        cache.mark_used(links)
+
+    if not links and calls['out_of_quota']:
+        # Not a search engine setup problem, so no hints
+        print(f"   [!] No images for: {query} (image search quota for this batch/day is spent)")
+    elif not links:
+        print(f"   [!] Failed to find image for: {query}")
+        print("   [?] HINT: If you recently created this Search Engine, 'Search the entire web' is DISABLED.")
+        print("   [?] ACTION: Go to Programmable Search Engine > Overview > 'Sites to search' and add domains like 'unsplash.com', 'pexels.com', etc.")
+    return links
+
+def get_image(query, use_cache=True, deadline=None):
+    """Best single image link for query, or None (see get_images)."""
+    links = get_images(query, 1, use_cache=use_cache, deadline=deadline)
+    return links[0] if links else None
 
 # Deprecated/Removed Unsplash Fallback
 # def get_unsplash_image(query): ...
@@ -0,0 +1,110 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import storage
+
+# Publish states recorded per topic fingerprint
+GENERATING = 'generating'
+GENERATED = 'generated'
+PUBLISHED = 'published'
+FAILED = 'failed'
+
+# Filler words that don't change what a trend is about
+_STOPWORDS = {'the', 'a', 'an', 'and', 'of', 'to', 'in', 'on', 'for', 'at', 'vs', 'is', 'with'}
+
+def fingerprint(topic):
+    """Order- and punctuation-insensitive hash of a trend title."""
+    text = re.sub(r"[^\w\s]", " ", topic.lower().replace("'s", ""))
+    tokens = sorted(set(t for t in text.split() if t not in _STOPWORDS))
+    return hashlib.sha1(" ".join(tokens).encode('utf-8')).hexdigest()
+
+class TopicLedger:
+    """
+    SQLite record of every trend the bot has picked up: fingerprint, generated
+    title and publish status. Lookups are primary-key hits, so the ledger stays
+    fast at hundreds of thousands of rows.
+    """
+
+    def __init__(self, path=None, cover_days=None, retry_after=None, max_attempts=None, failed_cooldown=None):
+        self.path = path or storage.db_path("LEDGER_DB", "topic_ledger.db")
+        # A published topic counts as covered for this long (a trend can come back months later)
+        self.cover_seconds = (cover_days if cover_days is not None else float(os.getenv("LEDGER_COVER_DAYS", 7))) * 86400
+        # An unfinished 'generating'/'generated' row blocks others for this long
+        self.retry_after = retry_after if retry_after is not None else int(os.getenv("LEDGER_RETRY_AFTER", 6 * 3600))
+        # A topic that failed this many generations in a row (e.g. it never passes the quality gate)
+        # is left alone for failed_cooldown instead of burning Gemini quota on every run
+        self.max_attempts = max_attempts if max_attempts is not None else int(os.getenv("LEDGER_MAX_ATTEMPTS", 3))
+        self.failed_cooldown = (failed_cooldown if failed_cooldown is not None
+                                else int(os.getenv("LEDGER_FAILED_COOLDOWN", 24 * 3600)))
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS topics (
+                    fingerprint TEXT PRIMARY KEY,
+                    topic TEXT NOT NULL,
+                    title TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )""")
+
+    def _covered(self, status, attempts, updated_at, now):
+        age = now - updated_at
+        if status == PUBLISHED:
+            return age <= self.cover_seconds
+        if status in (GENERATING, GENERATED):
+            return age <= self.retry_after
+        if status == FAILED and attempts >= self.max_attempts:
+            # After the cooldown it gets one more try (attempts stay past the limit until it publishes)
+            return age <= self.failed_cooldown
+        return False
+
+    def is_covered(self, topic):
+        """True if this trend was already published recently or is being worked on."""
+        with storage.connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT status, attempts, updated_at FROM topics WHERE fingerprint = ?", (fingerprint(topic),)).fetchone()
+        return bool(row) and self._covered(*row, time.time())
+
+    def covered_set(self, topics):
+        """Batch version of is_covered: returns the subset of topics already covered."""
+        prints = {fingerprint(t): t for t in topics}
+        if not prints:
+            return set()
+        now = time.time()
+        with storage.connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT fingerprint, status, attempts, updated_at FROM topics "
+                f"WHERE fingerprint IN ({','.join('?' * len(prints))})", list(prints)).fetchall()
+        return {prints[fp] for fp, *row in rows if self._covered(*row, now)}
+
+    def mark(self, topic, status, title=None):
+        now = time.time()
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute("""
+                INSERT INTO topics (fingerprint, topic, title, status, attempts, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(fingerprint) DO UPDATE SET
+                    title = COALESCE(excluded.title, topics.title),
+                    status = excluded.status,
+                    attempts = CASE WHEN excluded.status = 'published' THEN 0
+                                    ELSE topics.attempts + excluded.attempts END,
+                    updated_at = excluded.updated_at
+                """, (fingerprint(topic), topic, title, status, 1 if status == GENERATING else 0, now, now))
+
+    def stats(self):
+        with storage.connect(self.path) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM topics GROUP BY status").fetchall())
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = TopicLedger()
+        return _ledger
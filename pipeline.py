@@ -0,0 +1,91 @@
+import os
+import queue
+import threading
+
+# Sentinel passed down the queues to tell workers the batch is finished
+_DONE = object()
+
+
+def stage_limit(name, default):
+    """Reads the worker count for a stage from PIPELINE_<NAME>_WORKERS."""
+    try:
+        return max(1, int(os.getenv(f"PIPELINE_{name.upper()}_WORKERS", default)))
+    except ValueError:
+        return default
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+    Each stage is (name, func, workers). func(item) returns the item for the
+    next stage, or None to drop it (e.g. generation failed).
+    """
+
+    def __init__(self, stages, queue_size=10):
+        self.stages = stages
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages))]
+        # Output queue is unbounded so the feeder can never deadlock against it
+        self.queues.append(queue.Queue())
+        self.results = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def _worker(self, index, name, func, inbox, outbox, remaining):
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Last worker of this stage closes the next stage
+                with self._lock:
+                    remaining[index] -= 1
+                    last = remaining[index] == 0
+                if last:
+                    outbox.put(_DONE)
+                else:
+                    # Let sibling workers see the sentinel too
+                    inbox.put(_DONE)
+                return
+
+            try:
+                result = func(item)
+            except Exception as e:
+                print(f"   [!] Pipeline stage '{name}' failed: {e}")
+                with self._lock:
+                    self.errors.append((name, item, e))
+                continue
+
+            if result is not None:
+                outbox.put(result)
+
+    def run(self, items, should_stop=None):
+        """Feeds items in and blocks until every stage has drained. Returns final outputs."""
+        remaining = [workers for _, _, workers in self.stages]
+        threads = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            for n in range(workers):
+                t = threading.Thread(
+                    target=self._worker,
+                    args=(index, name, func, self.queues[index], self.queues[index + 1], remaining),
+                    name=f"{name}-{n + 1}",
+                    daemon=True,
+                )
+                t.start()
+                threads.append(t)
+
+        for item in items:
+            if should_stop and should_stop():
+                print("   [i] Stop requested. Not feeding more topics into the pipeline.")
+                break
+            self.queues[0].put(item)
+        self.queues[0].put(_DONE)
+
+        # Collect final outputs until the last stage closes
+        out = self.queues[-1]
+        while True:
+            item = out.get()
+            if item is _DONE:
+                break
+            self.results.append(item)
+
+        for t in threads:
+            t.join()
+        return self.results
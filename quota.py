@@ -0,0 +1,179 @@
+import os
+import math
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+import storage
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:  # Python < 3.9, or no tz database (Windows without tzdata)
+    PACIFIC = None
+
+# Custom Search free tier: 100 queries per key per day, reset at midnight Pacific time
+DAILY_QUOTA = int(os.getenv("IMAGE_SEARCH_DAILY_QUOTA", 100))
+# Scheduled batches per day, used to split what's left of today's quota fairly
+BATCHES_PER_DAY = int(os.getenv("IMAGE_SEARCH_BATCHES_PER_DAY", 12))
+
+def _us_dst(now_utc):
+    """US rule: 2nd Sunday of March 2am PST to 1st Sunday of November 2am PDT."""
+    year = now_utc.year
+    march = datetime(year, 3, 8, tzinfo=timezone.utc)
+    start = march + timedelta(days=(6 - march.weekday()) % 7, hours=10)
+    november = datetime(year, 11, 1, tzinfo=timezone.utc)
+    end = november + timedelta(days=(6 - november.weekday()) % 7, hours=9)
+    return start <= now_utc < end
+
+def pacific_now(now=None):
+    """Current time in US Pacific (zoneinfo when available, else the US DST rule)."""
+    now = now or datetime.now(timezone.utc)
+    if PACIFIC is not None:
+        return now.astimezone(PACIFIC)
+    return now.astimezone(timezone(timedelta(hours=-7 if _us_dst(now.astimezone(timezone.utc)) else -8)))
+
+def quota_day(now=None):
+    """The quota day (Pacific date) a call made at `now` counts against."""
+    return pacific_now(now).strftime('%Y-%m-%d')
+
+def seconds_until_reset(now=None):
+    local = pacific_now(now)
+    midnight = (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1.0, (midnight - local).total_seconds())
+
+def credential_id(key, cx):
+    """Stable, non-secret identifier for a key/CX pair (raw keys are never persisted)."""
+    return hashlib.sha256(f"{key}|{cx}".encode('utf-8')).hexdigest()[:12]
+
+class QuotaLedger:
+    """
+    SQLite count of Custom Search calls per (key, CX) per Pacific day. Shared
+    by bot.py and content_auditor.py, so both know how much of today's quota
+    is left before the API starts returning errors.
+    """
+
+    def __init__(self, path=None, daily_quota=None):
+        self.path = path or storage.db_path("QUOTA_DB", "search_quota.db")
+        self.daily_quota = daily_quota if daily_quota is not None else DAILY_QUOTA
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_quota (
+                    credential TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    used INTEGER NOT NULL,
+                    PRIMARY KEY (credential, day)
+                )""")
+
+    def _used(self, conn, credentials, day):
+        ids = [credential_id(k, cx) for k, cx in credentials]
+        rows = conn.execute(
+            f"SELECT credential, used FROM search_quota WHERE day = ? AND credential IN ({','.join('?' * len(ids))})",
+            [day] + ids).fetchall()
+        used = dict(rows)
+        return {cred: used.get(credential_id(*cred), 0) for cred in credentials}
+
+    def remaining(self, credentials, now=None):
+        """{(key, cx): calls left today}"""
+        credentials = list(credentials)
+        if not credentials:
+            return {}
+        with storage.connect(self.path) as conn:
+            used = self._used(conn, credentials, quota_day(now))
+        return {cred: max(0, self.daily_quota - n) for cred, n in used.items()}
+
+    def total_remaining(self, credentials, now=None):
+        return sum(self.remaining(credentials, now).values())
+
+    def acquire(self, credentials, now=None):
+        """
+        Reserves one call on the (key, cx) with the most quota left today.
+        Returns the pair, or None when every credential is used up.
+        """
+        credentials = list(credentials)
+        if not credentials:
+            return None
+        day = quota_day(now)
+        with self._lock, storage.connect(self.path) as conn:
+            # Write lock up front so two processes can't both take the last call
+            conn.execute("BEGIN IMMEDIATE")
+            used = self._used(conn, credentials, day)
+            cred = min(credentials, key=lambda c: used[c])
+            if used[cred] >= self.daily_quota:
+                return None
+            conn.execute(
+                "INSERT INTO search_quota (credential, day, used) VALUES (?, ?, 1) "
+                "ON CONFLICT(credential, day) DO UPDATE SET used = used + 1",
+                (credential_id(*cred), day))
+        return cred
+
+    def exhaust(self, key, cx, now=None):
+        """The API says this credential is out of quota (or unusable) today: stop handing it out."""
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute("INSERT OR REPLACE INTO search_quota (credential, day, used) VALUES (?, ?, ?)",
+                         (credential_id(key, cx), quota_day(now), self.daily_quota))
+
+class BatchBudget:
+    """
+    One batch's share of today's quota: what's left divided over the batches
+    still to run before the Pacific-midnight reset (IMAGE_SEARCH_BATCH_BUDGET
+    overrides). As the share is spent, max_calls() lets each image lookup walk
+    fewer fallback tiers, so quota runs down gradually instead of hitting a
+    wall in the middle of a batch.
+    """
+
+    def __init__(self, ledger, credentials, allowance=None, now=None):
+        self.ledger = ledger
+        self.credentials = list(credentials)
+        if allowance is None and os.getenv("IMAGE_SEARCH_BATCH_BUDGET"):
+            allowance = int(os.getenv("IMAGE_SEARCH_BATCH_BUDGET"))
+        if allowance is None:
+            batches_left = max(1, math.ceil(BATCHES_PER_DAY * seconds_until_reset(now) / 86400))
+            allowance = math.ceil(ledger.total_remaining(self.credentials, now) / batches_left)
+        self.allowance = allowance
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        with self._lock:
+            left = self.allowance - self.spent
+        return max(0, min(left, self.ledger.total_remaining(self.credentials)))
+
+    def max_calls(self, tiers):
+        """Uncached calls one lookup may make, out of `tiers`: all of them while the share is healthy."""
+        left = self.remaining()
+        if left <= 0:
+            return 0
+        share = left / max(1, self.allowance)
+        if share >= 0.5:
+            allowed = tiers
+        elif share >= 0.25:
+            allowed = min(tiers, 4)
+        elif share >= 0.1:
+            allowed = min(tiers, 2)
+        else:
+            allowed = 1
+        return min(allowed, left)
+
+    def acquire(self):
+        """(key, cx) for one more call, or None when the batch's share or the day's quota is gone."""
+        with self._lock:
+            if self.spent >= self.allowance:
+                return None
+            cred = self.ledger.acquire(self.credentials)
+            if cred:
+                self.spent += 1
+            return cred
+
+    def exhaust(self, key, cx):
+        self.ledger.exhaust(key, cx)
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+def get_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = QuotaLedger()
+        return _ledger
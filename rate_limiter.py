@@ -0,0 +1,200 @@
+import os
+import time
+import threading
+import storage
+import router
+from deadline import Deadline
+
+# Known quotas per upstream: (requests per minute, burst). Override with
+# RATE_<NAME>_PER_MIN / RATE_<NAME>_BURST, e.g. RATE_BLOGGER_PER_MIN=120.
+DEFAULT_LIMITS = {
+    'gemini': (15, 3),     # per API key (free tier RPM of the flash models)
+    'blogger': (60, 10),   # Blogger API v3, per user
+    'search': (100, 10),   # Custom Search JSON API queries per minute
+    'smtp': (20, 2),       # Gmail submission
+}
+# After a 429 without Retry-After, pause the bucket this long
+THROTTLE_PAUSE = float(os.getenv("RATE_THROTTLE_PAUSE", 30))
+# Each 429 halves the rate (down to MIN_FACTOR of the quota); it climbs back over RECOVERY seconds
+MIN_FACTOR = 0.1
+RECOVERY = float(os.getenv("RATE_RECOVERY", 600))
+# Waits longer than this are worth a log line
+QUIET_WAIT = 5
+
+def limits_for(name):
+    """(per_min, burst) for an upstream, from RATE_<NAME>_* or DEFAULT_LIMITS."""
+    per_min, burst = DEFAULT_LIMITS.get(name, (60, 1))
+    try:
+        per_min = float(os.getenv(f"RATE_{name.upper()}_PER_MIN", per_min))
+        burst = float(os.getenv(f"RATE_{name.upper()}_BURST", burst))
+    except ValueError:
+        pass
+    return max(per_min, 0.01), max(burst, 1)
+
+def bucket_name(name, key=None):
+    """One bucket per upstream, or per API key where the quota is per key (raw keys never persisted)."""
+    return f"{name}:{router.key_id(key)}" if key else name
+
+class RateLimiter:
+    """
+    Token buckets per upstream, persisted in SQLite so bot.py and
+    content_auditor.py (and back-to-back runs) draw from the same quota
+    window. Callers acquire() before each request instead of sleeping a
+    guessed amount; a 429 pauses the bucket (Retry-After when the server
+    sends one) and halves its rate, which then recovers linearly.
+    """
+
+    def __init__(self, path=None, limits=None, clock=None, sleep=None):
+        self.path = path or storage.db_path("RATE_LIMIT_DB", "rate_limits.db")
+        self.limits = limits or {}
+        self.clock = clock or time.time
+        self.sleep = sleep or time.sleep
+        self.waited = {}
+        self._lock = threading.Lock()
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS rate_buckets (
+                    bucket TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    rate REAL NOT NULL,
+                    paused_until REAL NOT NULL,
+                    updated REAL NOT NULL
+                )""")
+
+    def _limits(self, name):
+        return self.limits.get(name) or limits_for(name)
+
+    def _load(self, conn, bucket, name, now):
+        """Current (tokens, rate per second, paused_until), refilled up to now."""
+        per_min, burst = self._limits(name)
+        base = per_min / 60.0
+        row = conn.execute("SELECT tokens, rate, paused_until, updated FROM rate_buckets WHERE bucket = ?",
+                           (bucket,)).fetchone()
+        if not row:
+            return burst, base, 0.0
+        tokens, rate, paused_until, updated = row
+        elapsed = max(0.0, now - updated)
+        tokens = min(burst, tokens + elapsed * rate)
+        rate = min(base, rate + base * elapsed / RECOVERY)
+        return tokens, rate, paused_until
+
+    def _save(self, conn, bucket, tokens, rate, paused_until, now):
+        conn.execute("INSERT OR REPLACE INTO rate_buckets (bucket, tokens, rate, paused_until, updated) "
+                     "VALUES (?, ?, ?, ?, ?)", (bucket, tokens, rate, paused_until, now))
+
+    def _take(self, name, key, cost):
+        """Takes cost tokens if available. Returns 0, or the seconds to wait before trying again."""
+        bucket = bucket_name(name, key)
+        _, burst = self._limits(name)
+        now = self.clock()
+        with self._lock, storage.connect(self.path) as conn:
+            # Write lock up front so two processes can't both take the last token
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, rate, paused_until = self._load(conn, bucket, name, now)
+            if now < paused_until:
+                wait = paused_until - now
+            elif tokens >= min(cost, burst):
+                # Costs above the burst (a batch request) run the bucket into debt
+                self._save(conn, bucket, tokens - cost, rate, paused_until, now)
+                return 0.0
+            else:
+                wait = (min(cost, burst) - tokens) / rate
+            self._save(conn, bucket, tokens, rate, paused_until, now)
+        return max(wait, 0.01)
+
+    def try_acquire(self, name, key=None, cost=1):
+        """Takes a token if one is free right now (e.g. for optional hedged calls)."""
+        return self._take(name, key, cost) == 0
+
+    def acquire(self, name, key=None, cost=1, deadline=None):
+        """
+        Blocks until the bucket has cost tokens. Returns the seconds waited.
+        Raises deadline.DeadlineExceeded rather than wait past `deadline`.
+        """
+        deadline = deadline or Deadline()
+        bucket = bucket_name(name, key)
+        waited = 0.0
+        while True:
+            wait = self._take(name, key, cost)
+            if wait <= 0:
+                break
+            if wait > QUIET_WAIT:
+                print(f"   [i] Rate limit ({name}): waiting {wait:.0f}s...")
+            wait = deadline.timeout(wait, what=f"{name} rate limit")
+            self.sleep(wait)
+            waited += wait
+        if waited:
+            with self._lock:
+                self.waited[bucket] = self.waited.get(bucket, 0.0) + waited
+        return waited
+
+    def throttle(self, name, key=None, retry_after=None):
+        """The upstream said 429: pause the bucket and slow it down."""
+        bucket = bucket_name(name, key)
+        per_min, _ = self._limits(name)
+        now = self.clock()
+        pause = retry_after if retry_after else THROTTLE_PAUSE
+        with self._lock, storage.connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            _, rate, paused_until = self._load(conn, bucket, name, now)
+            rate = max(per_min / 60.0 * MIN_FACTOR, rate / 2)
+            self._save(conn, bucket, 0.0, rate, max(paused_until, now + pause), now)
+        print(f"   [↻] {name} rate limited: pausing {pause:.0f}s, then {rate * 60:.1f}/min until it recovers.")
+
+    def rate(self, name, key=None):
+        """Current requests per minute the bucket allows."""
+        with storage.connect(self.path) as conn:
+            _, rate, _ = self._load(conn, bucket_name(name, key), name, self.clock())
+        return rate * 60
+
+    def summary(self):
+        with self._lock:
+            waited = dict(self.waited)
+        if not waited:
+            return "Rate limits: no waits"
+        return "Rate limits: waited " + ", ".join(f"{b} {s:.0f}s" for b, s in sorted(waited.items()))
+
+def is_rate_limited(error):
+    """True for googleapiclient HttpErrors that mean "slow down" (429, or 403 rate-limit reasons)."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status == 429:
+        return True
+    content = getattr(error, 'content', b'') or b''
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return status == 403 and (b'rateLimitExceeded' in content or b'userRateLimitExceeded' in content)
+
+def retry_after(error):
+    """Seconds from a Retry-After header on an HttpError / requests response, if any."""
+    headers = getattr(error, 'resp', None) or getattr(error, 'headers', None) or {}
+    try:
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        return float(value) if value else None
+    except (TypeError, ValueError):
+        return None
+
+def execute(request, name='blogger', cost=1, deadline=None, retries=3):
+    """
+    request.execute() for a googleapiclient request (or batch) under the
+    upstream's bucket. Rate-limit errors throttle the bucket and retry.
+    """
+    limiter = get_limiter()
+    for attempt in range(retries + 1):
+        limiter.acquire(name, cost=cost, deadline=deadline)
+        try:
+            return request.execute()
+        except Exception as e:
+            if attempt == retries or not is_rate_limited(e):
+                raise
+            limiter.throttle(name, retry_after=retry_after(e))
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,248 @@
+import re
+import json
+import time
+import hashlib
+import threading
+import storage
+
+# Circuit breaker states per (key, model)
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+FAILURE_THRESHOLD = 3       # consecutive generic errors before the breaker opens
+BASE_COOLDOWN = 30          # seconds, doubled per consecutive trip
+MAX_COOLDOWN = 3600
+NOT_FOUND_COOLDOWN = 24 * 3600   # model not available for this key
+BAD_KEY_COOLDOWN = 24 * 3600     # invalid / revoked key
+PROBE_WINDOW = 120          # half-open pairs admit one probe per window
+EWMA_ALPHA = 0.3
+LATENCY_SAMPLES = 20        # recent latencies kept per pair for percentile estimates
+
+def key_id(key):
+    """Stable, non-secret identifier for an API key (raw keys are never persisted)."""
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+
+def parse_retry_after(error_msg):
+    """Extracts the server-suggested delay from a Gemini 429 error, if any."""
+    m = re.search(r'retry_delay\s*\{\s*seconds:\s*(\d+)', error_msg)
+    if not m:
+        m = re.search(r'retry (?:in|after) (\d+(?:\.\d+)?)\s*s', error_msg, flags=re.IGNORECASE)
+    return float(m.group(1)) if m else None
+
+def classify_error(error_msg):
+    msg = error_msg.lower()
+    if '429' in msg or 'quota' in msg or 'resource exhausted' in msg or 'resourceexhausted' in msg:
+        return 'rate_limited'
+    if '404' in msg or 'not found' in msg or 'is not supported' in msg:
+        return 'not_found'
+    if 'api key not valid' in msg or 'api_key_invalid' in msg or 'permission' in msg or '403' in msg:
+        return 'bad_key'
+    return 'error'
+
+def _new_state():
+    return {
+        'successes': 0, 'failures': 0, 'consecutive_failures': 0,
+        'rate_limited': 0, 'not_found': 0, 'trips': 0,
+        'latency': None,            # EWMA seconds
+        'recent': [],               # last LATENCY_SAMPLES latencies
+        'state': CLOSED, 'cooldown_until': 0.0, 'probe_until': 0.0,
+        'last_used': 0.0, 'last_error': None,
+    }
+
+class KeyModelRouter:
+    """
+    Tracks health per (key, model) pair and hands out the healthiest one.
+    State (success rate, EWMA latency, 429/404 counts, cooldowns, breaker
+    state) is persisted in SQLite, so bot.py and content_auditor.py share it
+    across runs instead of re-discovering dead pairs every time.
+    """
+
+    def __init__(self, keys, models, path=None):
+        self.keys = list(keys)
+        self.models = list(models)
+        self.path = path or storage.db_path("ROUTER_DB", "router_state.db")
+        self._lock = threading.Lock()
+        self._key_by_id = {key_id(k): k for k in self.keys}
+        self.states = {(key_id(k), m): _new_state() for k in self.keys for m in self.models}
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS router_state (
+                    key_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (key_id, model)
+                )""")
+        self._load()
+
+    def _load(self):
+        with storage.connect(self.path) as conn:
+            rows = conn.execute("SELECT key_id, model, state FROM router_state").fetchall()
+        for kid, model, raw in rows:
+            if (kid, model) in self.states:
+                saved = json.loads(raw)
+                self.states[(kid, model)] = {**_new_state(), **saved}
+
+    def _save(self, pair):
+        with storage.connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO router_state (key_id, model, state, updated_at) VALUES (?, ?, ?, ?)",
+                (pair[0], pair[1], json.dumps(self.states[pair]), time.time()))
+
+    def _status(self, st, now):
+        if st['state'] == CLOSED:
+            return CLOSED
+        if now < st['cooldown_until']:
+            return OPEN
+        return HALF_OPEN
+
+    def _score(self, pair, st, prefer_fast=False):
+        # Laplace-smoothed success rate, bucketed so model preference order wins ties
+        rate = (st['successes'] + 1) / (st['successes'] + st['failures'] + 2)
+        # Unknown latency counts as 0 so new pairs get explored
+        latency = st['latency'] or 0
+        if prefer_fast:
+            return (round(rate, 1) * -1, latency, self.models.index(pair[1]), st['last_used'])
+        return (round(rate, 1) * -1, self.models.index(pair[1]), latency, st['last_used'])
+
+    def pick(self, exclude=(), prefer_fast=False):
+        """
+        Returns the healthiest available (key, model), or None if every pair
+        is cooling down or excluded. Closed breakers are preferred over
+        half-open ones; half-open pairs admit a single probe at a time.
+        prefer_fast ranks equally healthy pairs by EWMA latency instead of
+        model preference (used for hedges and GEMINI_PREFER_FAST=1).
+        """
+        with self._lock:
+            self._load()  # pick up state written by other processes
+            now = time.time()
+            candidates = []
+            for pair, st in self.states.items():
+                if (self._key_by_id[pair[0]], pair[1]) in exclude:
+                    continue
+                status = self._status(st, now)
+                if status == OPEN:
+                    continue
+                if status == HALF_OPEN and now < st['probe_until']:
+                    continue
+                candidates.append((status == HALF_OPEN, self._score(pair, st, prefer_fast), pair))
+            if not candidates:
+                return None
+            candidates.sort()
+            probing, _, pair = candidates[0]
+            st = self.states[pair]
+            st['last_used'] = now
+            if probing:
+                st['probe_until'] = now + PROBE_WINDOW
+                print(f"   [i] Probing half-open pair {pair[1]} (Key: {self._key_by_id[pair[0]][:5]}...)")
+            self._save(pair)
+            return self._key_by_id[pair[0]], pair[1]
+
+    def seconds_until_available(self, exclude=()):
+        """
+        Time until pick() can hand out a pair again: the earliest cooling pair
+        reopening, or a half-open pair's running probe window ending.
+        None if nothing is configured (or everything is excluded).
+        """
+        with self._lock:
+            self._load()
+            now = time.time()
+            waits = []
+            for pair, st in self.states.items():
+                if (self._key_by_id[pair[0]], pair[1]) in exclude:
+                    continue
+                status = self._status(st, now)
+                if status == OPEN:
+                    waits.append(st['cooldown_until'] - now)
+                elif status == HALF_OPEN and now < st['probe_until']:
+                    waits.append(st['probe_until'] - now)
+                else:
+                    waits.append(0.0)
+        return max(0.0, min(waits)) if waits else None
+
+    def record_success(self, key, model, latency):
+        pair = (key_id(key), model)
+        with self._lock:
+            st = self.states[pair]
+            st['successes'] += 1
+            st['consecutive_failures'] = 0
+            st['latency'] = latency if st['latency'] is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * st['latency']
+            st['recent'] = (st['recent'] + [round(latency, 3)])[-LATENCY_SAMPLES:]
+            st['state'] = CLOSED
+            st['trips'] = 0
+            st['cooldown_until'] = 0.0
+            st['probe_until'] = 0.0
+            self._save(pair)
+
+    def _open(self, pair, cooldown, now):
+        st = self.states[pair]
+        st['state'] = OPEN
+        st['cooldown_until'] = max(st['cooldown_until'], now + cooldown)
+        st['probe_until'] = 0.0
+
+    def record_failure(self, key, model, error):
+        """Classifies the error and opens the breaker / sets a cooldown as appropriate."""
+        error_msg = str(error)
+        kind = classify_error(error_msg)
+        pair = (key_id(key), model)
+        now = time.time()
+        with self._lock:
+            st = self.states[pair]
+            st['failures'] += 1
+            st['consecutive_failures'] += 1
+            st['last_error'] = error_msg[:200]
+            was_probe = self._status(st, now) == HALF_OPEN
+
+            if kind == 'rate_limited':
+                st['rate_limited'] += 1
+                st['trips'] += 1
+                retry_after = parse_retry_after(error_msg)
+                cooldown = retry_after if retry_after else min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (st['trips'] - 1))
+                self._open(pair, cooldown, now)
+            elif kind == 'not_found':
+                st['not_found'] += 1
+                self._open(pair, NOT_FOUND_COOLDOWN, now)
+            elif kind == 'bad_key':
+                # The key itself is dead: cool down every model on it
+                for other in self.states:
+                    if other[0] == pair[0]:
+                        self._open(other, BAD_KEY_COOLDOWN, now)
+                        self._save(other)
+            elif was_probe or st['consecutive_failures'] >= FAILURE_THRESHOLD:
+                st['trips'] += 1
+                self._open(pair, min(MAX_COOLDOWN, BASE_COOLDOWN * 2 ** (st['trips'] - 1)), now)
+            self._save(pair)
+        return kind
+
+    def latency_percentile(self, model, pct=0.9, min_samples=5):
+        """Latency percentile for a model across all keys (None until there's enough data)."""
+        with self._lock:
+            samples = sorted(x for (kid, m), st in self.states.items() if m == model for x in st['recent'])
+        if len(samples) < min_samples:
+            return None
+        return samples[int(pct * (len(samples) - 1))]
+
+    def summary(self):
+        """Human-readable health table (used for logging)."""
+        now = time.time()
+        lines = []
+        with self._lock:
+            for (kid, model), st in sorted(self.states.items()):
+                status = self._status(st, now)
+                lat = f"{st['latency']:.1f}s" if st['latency'] else "-"
+                wait = f" ({int(st['cooldown_until'] - now)}s)" if status == OPEN else ""
+                lines.append(f"{kid[:6]} {model:<24} {status}{wait} ok={st['successes']} fail={st['failures']} "
+                             f"429={st['rate_limited']} 404={st['not_found']} latency={lat}")
+        return "\n".join(lines)
+
+_router = None
+_router_lock = threading.Lock()
+
+def get_router(keys, models):
+    """Process-wide router; rebuilt only if the key/model set changes."""
+    global _router
+    with _router_lock:
+        if _router is None or _router.keys != list(keys) or _router.models != list(models):
+            _router = KeyModelRouter(keys, models)
+        return _router
@@ -0,0 +1,355 @@
+import os
+import sys
+import json
+import time
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+
+# --- Cron expressions ---
+
+# (min, max) for minute, hour, day-of-month, month, day-of-week (0 = Sunday)
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+def _parse_field(field, lo, hi):
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/', 1)
+            step = int(step)
+            if step < 1:
+                raise ValueError(f"Bad step in cron field: {field}")
+        if part == '*':
+            start, end = lo, hi
+        elif '-' in part:
+            start, end = (int(x) for x in part.split('-', 1))
+        else:
+            start = int(part)
+            # "5/15" means "from 5 every 15"
+            end = hi if step > 1 else start
+        if start < lo or end > hi or start > end:
+            raise ValueError(f"Cron field out of range: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronSchedule:
+    """
+    Standard 5-field cron expression: "minute hour day-of-month month day-of-week".
+    Supports *, lists, ranges and steps ("0 */2 * * *", "15 6-22/4 * * 1-5").
+    """
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: '{expr}'")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(f, lo, hi) for f, (lo, hi) in zip(fields, _FIELD_RANGES))
+        # Cron quirk: if both day fields are restricted, either one matching is enough
+        self._dom_any = fields[2] == '*'
+        self._dow_any = fields[4] == '*'
+
+    def _day_matches(self, dt):
+        dom = dt.day in self.days
+        dow = (dt.weekday() + 1) % 7 in self.weekdays
+        if self._dom_any and self._dow_any:
+            return True
+        if self._dom_any:
+            return dow
+        if self._dow_any:
+            return dom
+        return dom or dow
+
+    def next_after(self, dt):
+        """First matching minute strictly after dt."""
+        dt = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                # Jump to the first day of next month
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+                continue
+            if dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+                continue
+            return dt
+        raise ValueError(f"Cron expression never fires: '{self.expr}'")
+
+    def ticks_between(self, start, end):
+        """All ticks in (start, end]."""
+        ticks = []
+        t = self.next_after(start)
+        while t <= end:
+            ticks.append(t)
+            t = self.next_after(t)
+        return ticks
+
+# --- Overlap protection ---
+
+def _pid_alive(pid):
+    if sys.platform.startswith('win'):
+        # os.kill(pid, 0) terminates processes on Windows; rely on the lease there
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class LockHeld(Exception):
+    pass
+
+# Lock files this process currently holds (tells a live lock of ours from a leftover with a reused PID)
+_held_paths = set()
+
+class PidLock:
+    """
+    Lock file holding "pid + heartbeat". Another process may take it over only
+    if the holder's PID is gone or its lease has not been renewed for `lease` seconds.
+    """
+
+    def __init__(self, path, lease=3 * 3600):
+        self.path = path
+        self.lease = lease
+        self.held = False
+        self._renew_lock = threading.Lock()
+
+    def _write(self, fd):
+        os.write(fd, json.dumps({'pid': os.getpid(), 'heartbeat': time.time()}).encode())
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def acquire(self):
+        for _ in range(2):
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                info = self._read()
+                pid = int((info or {}).get('pid', 0))
+                stale = (
+                    info is None
+                    # Our PID but not held by us: a restarted container reused it (often 1)
+                    or (pid == os.getpid() and os.path.abspath(self.path) not in _held_paths)
+                    or not _pid_alive(pid)
+                    or time.time() - float(info.get('heartbeat', 0)) > self.lease
+                )
+                if not stale:
+                    raise LockHeld(f"Another run holds {self.path} (pid {info.get('pid')})")
+                print(f"[i] Taking over stale lock {self.path} (previous: {info})")
+                try:
+                    os.remove(self.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                self._write(fd)
+            finally:
+                os.close(fd)
+            self.held = True
+            _held_paths.add(os.path.abspath(self.path))
+            return self
+        raise LockHeld(f"Could not acquire {self.path}")
+
+    def renew(self):
+        """
+        Refreshes the heartbeat so long runs don't look stale. Raises LockHeld
+        if the lock was taken over meanwhile (e.g. our lease expired while the
+        machine slept): rewriting it then would evict the new owner.
+        """
+        if not self.held:
+            return
+        with self._renew_lock:
+            info = self._read()
+            if not info or info.get('pid') != os.getpid():
+                self.held = False
+                _held_paths.discard(os.path.abspath(self.path))
+                raise LockHeld(f"Lost {self.path} to pid {(info or {}).get('pid')}")
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump({'pid': os.getpid(), 'heartbeat': time.time()}, f)
+            os.replace(tmp, self.path)
+
+    def keep_alive(self, interval=300):
+        """Context manager that renews the lease every `interval` seconds while a batch runs."""
+        return _Heartbeat(self, interval)
+
+    def release(self):
+        if not self.held:
+            return
+        info = self._read()
+        if info and info.get('pid') == os.getpid():
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        _held_paths.discard(os.path.abspath(self.path))
+        self.held = False
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+class _Heartbeat:
+    def __init__(self, lock, interval):
+        self.lock = lock
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.lock.renew()
+            except OSError as e:
+                print(f"[!] Could not renew {self.lock.path}: {e}")
+            except LockHeld as e:
+                print(f"[!] {e}. No longer renewing it.")
+                return
+
+    def __enter__(self):
+        self.lock.renew()
+        self.thread = threading.Thread(target=self._run, name="lock-heartbeat", daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+# --- Scheduler loop ---
+
+CATCH_UP_POLICIES = ('skip', 'once', 'all')
+
+class Scheduler:
+    """
+    Runs job(should_stop) on a cron schedule inside one long-lived process.
+    - jitter: random 0..N seconds added to every tick
+    - catch_up: what to do with ticks missed while down or busy
+        'skip' -> wait for the next future tick
+        'once' -> run one batch immediately, then continue normally
+        'all'  -> run one batch per missed tick (capped by max_catch_up)
+    - SIGTERM/SIGINT stop new work; the in-flight batch drains before exit.
+    """
+
+    def __init__(self, job, schedule, jitter=0, catch_up='skip', state_file='scheduler_state.json',
+                 max_catch_up=3, lock=None):
+        if catch_up not in CATCH_UP_POLICIES:
+            raise ValueError(f"catch_up must be one of {CATCH_UP_POLICIES}")
+        self.job = job
+        self.schedule = schedule if isinstance(schedule, CronSchedule) else CronSchedule(schedule)
+        self.jitter = jitter
+        self.catch_up = catch_up
+        self.state_file = state_file
+        self.max_catch_up = max_catch_up
+        self.lock = lock
+        self.stop_event = threading.Event()
+
+    def install_signal_handlers(self):
+        def handle(signum, frame):
+            if not self.stop_event.is_set():
+                print(f"\n[i] Received signal {signum}. Finishing in-flight posts, then exiting...")
+            self.stop_event.set()
+        signal.signal(signal.SIGTERM, handle)
+        signal.signal(signal.SIGINT, handle)
+
+    def should_stop(self):
+        return self.stop_event.is_set()
+
+    def _load_last_tick(self):
+        try:
+            with open(self.state_file) as f:
+                return datetime.fromisoformat(json.load(f)['last_tick'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_last_tick(self, tick):
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'last_tick': tick.isoformat()}, f)
+        os.replace(tmp, self.state_file)
+
+    def _run_once(self, tick):
+        print(f"[i] Scheduled run for tick {tick:%Y-%m-%d %H:%M}")
+        try:
+            if self.lock:
+                # Batches can outlast the lease: keep renewing while the job runs
+                with self.lock.keep_alive():
+                    self.job(self.should_stop)
+            else:
+                self.job(self.should_stop)
+        except Exception as e:
+            print(f"[!] Scheduled run failed: {e}")
+        self._save_last_tick(tick)
+
+    def _missed_ticks(self, now):
+        last = self._load_last_tick()
+        if last is None:
+            return []
+        missed = self.schedule.ticks_between(last, now)
+        if not missed or self.catch_up == 'skip':
+            return []
+        if self.catch_up == 'once':
+            return missed[-1:]
+        return missed[-self.max_catch_up:]
+
+    def _sleep_until(self, when):
+        while not self.stop_event.is_set():
+            remaining = (when - datetime.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            # Wake periodically to renew the lease
+            self.stop_event.wait(min(remaining, 300))
+            if self.lock:
+                try:
+                    self.lock.renew()
+                except OSError as e:
+                    # A full disk or a flaky mount shouldn't kill the daemon; retry on the next wake-up
+                    print(f"[!] Could not renew {self.lock.path}: {e}")
+                except LockHeld as e:
+                    # Another process owns the schedule now; running on would mean overlapping batches
+                    print(f"[!] {e}. Stopping the scheduler.")
+                    self.stop_event.set()
+        return False
+
+    def run_forever(self, run_on_start=False):
+        print(f"[i] Scheduler started: '{self.schedule.expr}' (jitter {self.jitter}s, catch-up '{self.catch_up}')")
+        now = datetime.now()
+        pending = self._missed_ticks(now)
+        if run_on_start and not pending:
+            pending = [now.replace(second=0, microsecond=0)]
+        for tick in pending:
+            if self.stop_event.is_set():
+                break
+            self._run_once(tick)
+
+        while not self.stop_event.is_set():
+            tick = self.schedule.next_after(datetime.now())
+            fire_at = tick + timedelta(seconds=random.uniform(0, self.jitter)) if self.jitter else tick
+            print(f"[i] Next run at {fire_at:%Y-%m-%d %H:%M:%S}")
+            if not self._sleep_until(fire_at):
+                break
+            self._run_once(tick)
+
+            # A long batch may have overrun later ticks
+            for missed in self._missed_ticks(datetime.now()):
+                if self.stop_event.is_set():
+                    break
+                self._run_once(missed)
+        print("[i] Scheduler stopped.")
@@ -0,0 +1,22 @@
+import os
+import sqlite3
+
+# All local state (caches, ledgers) lives next to the bot unless BOT_DATA_DIR says otherwise
+DATA_DIR = os.getenv("BOT_DATA_DIR", ".")
+
+def db_path(env_name, default_file):
+    """Resolves a database path from an env override or the data dir."""
+    return os.getenv(env_name) or os.path.join(DATA_DIR, default_file)
+
+def connect(path):
+    """
+    Opens a SQLite connection suitable for sharing a file between threads
+    and processes (WAL journal, busy timeout). Callers open one per operation.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
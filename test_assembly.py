@@ -0,0 +1,63 @@
+from lxml import html as lxml_html
+import assembly
+
+def srcs(html):
+    return [img.get('src') for img in lxml_html.fragment_fromstring(html, create_parent='div').iter('img')]
+
+def test_placeholder_and_distribution():
+    print("Testing Image Placement...")
+    html = "<h2>Key Takeaways</h2><ul><li>One</li></ul>[IMAGE]<p>Para 1</p><p>Para 2</p><p>Para 3</p><p>Para 4</p>"
+    imgs = [assembly.image("http://mock.url/1.jpg", "Case 1 image 1"), assembly.image("http://mock.url/2.jpg")]
+    result = assembly.insert_images(html, imgs)
+    print(result)
+    
+    assert "[IMAGE]" not in result
+    assert srcs(result) == ["http://mock.url/1.jpg", "http://mock.url/2.jpg"]
+    # Image 1 sits where the placeholder was, before the first paragraph
+    assert result.index("1.jpg") < result.index("Para 1")
+    # Image 2: 4 paragraphs, 1 remaining image -> after paragraph index 2
+    assert result.index("Para 3") < result.index("2.jpg") < result.index("Para 4")
+    assert 'alt="Case 1 image 1"' in result
+    assert assembly.IMG_STYLE in result
+    print("[PASS] Image Placement")
+
+def test_no_placeholder_prepends():
+    print("\nTesting Prepend Without Placeholder...")
+    result = assembly.insert_images("Intro text<p>Body</p>", [assembly.image("http://mock.url/1.jpg")])
+    assert result.startswith("<img")
+    assert "Intro text" in result
+    print("[PASS] Prepend Without Placeholder")
+
+def test_leftover_placeholders_removed():
+    print("\nTesting Placeholder Cleanup...")
+    result = assembly.insert_images("<p>[IMAGE] Start</p><p>End [IMAGE]</p>", [])
+    assert "[IMAGE]" not in result
+    assert "Start" in result and "End" in result
+    print("[PASS] Placeholder Cleanup")
+
+def test_placeholder_document_order():
+    print("\nTesting Placeholder Order...")
+    # The nested placeholder comes first in the document, before the <p>'s tail
+    result = assembly.insert_images("<p><span>[IMAGE]one</span></p>[IMAGE]two", [assembly.image("http://mock.url/1.jpg")])
+    assert "[IMAGE]" not in result
+    assert result.index("1.jpg") < result.index("one") < result.index("two")
+    print("[PASS] Placeholder Order")
+
+def test_splice_sections_keeps_existing_content():
+    print("\nTesting Section Splicing...")
+    html = '<p>Intro</p><img src="http://old/1.jpg"><h2>Bottom Line</h2><p>Verdict</p>'
+    result = assembly.splice_sections(html, [
+        ("Key Takeaways", "<h2>Key Takeaways</h2><ul><li>Point</li></ul>"),
+        ("FAQ", "<h2>FAQ</h2><h3>Why?</h3><p>Because.</p>"),
+    ])
+    assert result.startswith("<h2>Key Takeaways</h2>")
+    assert result.index("http://old/1.jpg") < result.index("<h2>FAQ</h2>") < result.index("<h2>Bottom Line</h2>")
+    assert "<p>Intro</p>" in result and "<p>Verdict</p>" in result
+    print("[PASS] Section Splicing")
+
+if __name__ == "__main__":
+    test_placeholder_and_distribution()
+    test_no_placeholder_prepends()
+    test_leftover_placeholders_removed()
+    test_placeholder_document_order()
+    test_splice_sections_keeps_existing_content()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import audit_index
+from audit_index import AuditIndex
+
+def make_index(blog_id="blog"):
+    return AuditIndex(path=os.path.join(tempfile.mkdtemp(), "audit.db"), blog_id=blog_id)
+
+def post(etag="e1", updated="2026-01-01T00:00:00Z", content="<p>hello</p>"):
+    return {'id': '42', 'etag': etag, 'updated': updated, 'content': content}
+
+def test_unchanged_detection():
+    print("Testing Audit Index Unchanged Detection...")
+    index = make_index()
+    p = post()
+    assert not index.unchanged(p)
+    index.record(p, audit_index.OK, {'word_count': 900})
+    assert index.unchanged(p)
+    # New etag = edited since the last audit
+    assert not index.unchanged(post(etag="e2"))
+    # Without etags the `updated` timestamp decides
+    index.record(post(etag=None), audit_index.OK, {'word_count': 900})
+    assert index.unchanged(post(etag=None))
+    assert not index.unchanged(post(etag=None, updated="2026-02-01T00:00:00Z"))
+    # Flagged / fixed posts are always looked at again
+    index.record(p, audit_index.LOW_VALUE, {'word_count': 100}, ["Thin Content"])
+    assert not index.unchanged(p)
+    assert index.get('42')['reasons'] == ["Thin Content"]
+    print("[PASS] Audit Index Unchanged Detection")
+
+def test_metrics_reuse_and_rules_version():
+    print("\nTesting Audit Index Metric Reuse...")
+    index = make_index()
+    p = post()
+    chash = audit_index.content_hash(p['content'])
+    index.record(p, audit_index.OK, {'word_count': 900}, chash=chash)
+    # Labels-only edit: new etag, same body -> stored metrics are reused
+    assert index.known_metrics(post(etag="e2"), chash) == {'word_count': 900}
+    assert index.known_metrics(post(content="<p>new</p>"), audit_index.content_hash("<p>new</p>")) is None
+    # Validator thresholds changed: every verdict is stale
+    index.rules = "other"
+    assert not index.unchanged(p)
+    assert index.known_metrics(p, chash) is None
+    print("[PASS] Audit Index Metric Reuse")
+
+def test_cursor():
+    print("\nTesting Audit Index Cursor...")
+    index = make_index()
+    assert index.load_cursor() == (None, 0)
+    index.save_cursor("tok2", 100)
+    assert index.load_cursor() == ("tok2", 100)
+    # Cursor is per blog
+    other = AuditIndex(path=index.path, blog_id="other")
+    assert other.load_cursor() == (None, 0)
+    # End of the blog clears it
+    index.save_cursor(None, 150)
+    assert index.load_cursor() == (None, 0)
+    print("[PASS] Audit Index Cursor")
+
+if __name__ == "__main__":
+    test_unchanged_detection()
+    test_metrics_reuse_and_rules_version()
+    test_cursor()
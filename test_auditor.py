@@ -1,6 +1,15 @@
 
-from content_auditor import clean_labels, clean_html_from_text
+import content_auditor
+from content_auditor import clean_labels, clean_html_from_text, plan_repair
 from bs4 import BeautifulSoup
+import validator
+import os
+import tempfile
+import httplib2
+from googleapiclient.errors import HttpError
+from concurrent.futures import ProcessPoolExecutor
+import audit_index
+import rate_limiter
 
 def test_cleaning():
     print("Testing Label Cleaning...")
@@ -15,6 +24,12 @@ def test_cleaning():
     assert "Mixed" in cleaned
     assert "<p>" not in str(cleaned)
     assert changed == True
+
+    # Plain labels pass through untouched; empty ones are dropped
+    assert clean_labels(["AI", "Tech News", "2026"]) == (["AI", "Tech News", "2026"], False)
+    assert clean_labels(["AI", "", " Padded "]) == (["AI", "Padded"], True)
+    # Email-posted articles often have no labels at all
+    assert clean_labels([]) == ([], False) and clean_labels(None) == ([], False)
     print("[PASS] Label Cleaning")
 
 def test_noise_logic():
@@ -45,7 +60,163 @@ def test_rebuild_logic_mock():
     assert "[IMAGE]" not in html_fixed
     print("[PASS] Rebuild Logic")
 
+def test_repair_planning():
+    print("\nTesting Repair Planning...")
+    body = "<h2>The Deep Dive</h2>" + "<p>" + "detail " * 1100 + "</p><h2>Bottom Line</h2><p>Verdict.</p>"
+    
+    # Long, well-formed post that only lacks FAQ/Takeaways -> just those two sections
+    m = validator.analyze(body + '<img src="http://x/1.jpg"><img src="http://x/2.jpg"><h2>Expert Analysis</h2><p>Why.</p>')
+    reasons = validator.find_issues(metrics=m)
+    assert reasons == ["Missing Structured Sections (FAQ/Takeaways)"]
+    assert plan_repair(m, reasons) == ["Key Takeaways", "FAQ"]
+
+    # Images-only problem -> repair with no LLM sections at all
+    m = validator.analyze(body + "<h2>FAQ</h2><h2>Expert Analysis</h2><p>Why.</p>")
+    assert plan_repair(m, validator.find_issues(metrics=m)) == []
+
+    # An H2 that only loosely looks like analysis still gets the real section
+    imgs = '<img src="http://x/1.jpg"><img src="http://x/2.jpg">'
+    m = validator.analyze(body + imgs + "<h2>FAQ</h2><h2>Market Implications</h2><p>Why.</p>")
+    reasons = validator.find_issues(metrics=m)
+    assert reasons == ["Missing Expert Analysis (E-E-A-T)"]
+    assert plan_repair(m, reasons) == ["Expert Analysis & Implications"]
+
+    # Broken structure or far too short -> full rebuild
+    m = validator.analyze("Wall of text " * 50)
+    assert plan_repair(m, validator.find_issues(metrics=m)) is None
+    print("[PASS] Repair Planning")
+
+def test_cursor_rejection():
+    print("\nTesting Cursor Rejection...")
+    rejected = HttpError(httplib2.Response({'status': 400}), b'{"error": {"message": "Invalid pageToken"}}')
+    server_error = HttpError(httplib2.Response({'status': 503}), b'{"error": {"message": "Backend Error"}}')
+    # Only the page token being refused resets the pass; transient failures keep it
+    assert content_auditor.cursor_rejected(rejected)
+    assert not content_auditor.cursor_rejected(server_error)
+    assert not content_auditor.cursor_rejected(ConnectionError("reset by peer"))
+    print("[PASS] Cursor Rejection")
+
+def test_noop_repair_not_counted():
+    print("\nTesting No-op Repair...")
+    html = "<h2>The Deep Dive</h2><p>" + "detail " * 1100 + '</p><img src="http://x/1.jpg"><img src="http://x/2.jpg">'
+    service = FakeService()
+    post = {'id': "p", 'title': "Title", 'content': html}
+    # Nothing to write and no images needed: no update, and not a fix
+    assert content_auditor.repair_post(service, "blog", post, validator.analyze(html), []) is False
+    assert not service.updates
+    print("[PASS] No-op Repair")
+
+def use_test_limiter():
+    """Blogger calls below go through rate_limiter.execute: keep them off the real buckets."""
+    rate_limiter._limiter = rate_limiter.RateLimiter(path=os.path.join(tempfile.mkdtemp(), "rates.db"),
+                                                     limits={'blogger': (6000, 100)})
+
+class FakeRequest:
+    def __init__(self, service, post_id):
+        self.service = service
+        self.post_id = post_id
+
+    def execute(self):
+        self.service.single_gets.append(self.post_id)
+        if self.post_id == "gone":
+            raise Exception("404")
+        return {'id': self.post_id, 'content': f"<p>{self.post_id}</p>"}
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.service.batches.append([rid for rid, _ in self.requests])
+        for rid, request in self.requests:
+            # Sub-requests fail independently inside a batch
+            if rid in ("flaky", "gone"):
+                self.callback(rid, None, Exception("500"))
+            else:
+                self.callback(rid, {'id': rid, 'content': f"<p>{rid}</p>"}, None)
+
+class FakeList:
+    def __init__(self, page):
+        self.page = page
+
+    def execute(self):
+        return self.page
+
+class FakeService:
+    def __init__(self, pages=None):
+        self.batches = []
+        self.single_gets = []
+        self.pages = pages or {}
+        self.list_calls = []
+        self.updates = []
+
+    def update(self, **kwargs):
+        self.updates.append(kwargs)
+        return FakeList({})
+
+    def list(self, pageToken=None, fetchBodies=True, **kwargs):
+        self.list_calls.append((pageToken, fetchBodies))
+        return FakeList(self.pages[pageToken])
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def posts(self):
+        return self
+
+    def get(self, blogId=None, postId=None):
+        return FakeRequest(self, postId)
+
+def test_fetch_bodies():
+    print("\nTesting Batched Body Fetch...")
+    original = content_auditor.BODY_BATCH
+    content_auditor.BODY_BATCH = 2
+    use_test_limiter()
+    service = FakeService()
+    try:
+        bodies = content_auditor.fetch_bodies(service, "blog", ["a", "flaky", "b", "gone"])
+    finally:
+        content_auditor.BODY_BATCH = original
+    assert service.batches == [["a", "flaky"], ["b", "gone"]]
+    # Only what the batches didn't return is fetched one by one
+    assert service.single_gets == ["flaky", "gone"]
+    assert sorted(bodies) == ["a", "b", "flaky"]
+    assert bodies["flaky"]['content'] == "<p>flaky</p>"
+    print("[PASS] Batched Body Fetch")
+
+def test_parallel_scoring():
+    print("\nTesting Parallel Page Scoring...")
+    pages = {None: {'items': [{'id': "a", 'title': "A", 'etag': "1"}, {'id': "b", 'title': "B", 'etag': "1"}],
+                    'nextPageToken': "p2"}}
+    service = FakeService(pages)
+    use_test_limiter()
+    index = audit_index.AuditIndex(path=os.path.join(tempfile.mkdtemp(), "audit.db"))
+    # "a" was judged OK at this etag last run: skipped without fetching its body
+    index.record({'id': "a", 'etag': "1"}, audit_index.OK, validator.analyze("<p>a</p>"))
+
+    inline = content_auditor.score_page(content_auditor.load_page(service, "blog", index, None))
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        page = content_auditor.load_page(service, "blog", index, None, pool)
+        assert page['next'] == "p2" and page['skipped'] == 1
+        parallel = content_auditor.score_page(page)
+    assert service.list_calls == [(None, False), (None, False)]
+    assert [p['id'] for _, p, *_ in parallel] == ["b"]
+    assert parallel == inline
+    _, _, metrics, reasons, plan, chash = parallel[0]
+    assert metrics['paragraphs'] == 1 and reasons and chash == audit_index.content_hash("<p>b</p>")
+    print("[PASS] Parallel Page Scoring")
+
 if __name__ == "__main__":
     test_cleaning()
     test_noise_logic()
     test_rebuild_logic_mock()
+    test_repair_planning()
+    test_fetch_bodies()
+    test_parallel_scoring()
+    test_noop_repair_not_counted()
+    test_cursor_rejection()
@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import types
+import threading
+import tempfile
+import content
+import gemini_clients
+import rate_limiter
+import gen_cache
+import router
+from router import KeyModelRouter
+from content import MalformedOutput, check_partial, parse_response
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    def __init__(self, pieces, gate=None):
+        self.pieces = pieces
+        self.gate = gate  # with an Event, every chunk after the first waits for it
+        self.consumed = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        def gen():
+            for p in self.pieces:
+                if self.gate is not None and self.consumed:
+                    self.gate.wait(timeout=5)
+                self.consumed += 1
+                yield FakeChunk(p)
+        return gen()
+
+def test_parse_response():
+    print("Testing Response Parsing...")
+    raw = "Big Headline\n|||SEPARATOR|||\n```html\n<h2>Key Takeaways</h2>(An image depicting a chart)[IMAGE}\n```"
+    post = parse_response(raw)
+    assert post['title'] == "Big Headline"
+    assert post['content'] == "<h2>Key Takeaways</h2>[IMAGE]"
+    print("[PASS] Response Parsing")
+
+def test_partial_checks():
+    print("\nTesting Incremental Validation...")
+    assert check_partial("Headline in prog") is None
+    assert check_partial("Headline\n|||SEPARATOR|||\n<h2>Key") == "Headline"
+    for bad in ['{"title": "x"', "Headline\n|||SEPARATOR|||\n## Key Takeaways", "x" * (content.STREAM_SEPARATOR_CHARS + 1)]:
+        try:
+            check_partial(bad)
+            assert False, f"should reject: {bad[:30]}"
+        except MalformedOutput:
+            pass
+    print("[PASS] Incremental Validation")
+
+def test_stream_aborts_early_and_reports_title():
+    print("\nTesting Stream Early Abort...")
+    titles = []
+    good = FakeModel(["Headline\n|||SEP", "ARATOR|||\n<h2>Key Takeaways</h2>", "<p>Body</p>"])
+    text = content._stream_text(good, "prompt", on_title=titles.append)
+    assert titles == ["Headline"]
+    assert parse_response(text)['content'].endswith("<p>Body</p>")
+
+    bad = FakeModel(['{"title": ', '"x", "content": "y"}'] + ["more"] * 50)
+    try:
+        content._stream_text(bad, "prompt")
+        assert False, "JSON output should abort"
+    except MalformedOutput:
+        pass
+    assert bad.consumed == 1
+    print("[PASS] Stream Early Abort")
+
+def test_batch_parsing():
+    print("\nTesting Batched Response Parsing...")
+    long_body = "<p>" + "insight " * content.BATCH_MIN_WORDS + "</p>"
+    raw = (
+        "|||ARTICLE 1|||\nFirst Headline\n|||SEPARATOR|||\n" + long_body + "\n|||END ARTICLE 1|||\n"
+        "|||ARTICLE 2|||\nToo Short\n|||SEPARATOR|||\n<p>tiny</p>\n|||END ARTICLE 2|||\n"
+        "|||ARTICLE 3|||\nNo separator here\n|||END ARTICLE 3|||"
+    )
+    posts = content.parse_batch_response(raw, 3)
+    assert list(posts) == [0]
+    assert posts[0]['title'] == "First Headline"
+
+    try:
+        content.parse_batch_response("nothing useful", 2)
+        assert False, "empty batch should be malformed"
+    except MalformedOutput:
+        pass
+    print("[PASS] Batched Response Parsing")
+
+def test_sectional_stitching():
+    print("\nTesting Sectional Generation...")
+    outline_raw = (
+        "Sectional Headline\n|||SEPARATOR|||\n<h2>Key Takeaways</h2><ul><li>Point</li></ul>\n[IMAGE]\n<p>Intro.</p>\n"
+        "|||OUTLINE|||\n" + "\n".join(f"{name}: note a; note b" for name, _, _ in content.SECTIONS)
+    )
+    seen_prompts = []
+
+    def fake_generate_text(prompt, parse, stream=None, on_title=None, label="article", deadline=None, in_flight=None):
+        seen_prompts.append(label)
+        if label == "outline":
+            return parse(outline_raw), "fake-model"
+        name = label.split("'")[1]
+        return parse(f"<h2>{name}</h2><p>{'detail ' * content.SECTION_MIN_WORDS}</p>"), "fake-model"
+
+    original = content.generate_text
+    content.generate_text = fake_generate_text
+    try:
+        post, model = content.generate_post_sectional("Some Topic")
+    finally:
+        content.generate_text = original
+
+    assert post['title'] == "Sectional Headline"
+    html = post['content']
+    assert html.startswith("<h2>Key Takeaways</h2>") and "[IMAGE]" in html
+    positions = [html.index(f"<h2>{name}</h2>") for name, _, _ in content.SECTIONS]
+    assert positions == sorted(positions)
+    assert len(seen_prompts) == 1 + len(content.SECTIONS)
+    print("[PASS] Sectional Generation")
+
+def test_parallel_sections_spread_across_pairs():
+    print("\nTesting Parallel Sections Use Different Pairs...")
+    names = [name for name, _, _ in content.SECTIONS]
+    keys = ["key-one-aaaa", "key-two-bbbb"]
+    r = KeyModelRouter(keys, content.MODELS, path=os.path.join(tempfile.mkdtemp(), "router.db"))
+    # Every section waits for the others, so all of them are in flight at once
+    barrier = threading.Barrier(len(names))
+    used = []
+
+    class SectionModel:
+        def __init__(self, key, name):
+            self.pair = (key, name)
+
+        def generate_content(self, prompt, **kwargs):
+            used.append(self.pair)
+            barrier.wait(timeout=5)
+            section = re.search(r'section "<h2>(.*?)</h2>"', prompt).group(1)
+            return FakeChunk(f"<h2>{section}</h2><p>{'detail ' * content.SECTION_MIN_WORDS}</p>")
+
+    originals = (content.load_keys, router.get_router, gemini_clients.get_model, rate_limiter._limiter)
+    content.load_keys = lambda: keys
+    router.get_router = lambda k, m: r
+    gemini_clients.get_model = SectionModel
+    rate_limiter._limiter = rate_limiter.RateLimiter(path=os.path.join(tempfile.mkdtemp(), "rates.db"),
+                                                     limits={'gemini': (600, 10)})
+    try:
+        content.generate_sections("Topic", "Title", names, "context")
+    finally:
+        content.load_keys, router.get_router, gemini_clients.get_model, rate_limiter._limiter = originals
+
+    assert len(used) == len(names)
+    assert len(set(used)) == len(names), used
+    print("[PASS] Parallel Sections Use Different Pairs")
+
+def test_failed_passes_back_off():
+    print("\nTesting Back-Off After A Failed Pass...")
+
+    class NoCooldownRouter:
+        """Errors that don't cool a pair down, e.g. a 500 the router shrugs off."""
+        def pick(self, exclude=(), prefer_fast=False):
+            free = [("key-one-aaaa", m) for m in content.MODELS if ("key-one-aaaa", m) not in exclude]
+            return free[0] if free else None
+
+        def seconds_until_available(self, exclude=()):
+            return 0.0
+
+        def record_failure(self, key, model, error):
+            return 'error'
+
+    class BrokenModel:
+        calls = 0
+
+        def generate_content(self, prompt, **kwargs):
+            BrokenModel.calls += 1
+            raise RuntimeError("500 Internal error")
+
+    sleeps = []
+    originals = (content.load_keys, router.get_router, gemini_clients.get_model, rate_limiter._limiter, content.time)
+    content.load_keys = lambda: ["key-one-aaaa"]
+    router.get_router = lambda k, m: NoCooldownRouter()
+    gemini_clients.get_model = lambda key, name: BrokenModel()
+    rate_limiter._limiter = rate_limiter.RateLimiter(path=os.path.join(tempfile.mkdtemp(), "rates.db"),
+                                                     limits={'gemini': (6000, 100)})
+    content.time = types.SimpleNamespace(time=time.time, sleep=sleeps.append)
+    try:
+        assert content.generate_text("prompt", parse_response, stream=False) == (None, None)
+    finally:
+        content.load_keys, router.get_router, gemini_clients.get_model, rate_limiter._limiter, content.time = originals
+
+    # Two backed-off retries of the whole pool, then it gives up instead of spinning
+    assert sleeps == [content.PASS_BACKOFF, content.PASS_BACKOFF * 2], sleeps
+    assert len(content.MODELS) * 2 < BrokenModel.calls <= len(content.MODELS) * 3
+    print("[PASS] Back-Off After A Failed Pass")
+
+def test_gate_failures_not_cached():
+    print("\nTesting Gate-Failed Articles Aren't Cached...")
+    thin = {'title': "Thin", 'content': "<h2>Key Takeaways</h2><p>Too short.</p>"}
+    good = {'title': "Good", 'content': "<h2>Key Takeaways</h2><h2>Expert Analysis</h2><h2>FAQ</h2>"
+                                        "<p>" + "insight " * 1100 + "</p>"}
+    answers = []
+
+    def fake_generate_text(prompt, parse, stream=None, on_title=None, label="article", exclude_models=(),
+                           deadline=None):
+        return dict(answers.pop(0)), content.MODELS[0]
+
+    original_text, original_cache = content.generate_text, gen_cache._cache
+    content.generate_text = fake_generate_text
+    gen_cache._cache = gen_cache.GenerationCache(path=os.path.join(tempfile.mkdtemp(), "gen.db"))
+    try:
+        answers[:] = [thin] * (1 + content.QUALITY_RETRIES)
+        assert content.generate_post("Topic")['title'] == "Thin"
+        assert gen_cache._cache.get(content.PROMPT_VERSION, "Topic", content.MODELS) == (None, None)
+        answers[:] = [good]
+        assert content.generate_post("Topic")['title'] == "Good"
+        assert gen_cache._cache.get(content.PROMPT_VERSION, "Topic", content.MODELS)[0]['title'] == "Good"
+    finally:
+        content.generate_text, gen_cache._cache = original_text, original_cache
+    print("[PASS] Gate-Failed Articles Aren't Cached")
+
+def test_hedged_request():
+    print("\nTesting Hedged Requests...")
+    pieces = ["Headline\n|||SEPARATOR|||\n", "<h2>Key Takeaways</h2>"] + ["<p>Body</p>"] * 20
+    # The slow stream stalls after its first chunk until the race is decided
+    stalled = threading.Event()
+    models = {"slow-model": FakeModel(pieces, gate=stalled), "fast-model": FakeModel(pieces)}
+    r = KeyModelRouter(["key-one-aaaa"], list(models), path=os.path.join(tempfile.mkdtemp(), "router.db"))
+    titles = []
+
+    original_get_model, original_after, original_limiter = gemini_clients.get_model, content.HEDGE_AFTER, rate_limiter._limiter
+    gemini_clients.get_model = lambda key, name: models[name]
+    # No latency data yet, so the primary gets HEDGE_AFTER: hedge as soon as it isn't done
+    content.HEDGE_AFTER = 0
+    rate_limiter._limiter = rate_limiter.RateLimiter(path=os.path.join(tempfile.mkdtemp(), "rates.db"))
+    try:
+        result, winner, failures = content._attempt_hedged(
+            r, ("key-one-aaaa", "slow-model"), set(), "prompt", parse_response, True, titles.append)
+        # Let the slow stream take its next chunk, where it notices the cancel
+        stalled.set()
+        for thread in threading.enumerate():
+            if thread.name.startswith("hedge"):
+                thread.join(timeout=5)
+    finally:
+        gemini_clients.get_model, content.HEDGE_AFTER, rate_limiter._limiter = original_get_model, original_after, original_limiter
+
+    assert winner == ("key-one-aaaa", "fast-model")
+    assert result['title'] == "Headline" and not failures
+    assert models["slow-model"].consumed == 2 < len(pieces)
+    assert r.states[(router.key_id("key-one-aaaa"), "fast-model")]['latency'] is not None
+    assert r.states[(router.key_id("key-one-aaaa"), "slow-model")]['latency'] is None
+    print("[PASS] Hedged Requests")
+
+if __name__ == "__main__":
+    test_parse_response()
+    test_partial_checks()
+    test_stream_aborts_early_and_reports_title()
+    test_batch_parsing()
+    test_sectional_stitching()
+    test_parallel_sections_spread_across_pairs()
+    test_failed_passes_back_off()
+    test_gate_failures_not_cached()
+    test_hedged_request()
@@ -0,0 +1,43 @@
+import time
+from deadline import Deadline, DeadlineExceeded
+
+def test_timeouts_follow_budget():
+    print("Testing Deadline Timeouts...")
+    unlimited = Deadline()
+    assert unlimited.remaining() is None and not unlimited.expired()
+    assert unlimited.timeout(25) == 25 and unlimited.timeout() is None
+
+    batch = Deadline(5)
+    assert batch.timeout(25) <= 5
+    assert batch.timeout(2) == 2
+
+    # A topic budget never outlives its batch
+    topic = batch.child(60)
+    assert topic.remaining() <= 5
+    assert Deadline(60).child(None).remaining() > 50
+    print("[PASS] Deadline Timeouts")
+
+def test_expired_budget_raises():
+    print("\nTesting Deadline Expiry...")
+    batch = Deadline(1.2)
+    topic = batch.child(600)
+    time.sleep(0.3)
+    # Less than MIN_CALL_TIMEOUT left: not worth starting another call
+    assert topic.expired()
+    try:
+        topic.timeout(10, what="image search")
+        assert False, "expired deadline should raise"
+    except DeadlineExceeded as e:
+        assert "topic budget exhausted before image search" in str(e)
+
+    # Cancelling ends a budget and its children, but not the parent
+    parent = Deadline(60)
+    search = parent.child(None, label="image prefetch")
+    task = search.child(30)
+    search.cancel()
+    assert search.expired() and task.expired() and not parent.expired()
+    print("[PASS] Deadline Expiry")
+
+if __name__ == "__main__":
+    test_timeouts_follow_budget()
+    test_expired_budget_raises()
@@ -0,0 +1,30 @@
+import threading
+import gemini_clients
+
+def test_models_are_cached_per_key():
+    print("Testing Gemini Client Pool...")
+    a1 = gemini_clients.get_model("test-key-a", "gemini-2.0-flash")
+    a2 = gemini_clients.get_model("test-key-a", "gemini-2.0-flash")
+    b1 = gemini_clients.get_model("test-key-b", "gemini-2.0-flash")
+    a_lite = gemini_clients.get_model("test-key-a", "gemini-2.0-flash-lite")
+
+    assert a1 is a2
+    assert a1 is not b1
+    # Models on the same key share one transport; different keys never do
+    assert a1._client is a_lite._client
+    assert a1._client is not b1._client
+    print("[PASS] Gemini Client Pool")
+
+def test_concurrent_access_builds_once():
+    print("\nTesting Concurrent Pool Access...")
+    got = []
+    threads = [threading.Thread(target=lambda: got.append(gemini_clients.get_model("test-key-c", "gemini-2.5-flash")))
+               for _ in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len({id(m) for m in got}) == 1
+    print("[PASS] Concurrent Pool Access")
+
+if __name__ == "__main__":
+    test_models_are_cached_per_key()
+    test_concurrent_access_builds_once()
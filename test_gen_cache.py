@@ -0,0 +1,52 @@
+import os
+import json
+import time
+import tempfile
+from gen_cache import GenerationCache, cache_key
+
+MODELS = ['gemini-2.0-flash', 'gemini-2.5-pro']
+POST = {"title": "Headline", "content": "<p>" + "word " * 50 + "</p>"}
+
+def make_cache(**kw):
+    return GenerationCache(path=os.path.join(tempfile.mkdtemp(), "gen.db"), **kw)
+
+def test_content_addressing():
+    print("Testing Generation Cache Keys...")
+    assert cache_key("v1", "Mars Rover", "m") == cache_key("v1", "  mars   rover ", "m")
+    assert cache_key("v1", "Mars Rover", "m") != cache_key("v2", "Mars Rover", "m")
+    assert cache_key("v1", "Mars Rover", "m") != cache_key("v1", "Mars Rover", "other")
+    print("[PASS] Generation Cache Keys")
+
+def test_roundtrip_and_preference():
+    print("\nTesting Generation Cache Lookup...")
+    cache = make_cache()
+    assert cache.get("v1", "Mars Rover", MODELS) == (None, None)
+    cache.put("v1", "Mars Rover", "gemini-2.5-pro", POST)
+    post, model = cache.get("v1", "Mars Rover", MODELS)
+    assert post == POST and model == "gemini-2.5-pro"
+    # New template version -> miss
+    assert cache.get("v2", "Mars Rover", MODELS) == (None, None)
+    cache.invalidate("v1", "Mars Rover", MODELS)
+    assert cache.get("v1", "Mars Rover", MODELS) == (None, None)
+    print("[PASS] Generation Cache Lookup")
+
+def test_ttl_and_size_cap():
+    print("\nTesting Generation Cache Eviction...")
+    cache = make_cache(ttl=0.05)
+    cache.put("v1", "Short Lived", MODELS[0], POST)
+    time.sleep(0.1)
+    assert cache.get("v1", "Short Lived", MODELS) == (None, None)
+
+    entry = len(json.dumps(POST))
+    cache = make_cache(max_bytes=entry * 2)
+    for topic in ["One", "Two", "Three"]:
+        cache.put("v1", topic, MODELS[0], POST)
+        time.sleep(0.01)
+    assert cache.get("v1", "One", MODELS) == (None, None)
+    assert cache.get("v1", "Three", MODELS)[0] == POST
+    print("[PASS] Generation Cache Eviction")
+
+if __name__ == "__main__":
+    test_content_addressing()
+    test_roundtrip_and_preference()
+    test_ttl_and_size_cap()
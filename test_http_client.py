@@ -0,0 +1,128 @@
+import json
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http_client
+from http_client import HttpClient
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    failures_left = 0
+
+    def do_GET(self):
+        if self.path.startswith("/flaky") and Handler.failures_left > 0:
+            Handler.failures_left -= 1
+            self._reply(503, {'error': 'busy'})
+            return
+        self._reply(200, {'path': self.path})
+
+    def do_HEAD(self):
+        if self.path.startswith("/moved"):
+            self.send_response(301)
+            self.send_header("Location", "/img.png")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def test_connections_are_reused():
+    print("Testing HTTP Connection Reuse...")
+    server, base = start_server()
+    client = HttpClient(host_pools={})
+    try:
+        for i in range(5):
+            assert client.get(f"{base}/item/{i}", params={'q': 'x'}).json()['path'].startswith(f"/item/{i}")
+        assert client.head(f"{base}/img.png").status_code == 200
+        stats = client.stats()
+        assert stats == {'requests': 6, 'connections': 1, 'reused': 5}, stats
+        assert "1 connections (5 reused)" in client.summary()
+    finally:
+        client.close()
+        server.shutdown()
+    print("[PASS] HTTP Connection Reuse")
+
+def test_retries_transient_errors():
+    print("\nTesting HTTP Retry/Backoff...")
+    server, base = start_server()
+    original_backoff = http_client.BACKOFF
+    http_client.BACKOFF = 0
+    client = HttpClient(host_pools={})
+    try:
+        Handler.failures_left = 2
+        res = client.get(f"{base}/flaky")
+        assert res.status_code == 200 and Handler.failures_left == 0
+    finally:
+        http_client.BACKOFF = original_backoff
+        client.close()
+        server.shutdown()
+    print("[PASS] HTTP Retry/Backoff")
+
+def test_host_pool_config():
+    print("\nTesting Per-Host Pool Config...")
+    assert http_client.parse_host_pools("www.googleapis.com=16, newsapi.org=2,bad,x=y") == {
+        'www.googleapis.com': 16, 'newsapi.org': 2}
+    client = HttpClient(host_pools={'www.googleapis.com': 16})
+    adapter = client.session.get_adapter("https://www.googleapis.com/customsearch/v1")
+    assert adapter._pool_maxsize == 16
+    assert client.session.get_adapter("https://newsapi.org/v2")._pool_maxsize == http_client.POOL_SIZE
+    client.close()
+    print("[PASS] Per-Host Pool Config")
+
+class HttpxStandIn:
+    """
+    The slice of httpx.Client that HttpClient uses, with httpx's default of
+    not following redirects (used when httpx isn't installed).
+    """
+
+    def build_request(self, method, url, params=None, headers=None, timeout=None):
+        return requests.Request(method, url, params=params, headers=headers).prepare()
+
+    def send(self, request, stream=False, follow_redirects=False):
+        with requests.Session() as session:
+            return session.send(request, stream=stream, allow_redirects=follow_redirects)
+
+    def close(self):
+        pass
+
+def test_redirects_match_across_backends():
+    print("\nTesting Redirect Handling On Both Backends...")
+    server, base = start_server()
+    plain = HttpClient(host_pools={}, http2=False)
+    if http_client.httpx is not None:
+        h2 = HttpClient(host_pools={}, http2=True)
+    else:
+        h2 = HttpClient(host_pools={}, http2=False)
+        h2.http2, h2.session = True, HttpxStandIn()
+    try:
+        for client in (plain, h2):
+            assert client.head(f"{base}/moved").status_code == 200
+            assert client.head(f"{base}/moved", follow_redirects=False).status_code == 301
+    finally:
+        plain.close()
+        h2.close()
+        server.shutdown()
+    print("[PASS] Redirect Handling On Both Backends")
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_retries_transient_errors()
+    test_host_pool_config()
+    test_redirects_match_across_backends()
@@ -0,0 +1,58 @@
+import os
+import time
+import tempfile
+from image_cache import ImageCache, normalize_query
+
+def make_cache(**kw):
+    path = os.path.join(tempfile.mkdtemp(), "image_cache.db")
+    return ImageCache(path=path, **kw)
+
+def test_normalization():
+    print("Testing Query Normalization...")
+    assert normalize_query("Lea Michele's NEW Show!") == normalize_query("lea michele  new show")
+    assert ImageCache.make_key("Apple", "large") != ImageCache.make_key("Apple", None)
+    print("[PASS] Query Normalization")
+
+def test_hits_and_negative_results():
+    print("\nTesting Cache Hits / Negative Results...")
+    cache = make_cache()
+    assert cache.get("Mars Rover", "large") is None
+    rover = [{'link': "https://example.com/rover.jpg", 'width': 1600, 'height': 900},
+             {'link': "https://example.com/rover2.jpg", 'width': 800, 'height': 600}]
+    cache.put("Mars Rover", "large", rover)
+    assert cache.get("mars rover!", "large") == rover
+
+    cache.put("obscure thing", None, None)
+    assert cache.get("Obscure Thing", None) == []  # cached miss
+    print("[PASS] Cache Hits / Negative Results")
+
+def test_used_links():
+    print("\nTesting Used Image Tracking...")
+    cache = make_cache()
+    cache.mark_used(["https://example.com/a.jpg"])
+    assert cache.used(["https://example.com/a.jpg", "https://example.com/b.jpg"]) == {"https://example.com/a.jpg"}
+    assert cache.used([]) == set()
+    print("[PASS] Used Image Tracking")
+
+def test_ttl_and_lru():
+    print("\nTesting TTL and LRU Eviction...")
+    cache = make_cache(ttl=0.05, negative_ttl=0.05)
+    cache.put("short lived", None, [{'link': "https://example.com/a.jpg", 'width': 0, 'height': 0}])
+    time.sleep(0.1)
+    assert cache.get("short lived", None) is None
+
+    cache = make_cache(max_entries=2)
+    cache.put("one", None, [{'link': "https://example.com/1.jpg"}])
+    cache.put("two", None, [{'link': "https://example.com/2.jpg"}])
+    time.sleep(0.01)
+    cache.get("one", None)  # "two" is now least recently used
+    cache.put("three", None, [{'link': "https://example.com/3.jpg"}])
+    assert cache.get("two", None) is None
+    assert cache.get("one", None) == [{'link': "https://example.com/1.jpg"}]
+    print("[PASS] TTL and LRU Eviction")
+
+if __name__ == "__main__":
+    test_normalization()
+    test_hits_and_negative_results()
+    test_used_links()
+    test_ttl_and_lru()
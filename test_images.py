@@ -0,0 +1,244 @@
+import os
+import time
+import tempfile
+import threading
+import images
+import image_cache
+import http_client
+import rate_limiter
+from image_cache import ImageCache
+from quota import QuotaLedger, BatchBudget
+
+def item(link, width, height):
+    return {'link': link, 'image': {'width': width, 'height': height}}
+
+SEARCH_ENV = ("GOOGLE_SEARCH_API_KEY", "GOOGLE_SEARCH_CX")
+
+def use_test_limiter(sleeps=None):
+    """Fresh rate limiter on a temp DB; with a sleeps list, waits are recorded on a fake clock instead."""
+    now = [time.time()]
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    fake = sleeps is not None
+    rate_limiter._limiter = rate_limiter.RateLimiter(
+        path=os.path.join(tempfile.mkdtemp(), "rates.db"), limits={'search': (6000, 100)},
+        clock=(lambda: now[0]) if fake else None, sleep=fake_sleep if fake else None)
+    return rate_limiter._limiter
+
+def save_globals():
+    """The search env vars and limiter that use_test_credentials / use_test_limiter replace."""
+    return {name: os.environ.get(name) for name in SEARCH_ENV}, rate_limiter._limiter
+
+def restore_globals(saved):
+    env, rate_limiter._limiter = saved
+    for name, value in env.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    images.load_search_credentials.cache_clear()
+
+def use_test_credentials():
+    use_test_limiter()
+    os.environ["GOOGLE_SEARCH_API_KEY"] = "test-key"
+    os.environ["GOOGLE_SEARCH_CX"] = "test-cx"
+    images.load_search_credentials.cache_clear()
+    ledger = QuotaLedger(path=os.path.join(tempfile.mkdtemp(), "quota.db"), daily_quota=100)
+    return BatchBudget(ledger, images.load_search_credentials(), allowance=50)
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+def test_ranking():
+    print("Testing Image Candidate Ranking...")
+    candidates = images.to_candidates([
+        item("https://cdn.example.com/small.jpg", 400, 300),
+        item("https://cdn.example.com/big.jpg", 2000, 1200),
+        item("https://images.pexels.com/photo.jpg", 800, 600),
+        item("https://cdn.example.com/big.jpg", 2000, 1200),   # duplicate
+        item("x-raw-image:///abc", 100, 100),                  # not a URL
+    ])
+    assert len(candidates) == 4
+    ranked = [c['link'] for c in images.rank_candidates(candidates, domains=("pexels.com",))]
+    assert ranked == ["https://images.pexels.com/photo.jpg", "https://cdn.example.com/big.jpg",
+                      "https://cdn.example.com/small.jpg"]
+    ranked = images.rank_candidates(candidates, exclude={"https://cdn.example.com/small.jpg"},
+                                    used={"https://images.pexels.com/photo.jpg"}, domains=("pexels.com",))
+    assert [c['link'] for c in ranked] == ["https://cdn.example.com/big.jpg", "https://images.pexels.com/photo.jpg"]
+    print("[PASS] Image Candidate Ranking")
+
+def test_search_tiers():
+    print("\nTesting Search Tiers...")
+    tiers = images.search_tiers("Lea Michele's New Show: Everything We Know")
+    assert tiers[:2] == [("Lea Michele's New Show: Everything We Know", 'large'),
+                         ("Lea Michele's New Show: Everything We Know", None)]
+    assert ("Lea Michele's New Show", 'large') in tiers
+    assert tiers[-1] == ("Lea", None)
+    assert images.search_tiers("Eclipse") == [("Eclipse", 'large'), ("Eclipse", None)]
+    print("[PASS] Search Tiers")
+
+def test_one_call_fills_post():
+    print("\nTesting Multi-Result Harvesting...")
+    calls = []
+
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        calls.append(params)
+        return FakeResponse({'items': [item(f"https://cdn.example.com/{i}.jpg", 1000 + i, 800) for i in range(10)]})
+
+    original_get, original_cache, saved = http_client.get, image_cache._cache, save_globals()
+    try:
+        budget = use_test_credentials()
+        http_client.get = fake_get
+        image_cache._cache = ImageCache(path=os.path.join(tempfile.mkdtemp(), "image_cache.db"))
+        first = images.get_images("Mars Rover Finds Water", 2, budget=budget)
+        assert len(calls) == 1 and calls[0]['num'] == images.RESULTS_PER_CALL
+        assert first == ["https://cdn.example.com/9.jpg", "https://cdn.example.com/8.jpg"]
+
+        # Same topic again: served from the cached candidates, skipping links already handed out
+        second = images.get_images("Mars Rover Finds Water", 2, budget=budget)
+        assert len(calls) == 1
+        assert not set(first) & set(second)
+    finally:
+        http_client.get, image_cache._cache = original_get, original_cache
+        restore_globals(saved)
+    print("[PASS] Multi-Result Harvesting")
+
+def test_speculative_tiers():
+    print("\nTesting Speculative Tier Cascade...")
+    calls = []
+    calls_lock = threading.Lock()
+    # Tiers 1 and 2 only get past this together, i.e. if they're in flight side by side
+    side_by_side = threading.Barrier(2)
+    overlapped = []
+
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        with calls_lock:
+            calls.append((params['q'], params.get('imgSize')))
+            first_two = len(calls) <= 2
+        if first_two:
+            try:
+                side_by_side.wait(timeout=5)
+                overlapped.append(True)
+            except threading.BrokenBarrierError:
+                overlapped.append(False)
+        if params.get('imgSize') == 'large':
+            return FakeResponse({})  # obscure title: no large images anywhere
+        return FakeResponse({'items': [item(f"https://cdn.example.com/{params['q'][:4]}-{i}.jpg", 800, 600)
+                                       for i in range(3)]})
+
+    original_get, saved = http_client.get, save_globals()
+    try:
+        budget = use_test_credentials()
+        http_client.get = fake_get
+        links = images.get_images("Obscure Trending Title: Details Inside", 2, use_cache=False, speculative=4,
+                                  budget=budget)
+        # Let speculative tiers already in flight finish against the fake
+        for thread in threading.enumerate():
+            if thread.name.startswith("image-tier"):
+                thread.join(timeout=5)
+    finally:
+        http_client.get = original_get
+        restore_globals(saved)
+
+    # Tier 2 (exact query, any size) is the first that succeeds, so its results win
+    assert links == ["https://cdn.example.com/Obsc-0.jpg", "https://cdn.example.com/Obsc-1.jpg"]
+    # Tiers 1 and 2 ran side by side instead of back to back
+    assert overlapped == [True, True], overlapped
+    # The window slid once (after tier 1 missed); later tiers were never sent
+    assert len(calls) <= 5 < len(images.search_tiers("Obscure Trending Title: Details Inside"))
+    print("[PASS] Speculative Tier Cascade")
+
+def test_quota_rotation_and_degrade():
+    print("\nTesting Search Quota Handling...")
+    calls = []
+
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        calls.append(params['key'])
+        if params['key'] == "key-a":
+            # The real daily-quota payload: also reason rateLimitExceeded, told apart by "per day"
+            return FakeResponse({'error': {'code': 429, 'errors': [{'reason': "rateLimitExceeded"}],
+                                           'message': "Quota exceeded for quota metric 'Queries' and limit "
+                                                      "'Queries per day' of service 'customsearch.googleapis.com'"}})
+        return FakeResponse({})
+
+    original_get, saved = http_client.get, save_globals()
+    try:
+        use_test_limiter()
+        os.environ["GOOGLE_SEARCH_API_KEY"] = "key-a,key-b"
+        os.environ["GOOGLE_SEARCH_CX"] = "test-cx"
+        images.load_search_credentials.cache_clear()
+        ledger = QuotaLedger(path=os.path.join(tempfile.mkdtemp(), "quota.db"), daily_quota=100)
+        http_client.get = fake_get
+        # Only 1 call left in this batch's share: the cascade shrinks to one tier
+        budget = BatchBudget(ledger, images.load_search_credentials(), allowance=1)
+        assert images.get_images("Some Long Trending Title: With Details", 2, use_cache=False, budget=budget) == []
+        assert len(calls) == 1
+
+        # The exhausted key is retired for the day and the tier retried on the other key
+        calls.clear()
+        budget = BatchBudget(ledger, images.load_search_credentials(), allowance=20)
+        images.get_images("Eclipse", 1, use_cache=False, budget=budget)
+        assert calls.count("key-a") <= 1 and "key-b" in calls
+        assert ledger.remaining(images.load_search_credentials())[("key-a", "test-cx")] == 0
+
+        # A permission / CX problem is not quota: the key stays usable for the day
+        forbidden = {'error': {'code': 403, 'message': "Custom Search API has not been used in project",
+                               'errors': [{'reason': "accessNotConfigured"}]}}
+        http_client.get = lambda url, params=None, timeout=None, **kwargs: FakeResponse(forbidden)
+        ledger = QuotaLedger(path=os.path.join(tempfile.mkdtemp(), "quota.db"), daily_quota=100)
+        budget = BatchBudget(ledger, images.load_search_credentials(), allowance=20)
+        assert images.get_images("Eclipse", 1, use_cache=False, budget=budget) == []
+        assert min(ledger.remaining(images.load_search_credentials()).values()) == 99
+    finally:
+        http_client.get = original_get
+        restore_globals(saved)
+    print("[PASS] Search Quota Handling")
+
+def test_per_minute_limit():
+    print("\nTesting Search Rate Limit Handling...")
+    calls = []
+
+    def fake_get(url, params=None, timeout=None, **kwargs):
+        calls.append(params['q'])
+        if len(calls) == 1:
+            return FakeResponse({'error': {'code': 429, 'message': "Quota exceeded for 'Queries per minute'",
+                                           'errors': [{'reason': "rateLimitExceeded"}]}})
+        return FakeResponse({'items': [item("https://images.pexels.com/a.jpg", 1600, 900)]})
+
+    sleeps = []
+    original_get, saved = http_client.get, save_globals()
+    try:
+        budget = use_test_credentials()
+        limiter = use_test_limiter(sleeps)
+        http_client.get = fake_get
+        links = images.get_images("Eclipse", 1, use_cache=False, budget=budget)
+        # Same tier retried after the pause, and the key is not retired for the day
+        assert links == ["https://images.pexels.com/a.jpg"] and calls == ["Eclipse", "Eclipse"]
+        assert sleeps and limiter.rate('search') < 6000
+        assert budget.ledger.remaining(budget.credentials)[("test-key", "test-cx")] > 0
+
+        # A limit that never lifts: a bounded number of retries, then the cascade stops
+        calls.clear()
+        http_client.get = lambda url, params=None, timeout=None, **kwargs: (calls.append(params['q']), FakeResponse(
+            {'error': {'code': 429, 'message': "Queries per minute", 'errors': [{'reason': "rateLimitExceeded"}]}}))[1]
+        assert images.get_images("Eclipse", 1, use_cache=False, budget=budget) == []
+        assert len(calls) == 1 + images.RATE_LIMIT_RETRIES
+    finally:
+        http_client.get = original_get
+        restore_globals(saved)
+    print("[PASS] Search Rate Limit Handling")
+
+if __name__ == "__main__":
+    test_ranking()
+    test_search_tiers()
+    test_one_call_fills_post()
+    test_speculative_tiers()
+    test_quota_rotation_and_degrade()
+    test_per_minute_limit()
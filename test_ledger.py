@@ -0,0 +1,72 @@
+import os
+import time
+import tempfile
+import ledger
+import storage
+from ledger import TopicLedger
+
+def make_ledger(**kw):
+    return TopicLedger(path=os.path.join(tempfile.mkdtemp(), "ledger.db"), **kw)
+
+def test_fingerprint():
+    print("Testing Topic Fingerprints...")
+    assert ledger.fingerprint("Taylor Swift's New Album") == ledger.fingerprint("new album, taylor swift")
+    assert ledger.fingerprint("Lakers vs Celtics") == ledger.fingerprint("Celtics - Lakers")
+    assert ledger.fingerprint("Lakers vs Celtics") != ledger.fingerprint("Lakers vs Warriors")
+    print("[PASS] Topic Fingerprints")
+
+def test_covered_lifecycle():
+    print("\nTesting Ledger Lifecycle...")
+    book = make_ledger()
+    assert not book.is_covered("Mars Rover Lands")
+
+    book.mark("Mars Rover Lands", ledger.GENERATING)
+    assert book.is_covered("mars rover lands")  # in progress elsewhere
+
+    book.mark("Mars Rover Lands", ledger.FAILED)
+    assert not book.is_covered("Mars Rover Lands")  # failures may be retried
+
+    book.mark("Mars Rover Lands", ledger.GENERATED, title="NASA Rover Touches Down")
+    book.mark("Mars Rover Lands", ledger.PUBLISHED)
+    assert book.is_covered("Mars Rover Lands")
+    assert book.covered_set(["Mars Rover Lands", "Something New"]) == {"Mars Rover Lands"}
+    assert book.stats() == {ledger.PUBLISHED: 1}
+    print("[PASS] Ledger Lifecycle")
+
+def test_cover_window_expires():
+    print("\nTesting Cover Window...")
+    book = make_ledger(cover_days=0.1 / 86400)
+    book.mark("Old News", ledger.PUBLISHED)
+    time.sleep(0.2)
+    assert not book.is_covered("Old News")
+    print("[PASS] Cover Window")
+
+def test_repeated_failures_cool_down():
+    print("\nTesting Failed Topic Cooldown...")
+    book = make_ledger(max_attempts=2, failed_cooldown=3600)
+    for attempt in range(2):
+        assert not book.is_covered("Never Passes The Gate")
+        book.mark("Never Passes The Gate", ledger.GENERATING)
+        book.mark("Never Passes The Gate", ledger.FAILED)
+    # Out of attempts: skipped by the next runs instead of regenerated
+    assert book.is_covered("Never Passes The Gate")
+    assert book.covered_set(["Never Passes The Gate", "Fresh"]) == {"Never Passes The Gate"}
+
+    # The cooldown ran out: one more try
+    with storage.connect(book.path) as conn:
+        conn.execute("UPDATE topics SET updated_at = updated_at - 7200")
+    assert not book.is_covered("Never Passes The Gate")
+
+    # Publishing resets the count, so a later failure of the same trend is retried as usual
+    book.mark("Never Passes The Gate", ledger.GENERATING)
+    book.mark("Never Passes The Gate", ledger.PUBLISHED)
+    book.mark("Never Passes The Gate", ledger.GENERATING)
+    book.mark("Never Passes The Gate", ledger.FAILED)
+    assert not book.is_covered("Never Passes The Gate")
+    print("[PASS] Failed Topic Cooldown")
+
+if __name__ == "__main__":
+    test_fingerprint()
+    test_covered_lifecycle()
+    test_cover_window_expires()
+    test_repeated_failures_cool_down()
@@ -0,0 +1,134 @@
+import time
+import threading
+import bot
+from deadline import Deadline, DeadlineExceeded
+from pipeline import Pipeline
+
+def test_stages_overlap():
+    print("Testing Pipeline Concurrency...")
+    
+    def slow_generate(item):
+        time.sleep(0.2)  # Simulated network wait
+        return item * 10
+
+    def drop_odd(item):
+        return item if (item // 10) % 2 == 0 else None
+
+    stages = [('generate', slow_generate, 5), ('filter', drop_odd, 2)]
+    start = time.time()
+    results = Pipeline(stages).run(range(10))
+    elapsed = time.time() - start
+    
+    print(f"Results: {sorted(results)} in {elapsed:.2f}s")
+    assert sorted(results) == [0, 20, 40, 60, 80]
+    # 10 items x 0.2s serial would be 2s; 5 workers should take ~0.4s
+    assert elapsed < 1.5
+    print("[PASS] Pipeline Concurrency")
+
+def test_stage_errors_dont_stall():
+    print("\nTesting Pipeline Error Isolation...")
+    
+    def flaky(item):
+        if item == 3:
+            raise ValueError("boom")
+        return item
+
+    p = Pipeline([('flaky', flaky, 2), ('passthrough', lambda x: x, 1)])
+    results = p.run(range(5))
+    assert sorted(results) == [0, 1, 2, 4]
+    assert len(p.errors) == 1
+    print("[PASS] Pipeline Error Isolation")
+
+def test_stop_request():
+    print("\nTesting Pipeline Stop...")
+    stop = threading.Event()
+    
+    def work(item):
+        stop.set()
+        return item
+
+    results = Pipeline([('work', work, 1)], queue_size=1).run(range(100), should_stop=stop.is_set)
+    assert len(results) < 100
+    print(f"[PASS] Pipeline Stop ({len(results)} processed)")
+
+def test_image_prefetch_on_title():
+    print("\nTesting Image Prefetch On Title...")
+    searched = []
+    release = threading.Event()
+
+    def fake_fetch(title, target_images=2, deadline=None):
+        searched.append((title, threading.current_thread().name))
+        release.wait(timeout=5)
+        return [f"img-{target_images}"]
+
+    original = bot.fetch_images
+    bot.fetch_images = fake_fetch
+    try:
+        topic = {'title': "Trend"}
+        on_title, images_ready, _ = bot.prefetch_images(topic)
+        on_title("Streamed Headline")
+        on_title("Retry Headline")  # a later attempt's title doesn't search again
+        # The search is already running while the body is still being written
+        for _ in range(50):
+            if searched:
+                break
+            time.sleep(0.01)
+        assert len(searched) == 1 and searched[0][0] == "Trend"
+        assert searched[0][1].startswith("images")
+        release.set()
+        assert images_ready() == ["img-2"] and len(searched) == 1
+
+        # No title streamed (batched prompts): result() searches on the spot
+        _, images_ready, _ = bot.prefetch_images(topic, target_images=3)
+        assert images_ready() == ["img-3"] and len(searched) == 2
+    finally:
+        bot.fetch_images = original
+    print("[PASS] Image Prefetch On Title")
+
+def test_image_prefetch_cancel():
+    print("\nTesting Image Prefetch Cancel...")
+    tiers = []
+    first_tier = threading.Event()
+    resume = threading.Event()
+    stopped = threading.Event()
+
+    def fake_fetch(title, target_images=2, deadline=None):
+        # Like images.get_images: every tier asks the deadline for its timeout first
+        try:
+            for tier in range(3):
+                deadline.timeout(5, what="image search")
+                tiers.append(tier)
+                first_tier.set()
+                resume.wait(timeout=5)
+        except DeadlineExceeded:
+            stopped.set()
+            raise
+        return ["img"]
+
+    original = bot.fetch_images
+    bot.fetch_images = fake_fetch
+    topic_deadline = Deadline(60)
+    try:
+        on_title, _, cancel = bot.prefetch_images({'title': "Trend"}, deadline=topic_deadline)
+        on_title("Headline")
+        assert first_tier.wait(timeout=5)
+        # Generation failed: the search stops before its next call
+        cancel()
+        resume.set()
+        assert stopped.wait(timeout=5)
+        assert tiers == [0]
+        # Only the search's budget ended, not the topic's
+        assert not topic_deadline.expired()
+        # A title arriving after the cancel doesn't start a new search
+        on_title("Late Headline")
+        assert tiers == [0]
+    finally:
+        bot.fetch_images = original
+    print("[PASS] Image Prefetch Cancel")
+
+if __name__ == "__main__":
+    test_stages_overlap()
+    test_stage_errors_dont_stall()
+    test_stop_request()
+    test_image_prefetch_on_title()
+    test_image_prefetch_cancel()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+from datetime import datetime, timezone
+import quota
+from quota import QuotaLedger, BatchBudget
+
+CREDS = [("key-one-aaaa", "cx-1"), ("key-two-bbbb", "cx-1")]
+
+def make_ledger(daily_quota=5):
+    return QuotaLedger(path=os.path.join(tempfile.mkdtemp(), "quota.db"), daily_quota=daily_quota)
+
+def test_pacific_day():
+    print("Testing Pacific Quota Day...")
+    # Just after midnight UTC is still the previous day in California
+    assert quota.quota_day(datetime(2026, 7, 2, 6, 30, tzinfo=timezone.utc)) == "2026-07-01"   # PDT
+    assert quota.quota_day(datetime(2026, 7, 2, 7, 30, tzinfo=timezone.utc)) == "2026-07-02"
+    assert quota.quota_day(datetime(2026, 1, 2, 7, 30, tzinfo=timezone.utc)) == "2026-01-01"   # PST
+    assert quota.quota_day(datetime(2026, 1, 2, 8, 30, tzinfo=timezone.utc)) == "2026-01-02"
+    # DST fallback used when there is no tz database
+    assert quota._us_dst(datetime(2026, 7, 1, tzinfo=timezone.utc))
+    assert not quota._us_dst(datetime(2026, 12, 1, tzinfo=timezone.utc))
+    print("[PASS] Pacific Quota Day")
+
+def test_key_rotation_and_reset():
+    print("\nTesting Quota Key Rotation...")
+    ledger = make_ledger(daily_quota=2)
+    picked = [ledger.acquire(CREDS) for _ in range(4)]
+    # Spread by remaining budget, then nothing left
+    assert sorted(picked) == sorted(CREDS * 2)
+    assert ledger.acquire(CREDS) is None
+    # A new Pacific day starts from zero
+    tomorrow = datetime.now(timezone.utc).replace(year=datetime.now().year + 1)
+    assert ledger.total_remaining(CREDS, now=tomorrow) == 4
+
+    ledger = make_ledger(daily_quota=10)
+    ledger.exhaust(*CREDS[0])
+    assert ledger.acquire(CREDS) == CREDS[1]
+    print("[PASS] Quota Key Rotation")
+
+def test_batch_budget_degrades():
+    print("\nTesting Batch Budget Degradation...")
+    ledger = make_ledger(daily_quota=100)
+    budget = BatchBudget(ledger, CREDS, allowance=10)
+    assert budget.max_calls(10) == 10
+    for _ in range(6):
+        assert budget.acquire()
+    assert budget.max_calls(10) == 4        # 40% left
+    for _ in range(3):
+        budget.acquire()
+    assert budget.max_calls(10) == 1        # 10% left
+    budget.acquire()
+    assert budget.max_calls(10) == 0 and budget.acquire() is None
+    assert ledger.total_remaining(CREDS) == 190
+
+    # Default share: what's left today split over the batches still to run
+    fair = BatchBudget(ledger, CREDS)
+    assert 0 < fair.allowance <= 190
+    print("[PASS] Batch Budget Degradation")
+
+if __name__ == "__main__":
+    test_pacific_day()
+    test_key_rotation_and_reset()
+    test_batch_budget_degrades()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import rate_limiter
+from rate_limiter import RateLimiter
+
+class FakeClock:
+    """Time that only moves when the limiter sleeps (or the test advances it)."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+def make_limiter(clock, path=None, limits=None):
+    path = path or os.path.join(tempfile.mkdtemp(), "rates.db")
+    return RateLimiter(path=path, limits=limits or {'blogger': (60, 3)}, clock=clock, sleep=clock.sleep)
+
+def test_burst_then_steady_rate():
+    print("Testing Token Bucket Pacing...")
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    # Burst of 3 goes straight through, then one request per second (60/min)
+    for _ in range(3):
+        assert limiter.acquire('blogger') == 0
+    waited = limiter.acquire('blogger')
+    assert abs(waited - 1.0) < 0.05, waited
+    assert not limiter.try_acquire('blogger')
+    clock.now += 1
+    assert limiter.try_acquire('blogger')
+    # Per-key buckets are independent
+    assert limiter.try_acquire('blogger', key="key-a") and limiter.try_acquire('blogger', key="key-b")
+    print("[PASS] Token Bucket Pacing")
+
+def test_shared_across_runs():
+    print("\nTesting Persisted Buckets...")
+    clock = FakeClock()
+    first = make_limiter(clock)
+    for _ in range(3):
+        first.acquire('blogger')
+    # A run started right after sees the drained bucket (no blind startup sleep needed)
+    second = make_limiter(clock, path=first.path)
+    assert not second.try_acquire('blogger')
+    # Batch requests may take more than the burst, leaving debt behind
+    clock.now += 3
+    assert second.acquire('blogger', cost=10) == 0
+    assert abs(second.acquire('blogger') - 8.0) < 0.05
+    print("[PASS] Persisted Buckets")
+
+def test_throttle_and_recovery():
+    print("\nTesting Adaptive Throttling...")
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+    limiter.throttle('blogger', retry_after=20)
+    assert limiter.rate('blogger') == 30
+    # Retry-After is honoured before anything else goes out
+    assert abs(limiter.acquire('blogger') - 20.0) < 0.05
+    # A second 429 halves it again (from where it had recovered to meanwhile)
+    limiter.throttle('blogger')
+    assert limiter.rate('blogger') < 20
+    # Climbs back to the configured quota over RECOVERY seconds
+    clock.now += rate_limiter.RECOVERY
+    assert limiter.rate('blogger') == 60
+    print("[PASS] Adaptive Throttling")
+
+class FakeResp(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+class FakeRequest:
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def execute(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return {'ok': True}
+
+def http_error(status, headers=None, content=b""):
+    e = Exception(f"HTTP {status}")
+    e.resp = FakeResp(status, headers or {})
+    e.content = content
+    return e
+
+def test_execute_retries_rate_limits():
+    print("\nTesting Rate-Limited Execute...")
+    clock = FakeClock()
+    original = rate_limiter._limiter
+    rate_limiter._limiter = make_limiter(clock)
+    try:
+        request = FakeRequest([http_error(429, {'retry-after': "7"}),
+                               http_error(403, content=b'{"reason": "userRateLimitExceeded"}')])
+        assert rate_limiter.execute(request) == {'ok': True} and request.calls == 3
+        assert 7.0 in clock.sleeps
+        # Other errors are the caller's problem
+        request = FakeRequest([http_error(404)])
+        try:
+            rate_limiter.execute(request)
+            assert False, "404 should be raised"
+        except Exception as e:
+            assert e.resp.status == 404 and request.calls == 1
+    finally:
+        rate_limiter._limiter = original
+    print("[PASS] Rate-Limited Execute")
+
+if __name__ == "__main__":
+    test_burst_then_steady_rate()
+    test_shared_across_runs()
+    test_throttle_and_recovery()
+    test_execute_retries_rate_limits()
@@ -0,0 +1,99 @@
+import os
+import time
+import tempfile
+import router
+from router import KeyModelRouter
+
+MODELS = ['gemini-2.0-flash', 'gemini-2.5-flash']
+
+def make_router(path=None):
+    path = path or os.path.join(tempfile.mkdtemp(), "router.db")
+    return KeyModelRouter(["key-one-aaaa", "key-two-bbbb"], MODELS, path=path)
+
+def test_error_parsing():
+    print("Testing Error Classification...")
+    msg = "429 Resource has been exhausted (e.g. check quota). retry_delay {\n  seconds: 37\n}"
+    assert router.classify_error(msg) == 'rate_limited'
+    assert router.parse_retry_after(msg) == 37
+    assert router.parse_retry_after("Please retry in 12.5s.") == 12.5
+    assert router.classify_error("404 models/gemini-x is not found") == 'not_found'
+    assert router.classify_error("400 API key not valid. Please pass a valid API key.") == 'bad_key'
+    print("[PASS] Error Classification")
+
+def test_skips_cooling_pairs():
+    print("\nTesting Cooldown Routing...")
+    r = make_router()
+    key, model = r.pick()
+    assert model == 'gemini-2.0-flash'
+    r.record_failure(key, model, "429 quota exceeded. Please retry in 60s")
+
+    # Same call again goes straight past the rate-limited pair
+    next_key, next_model = r.pick()
+    assert (next_key, next_model) != (key, model)
+
+    # A dead key takes all its models out of rotation
+    r.record_failure(next_key, next_model, "API key not valid")
+    remaining = r.pick()
+    assert remaining is None or remaining[0] != next_key
+    print("[PASS] Cooldown Routing")
+
+def test_breaker_and_persistence():
+    print("\nTesting Circuit Breaker + Persistence...")
+    path = os.path.join(tempfile.mkdtemp(), "router.db")
+    r = make_router(path)
+    for _ in range(router.FAILURE_THRESHOLD):
+        r.record_failure("key-one-aaaa", MODELS[0], "500 internal error")
+    assert r._status(r.states[(router.key_id("key-one-aaaa"), MODELS[0])], time.time()) == router.OPEN
+
+    # A new process sees the open breaker without re-trying the pair
+    fresh = make_router(path)
+    picked = [fresh.pick() for _ in range(3)]
+    assert ("key-one-aaaa", MODELS[0]) not in picked
+    assert "open" in fresh.summary()
+    print("[PASS] Circuit Breaker + Persistence")
+
+def test_wait_covers_running_probes():
+    print("\nTesting Wait For Half-Open Probes...")
+    r = KeyModelRouter(["key-one-aaaa"], MODELS[:1], path=os.path.join(tempfile.mkdtemp(), "router.db"))
+    pair = (router.key_id("key-one-aaaa"), MODELS[0])
+    for _ in range(router.FAILURE_THRESHOLD):
+        r.record_failure("key-one-aaaa", MODELS[0], "500 internal error")
+    assert 0 < r.seconds_until_available() <= r.states[pair]['cooldown_until'] - time.time() + 1
+
+    # Cooldown over: the breaker is half-open and the first pick takes the single probe
+    r.states[pair]['cooldown_until'] = time.time() - 1
+    r._save(pair)
+    assert r.pick() == ("key-one-aaaa", MODELS[0])
+    assert r.pick() is None
+    # The pair isn't free yet: it reopens when the probe window ends, not "now"
+    wait = r.seconds_until_available()
+    assert router.PROBE_WINDOW - 5 < wait <= router.PROBE_WINDOW, wait
+    assert r.seconds_until_available(exclude={("key-one-aaaa", MODELS[0])}) is None
+    print("[PASS] Wait For Half-Open Probes")
+
+def test_latency_tracking():
+    print("\nTesting Latency Tracking...")
+    r = make_router()
+    assert r.latency_percentile(MODELS[1]) is None
+    for latency in [1, 2, 3, 4, 5, 6, 7, 8, 9, 30]:
+        r.record_success("key-one-aaaa", MODELS[1], latency)
+        r.record_success("key-two-bbbb", MODELS[0], 20)
+    # p90 ignores the single outlier; the other model's samples don't leak in
+    assert r.latency_percentile(MODELS[1]) == 9
+    assert r.latency_percentile(MODELS[0]) == 20
+
+    # Equally healthy pairs: default order follows MODELS, prefer_fast goes by EWMA latency
+    fresh = make_router()
+    for key in fresh.keys:
+        fresh.record_success(key, MODELS[0], 20)
+        fresh.record_success(key, MODELS[1], 2)
+    assert fresh.pick()[1] == MODELS[0]
+    assert fresh.pick(prefer_fast=True)[1] == MODELS[1]
+    print("[PASS] Latency Tracking")
+
+if __name__ == "__main__":
+    test_error_parsing()
+    test_skips_cooling_pairs()
+    test_breaker_and_persistence()
+    test_wait_covers_running_probes()
+    test_latency_tracking()
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import tempfile
+from datetime import datetime, timedelta
+from scheduler import CronSchedule, PidLock, LockHeld, Scheduler
+
+def test_cron_next():
+    print("Testing Cron Parsing...")
+    every_two = CronSchedule("0 */2 * * *")
+    assert every_two.next_after(datetime(2026, 1, 1, 1, 30)) == datetime(2026, 1, 1, 2, 0)
+    assert every_two.next_after(datetime(2026, 1, 1, 2, 0)) == datetime(2026, 1, 1, 4, 0)
+    assert every_two.next_after(datetime(2026, 1, 31, 23, 59)) == datetime(2026, 2, 1, 0, 0)
+
+    weekdays = CronSchedule("15 9 * * 1-5")
+    # 2026-01-03 is a Saturday -> next is Monday 2026-01-05
+    assert weekdays.next_after(datetime(2026, 1, 3, 10, 0)) == datetime(2026, 1, 5, 9, 15)
+
+    ticks = every_two.ticks_between(datetime(2026, 1, 1, 0, 0), datetime(2026, 1, 1, 6, 0))
+    assert [t.hour for t in ticks] == [2, 4, 6]
+    print("[PASS] Cron Parsing")
+
+def test_lock_overlap():
+    print("\nTesting PID Lock...")
+    path = os.path.join(tempfile.mkdtemp(), "bot.lock")
+    first = PidLock(path).acquire()
+    try:
+        PidLock(path).acquire()
+        assert False, "second lock should fail while first is held"
+    except LockHeld:
+        pass
+    first.release()
+    assert not os.path.exists(path)
+
+    # Dead PID -> stale lock is taken over
+    with open(path, "w") as f:
+        json.dump({"pid": 999999999, "heartbeat": 0}, f)
+    PidLock(path).acquire().release()
+
+    # Leftover lock with our own PID (container restart reusing PID 1) is stale too
+    with open(path, "w") as f:
+        json.dump({"pid": os.getpid(), "heartbeat": time.time()}, f)
+    lock = PidLock(path).acquire()
+
+    # The lease is renewed while a batch runs, not only between batches
+    with lock.keep_alive(interval=0.05):
+        before = json.load(open(path))['heartbeat']
+        time.sleep(0.3)
+        assert json.load(open(path))['heartbeat'] > before
+    lock.release()
+    print("[PASS] PID Lock")
+
+def test_lost_lock():
+    print("\nTesting Lost Lock...")
+    path = os.path.join(tempfile.mkdtemp(), "bot.lock")
+    lock = PidLock(path).acquire()
+    # Our lease expired and another process took over: renewing must not evict it
+    taken_over = {"pid": 424242, "heartbeat": time.time()}
+    with open(path, "w") as f:
+        json.dump(taken_over, f)
+    try:
+        lock.renew()
+        assert False, "renewing a lock someone else holds should fail"
+    except LockHeld:
+        pass
+    assert json.load(open(path)) == taken_over and not lock.held
+    lock.release()
+    assert os.path.exists(path)
+
+    class FlakyLock:
+        path = "bot.lock"
+
+        def __init__(self, error):
+            self.error = error
+
+        def renew(self):
+            raise self.error
+
+    # A renew that fails on disk doesn't kill the daemon; losing the lock stops it
+    s = Scheduler(lambda stop: None, "0 */2 * * *", state_file=os.path.join(tempfile.mkdtemp(), "state.json"),
+                  lock=FlakyLock(OSError("disk full")))
+    assert s._sleep_until(datetime.now() + timedelta(seconds=0.1)) and not s.stop_event.is_set()
+    s.lock = FlakyLock(LockHeld("Lost bot.lock to pid 424242"))
+    assert not s._sleep_until(datetime.now() + timedelta(seconds=0.1)) and s.stop_event.is_set()
+    print("[PASS] Lost Lock")
+
+def test_catch_up_policy():
+    print("\nTesting Catch-up Policy...")
+    state = os.path.join(tempfile.mkdtemp(), "state.json")
+    with open(state, "w") as f:
+        json.dump({"last_tick": "2026-01-01T00:00:00"}, f)
+    now = datetime(2026, 1, 1, 9, 0)
+
+    s = Scheduler(lambda stop: None, "0 */2 * * *", catch_up="skip", state_file=state)
+    assert s._missed_ticks(now) == []
+    s = Scheduler(lambda stop: None, "0 */2 * * *", catch_up="once", state_file=state)
+    assert s._missed_ticks(now) == [datetime(2026, 1, 1, 8, 0)]
+    s = Scheduler(lambda stop: None, "0 */2 * * *", catch_up="all", state_file=state, max_catch_up=3)
+    assert [t.hour for t in s._missed_ticks(now)] == [4, 6, 8]
+    print("[PASS] Catch-up Policy")
+
+if __name__ == "__main__":
+    test_cron_next()
+    test_lock_overlap()
+    test_lost_lock()
+    test_catch_up_policy()
@@ -0,0 +1,93 @@
+import os
+import time
+import tempfile
+import threading
+from url_check import UrlChecker
+
+class FakeProbe:
+    """Slow probe that records how many checks ran at once per host."""
+
+    def __init__(self, delay=0.2, broken=()):
+        self.delay = delay
+        self.broken = set(broken)
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, url, timeout):
+        host = url.split('/')[2]
+        with self._lock:
+            self.calls.append(url)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        time.sleep(self.delay)
+        with self._lock:
+            self.active[host] -= 1
+        return 404 if url in self.broken else 200
+
+def make_checker(probe, **kw):
+    return UrlChecker(path=os.path.join(tempfile.mkdtemp(), "checks.db"), check=probe, **kw)
+
+def test_concurrent_and_cached():
+    print("Testing Concurrent Image Checks...")
+    urls = [f"https://cdn{i}.example.com/img.jpg" for i in range(5)]
+    probe = FakeProbe(broken={urls[3]})
+    checker = make_checker(probe)
+
+    started = time.time()
+    results = checker.validate(urls + [urls[0]])
+    elapsed = time.time() - started
+    assert results == {u: u != urls[3] for u in urls}
+    # 5 images cost about one probe, not five
+    assert elapsed < 0.5, elapsed
+    assert len(probe.calls) == 5
+
+    # Next audit run: answered from the cache
+    assert checker.validate(urls) == results
+    assert len(probe.calls) == 5 and checker.hits == 5
+    print("[PASS] Concurrent Image Checks")
+
+def test_bad_results_expire_sooner():
+    print("\nTesting Good/Bad TTLs...")
+    probe = FakeProbe(delay=0, broken={"https://a.example.com/broken.jpg"})
+    checker = make_checker(probe, good_ttl=3600, bad_ttl=0.05)
+    checker.validate(["https://a.example.com/ok.jpg", "https://a.example.com/broken.jpg"])
+    time.sleep(0.1)
+    checker.validate(["https://a.example.com/ok.jpg", "https://a.example.com/broken.jpg"])
+    assert probe.calls.count("https://a.example.com/broken.jpg") == 2
+    assert probe.calls.count("https://a.example.com/ok.jpg") == 1
+    print("[PASS] Good/Bad TTLs")
+
+def test_timeouts_not_cached():
+    print("\nTesting Timeouts Aren't Cached...")
+    calls = []
+    answers = {"https://a.example.com/slow.jpg": [0, 200]}
+
+    def flaky(url, timeout):
+        calls.append(url)
+        return answers[url].pop(0)
+
+    checker = make_checker(flaky)
+    # A timeout counts as unreachable for this run only...
+    assert checker.validate(["https://a.example.com/slow.jpg"]) == {"https://a.example.com/slow.jpg": False}
+    # ...and the next run probes again instead of trusting a cached "broken"
+    assert checker.validate(["https://a.example.com/slow.jpg"]) == {"https://a.example.com/slow.jpg": True}
+    assert len(calls) == 2
+    print("[PASS] Timeouts Aren't Cached")
+
+def test_per_host_limit():
+    print("\nTesting Per-Host Concurrency Limit...")
+    probe = FakeProbe(delay=0.05)
+    checker = make_checker(probe, per_host=2, workers=8)
+    checker.validate([f"https://one.example.com/{i}.jpg" for i in range(6)] +
+                     [f"https://two.example.com/{i}.jpg" for i in range(2)])
+    assert probe.peak["one.example.com"] == 2
+    assert probe.peak["two.example.com"] <= 2
+    print("[PASS] Per-Host Concurrency Limit")
+
+if __name__ == "__main__":
+    test_concurrent_and_cached()
+    test_bad_results_expire_sooner()
+    test_timeouts_not_cached()
+    test_per_host_limit()
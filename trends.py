@@ -1,18 +1,24 @@
 import time
 import random
 import os
-import requests
+import http_client
 from pytrends.request import TrendReq
+from deadline import Deadline
 
-def get_trends(geo='US', count=2):
+def get_trends(geo='US', count=2, exclude=None, deadline=None):
     """
     Fetches real-time trends. Returns None on 429/404/Block.
+    exclude: optional callable(list of titles) -> set of titles to skip
+    (e.g. ledger.covered_set), so we move on to the next unseen trend.
+    deadline: optional deadline.Deadline capping the request timeouts.
     """
     print("Fetching trends...")
     results = []
+    deadline = deadline or Deadline()
     
     try:
-        pytrends = TrendReq(hl='en-US', tz=360, timeout=(10,25))
+        read_timeout = deadline.timeout(25, what="trends")
+        pytrends = TrendReq(hl='en-US', tz=360, timeout=(min(10, read_timeout), read_timeout))
         df = pytrends.realtime_trending_searches(pn=geo)
         
         if df is None or df.empty:
@@ -20,10 +26,16 @@ def get_trends(geo='US', count=2):
             return None
             
         print(f"Found {len(df)} trends. Taking top {count}.")
+        skipped = exclude(list(df['title'])) if exclude else set()
         
-        for i in range(min(count, len(df))):
+        for i in range(len(df)):
+            if len(results) >= count:
+                break
             row = df.iloc[i]
             title = row['title']
+            if title in skipped:
+                print(f"   [i] Already covered, skipping: {title}")
+                continue
             # Safely get article URL
             article_urls = row.get('article_urls', [])
             url = article_urls[0] if isinstance(article_urls, list) and article_urls else '#'
@@ -48,15 +60,23 @@ def get_trends(geo='US', count=2):
         
     try:
         # Fetch Top Headlines for US
-        url = f"https://newsapi.org/v2/top-headlines?country=us&apiKey={news_key}&pageSize={count}"
-        data = requests.get(url).json()
+        # Over-fetch when filtering so covered headlines can be skipped
+        page_size = min(100, count * 5) if exclude else count
+        url = f"https://newsapi.org/v2/top-headlines?country=us&apiKey={news_key}&pageSize={page_size}"
+        data = http_client.get(url, timeout=deadline.timeout(15, what="NewsAPI")).json()
         
         articles = data.get('articles', [])
         if not articles:
             return None
             
         print(f"Recovered {len(articles)} trends from NewsAPI.")
+        skipped = exclude([art['title'] for art in articles]) if exclude else set()
         for art in articles:
+            if len(results) >= count:
+                break
+            if art['title'] in skipped:
+                print(f"   [i] Already covered, skipping: {art['title']}")
+                continue
             results.append({
                 'title': art['title'],
                 'url': art['url']
@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import storage
+import http_client
+from deadline import Deadline
+
+# Reachable images are re-checked weekly; broken ones daily (CDNs do come back)
+GOOD_TTL = int(os.getenv("IMAGE_CHECK_GOOD_TTL", 7 * 24 * 3600))
+BAD_TTL = int(os.getenv("IMAGE_CHECK_BAD_TTL", 24 * 3600))
+CHECK_TIMEOUT = float(os.getenv("IMAGE_CHECK_TIMEOUT", 3))
+WORKERS = int(os.getenv("IMAGE_CHECK_WORKERS", 16))
+# Don't hammer one CDN with a whole page worth of images at once
+PER_HOST = int(os.getenv("IMAGE_CHECK_PER_HOST", 4))
+
+# Fake headers to avoid 403 Forbidden from some CDNs
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, right) Gecko/20100101 Firefox/89.0'}
+
+def check_url(url, timeout=CHECK_TIMEOUT):
+    """One reachability probe. Returns the HTTP status (0 for connection errors/timeouts)."""
+    try:
+        # An image that redirects (http -> https, CDN moves) still loads in the browser
+        r = http_client.head(url, headers=HEADERS, timeout=timeout, follow_redirects=True)
+        # Some servers block HEAD, so try GET with stream if 405/403
+        if r.status_code in [405, 403]:
+            r = http_client.get(url, headers=HEADERS, stream=True, timeout=timeout, follow_redirects=True)
+            r.close()  # Close connection immediately
+        return r.status_code
+    except Exception:
+        return 0
+
+class UrlChecker:
+    """
+    Checks image URLs concurrently (thread pool, at most PER_HOST in flight
+    per host) and remembers the answers in SQLite: good results for GOOD_TTL,
+    bad ones for BAD_TTL. A post with 5 images costs about one timeout, and
+    CDN URLs seen on the last audit aren't re-checked at all.
+    """
+
+    def __init__(self, path=None, good_ttl=None, bad_ttl=None, workers=None, per_host=None, check=None):
+        self.path = path or storage.db_path("IMAGE_CHECK_DB", "image_checks.db")
+        self.good_ttl = good_ttl if good_ttl is not None else GOOD_TTL
+        self.bad_ttl = bad_ttl if bad_ttl is not None else BAD_TTL
+        self.workers = workers or WORKERS
+        self.per_host = per_host or PER_HOST
+        self.check = check or check_url
+        self.hits = 0
+        self.checks = 0
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        with storage.connect(self.path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS url_checks (
+                    url TEXT PRIMARY KEY,
+                    ok INTEGER NOT NULL,
+                    status INTEGER NOT NULL,
+                    checked_at REAL NOT NULL
+                )""")
+
+    def _cached(self, urls):
+        now = time.time()
+        with storage.connect(self.path) as conn:
+            rows = conn.execute(
+                f"SELECT url, ok, checked_at FROM url_checks WHERE url IN ({','.join('?' * len(urls))})",
+                urls).fetchall()
+        fresh = {}
+        for url, ok, checked_at in rows:
+            if now - checked_at <= (self.good_ttl if ok else self.bad_ttl):
+                fresh[url] = bool(ok)
+        return fresh
+
+    def _store(self, results):
+        # Status 0 (timeout / connection error) says nothing about the image: a timeout
+        # clipped by an almost-spent deadline mustn't mark it broken for BAD_TTL
+        rows = [(url, int(status == 200), status, time.time()) for url, status in results.items() if status]
+        if not rows:
+            return
+        with storage.connect(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO url_checks (url, ok, status, checked_at) VALUES (?, ?, ?, ?)", rows)
+
+    def _slot(self, url):
+        host = (urlparse(url).hostname or "").lower()
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _probe(self, url, timeout):
+        with self._slot(url):
+            return self.check(url, timeout)
+
+    def validate(self, urls, deadline=None):
+        """{url: reachable} for every URL (duplicates checked once)."""
+        urls = list(dict.fromkeys(u for u in urls if u))
+        if not urls:
+            return {}
+        results = self._cached(urls)
+        todo = [u for u in urls if u not in results]
+        with self._lock:
+            self.hits += len(results)
+            self.checks += len(todo)
+        if todo:
+            # All probes run side by side, so one timeout bounds the whole set
+            timeout = (deadline or Deadline()).timeout(CHECK_TIMEOUT, what="image checks")
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(todo)), thread_name_prefix="url-check") as pool:
+                statuses = dict(zip(todo, pool.map(lambda u: self._probe(u, timeout), todo)))
+            self._store(statuses)
+            results.update({url: status == 200 for url, status in statuses.items()})
+        return results
+
+    def purge_expired(self):
+        now = time.time()
+        with storage.connect(self.path) as conn:
+            conn.execute("DELETE FROM url_checks WHERE (ok = 1 AND checked_at < ?) OR (ok = 0 AND checked_at < ?)",
+                         (now - self.good_ttl, now - self.bad_ttl))
+
+_checker = None
+_checker_lock = threading.Lock()
+
+def get_checker():
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = UrlChecker()
+        return _checker
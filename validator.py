@@ -0,0 +1,172 @@
+import re
+from lxml import etree
+
+# Google AdSense 2026 compliance thresholds (shared by content.py and content_auditor.py)
+MIN_WORDS = 1000
+ANALYSIS_KEYWORDS = ["Analysis", "Why This Matters", "Our Perspective", "Expert"]
+STRUCTURE_KEYWORDS = ["FAQ", "Key Takeaways", "What's Next"]
+PLACEHOLDER = "[IMAGE]"
+# Text runs on across these; every other tag (p, h2, li, br, ...) is a word boundary
+INLINE_TAGS = {'a', 'abbr', 'b', 'cite', 'code', 'em', 'font', 'i', 'mark', 's', 'small', 'span',
+               'strong', 'sub', 'sup', 'u'}
+# Raw-text elements: their contents are code, never article text
+SKIPPED_TAGS = {'script', 'style'}
+
+class _MetricsTarget:
+    """
+    lxml parser target: builds the metrics from parse events as the HTML
+    streams through, without building a tree. Text is collected in order
+    so words and keywords that span inline tags (<b>Key</b> Takeaways)
+    count the same as in the rendered page, while block tags separate words
+    ("</h2><p>" never glues two words together). Script and style
+    contents (embeds, JSON-LD, CSS) are not article text and are ignored.
+    """
+
+    def __init__(self):
+        self.metrics = new_metrics()
+        self.text = []
+        self.heading = None  # text chunks of the open <h2>
+        self.h2_depth = 0
+        self.skip_depth = 0  # open <script>/<style> elements
+
+    def start(self, tag, attrib):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        if tag not in INLINE_TAGS:
+            self.text.append(' ')
+        if tag == 'h2':
+            self.metrics['h2'] += 1
+            self.h2_depth += 1
+            if self.heading is None:
+                self.heading = []
+        elif tag == 'h3':
+            self.metrics['h3'] += 1
+        elif tag == 'p':
+            self.metrics['paragraphs'] += 1
+        elif tag == 'img':
+            self.metrics['images'] += 1
+            if attrib.get('src'):
+                self.metrics['image_srcs'].append(attrib['src'])
+
+    def end(self, tag):
+        if tag in SKIPPED_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        if tag not in INLINE_TAGS:
+            self.text.append(' ')
+        if tag == 'h2' and self.h2_depth:
+            self.h2_depth -= 1
+            if not self.h2_depth:
+                self.metrics['headings'].append(''.join(self.heading).strip())
+                self.heading = None
+
+    def data(self, data):
+        if self.skip_depth:
+            return
+        self.text.append(data)
+        if self.heading is not None:
+            self.heading.append(data)
+
+    def comment(self, text):
+        pass  # commented-out markup and text never counts
+
+    def close(self):
+        m = self.metrics
+        text = ''.join(self.text)
+        m['words'] = len(text.split())
+        m['has_analysis'] = any(k in text for k in ANALYSIS_KEYWORDS)
+        m['has_structure'] = any(k in text for k in STRUCTURE_KEYWORDS)
+        m['placeholders'] = text.count(PLACEHOLDER)
+        return m
+
+def new_metrics():
+    return {'words': 0, 'h2': 0, 'h3': 0, 'paragraphs': 0, 'images': 0,
+            'has_analysis': False, 'has_structure': False, 'placeholders': 0, 'headings': [], 'image_srcs': []}
+
+def analyze(html):
+    """
+    One streaming lxml parse (parser target, no tree) -> metrics used by every
+    quality check: words, h2, h3, paragraphs, images, has_analysis,
+    has_structure, placeholders, headings (H2 texts), image_srcs.
+    Tags are matched by name, so <picture>, <pre>, <IMG> or markup inside
+    comments and attributes don't fool it the way substring checks did.
+    """
+    if not html or not html.strip():
+        return new_metrics()
+    parser = etree.HTMLParser(target=_MetricsTarget())
+    try:
+        parser.feed(html)
+        return parser.close()
+    except (etree.ParserError, etree.XMLSyntaxError, ValueError):
+        return new_metrics()
+
+def find_issues(html=None, metrics=None, draft=False):
+    """
+    Returns the list of low-value reasons (empty list = OK).
+    draft=True is for freshly generated articles: images are added later and
+    the [IMAGE] placeholder is expected, so those checks are skipped.
+    """
+    m = metrics or analyze(html)
+    reasons = []
+
+    # Minimum word count (800-1500 recommended)
+    if m['words'] < MIN_WORDS:
+        reasons.append(f"Too Short ({m['words']} words, need {MIN_WORDS}+)")
+
+    # Must have images for engagement
+    if not draft and not m['images']:
+        reasons.append("No Images")
+
+    # E-E-A-T: Check for Expert Analysis/Unique Perspective
+    if not m['has_analysis']:
+        reasons.append("Missing Expert Analysis (E-E-A-T)")
+
+    # Check for structured content (FAQ, Key Takeaways)
+    if not m['has_structure']:
+        reasons.append("Missing Structured Sections (FAQ/Takeaways)")
+
+    # Check for proper HTML headings (H2, H3)
+    if not (m['h2'] or m['h3']):
+        reasons.append("Poor Formatting (No H2/H3 headings)")
+
+    # Check for Paragraphs (Structure)
+    if not m['paragraphs']:
+        reasons.append("Structure: No Paragraphs (<p>) found")
+
+    # Check for 'Noise' ([IMAGE] placeholder)
+    if not draft and m['placeholders']:
+        reasons.append("Noise: Found '[IMAGE]' placeholder")
+    return reasons
+
+# Canonical article sections (see content.SECTION_SPECS) and how to recognise them by H2 text
+SECTION_MARKERS = [
+    ("Key Takeaways", ("takeaway",)),
+    ("The Deep Dive", ("deep dive",)),
+    ("Expert Analysis & Implications", ("analysis", "implication", "why this matters", "our perspective", "expert")),
+    ("Future Outlook", ("outlook", "what's next", "looking ahead")),
+    ("FAQ", ("faq", "frequently asked")),
+    ("Bottom Line", ("bottom line", "conclusion", "verdict")),
+]
+
+def missing_sections(metrics):
+    """Canonical section names with no matching H2, in article order."""
+    headings = [h.lower() for h in metrics.get('headings', [])]
+    return [name for name, markers in SECTION_MARKERS
+            if not any(marker in h for h in headings for marker in markers)]
+
+def repair(html):
+    """
+    Cheap in-place fixes for formatting slips (no LLM call):
+    markdown headings/bold -> HTML, loose text lines -> <p>.
+    """
+    html = re.sub(r'^\s*###\s+(.+)$', r'<h3>\1</h3>', html, flags=re.MULTILINE)
+    html = re.sub(r'^\s*##?\s+(.+)$', r'<h2>\1</h2>', html, flags=re.MULTILINE)
+    html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html)
+
+    # Wrap lines of bare text (no block tag) in paragraphs
+    lines = []
+    for line in html.split('\n'):
+        stripped = line.strip()
+        if stripped and not stripped.startswith('<') and stripped != PLACEHOLDER:
+            line = f"<p>{stripped}</p>"
+        lines.append(line)
+    return '\n'.join(lines)
@@ -1,5 +1,5 @@
 import os
-import requests
+import http_client
 from dotenv import load_dotenv
 
 def verify_search():
@@ -34,7 +34,7 @@ def verify_search():
     }
     
     try:
-        res = requests.get(url, params=params)
+        res = http_client.get(url, params=params)
         data = res.json()
         
         if 'error' in data: